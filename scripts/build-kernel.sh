@@ -9,21 +9,63 @@ LOG_FILE=$2
 ARCH=$3
 BZIMAGE=$4
 JOB_COUNT=${5:-$(nproc)}
+OUTPUT_DIR=${6:-}
+CC_WRAPPER=${7:-}
+JOBSERVER=${8:-}
+TARGETS=${9:-}
+
+CONFIG_DIR=$KERNEL_SRC
+MAKE_ARGS=()
+JOB_ARGS=("-j$JOB_COUNT")
+
+# A log file of "-" streams all output to stdout for the caller to monitor
+if [ "$LOG_FILE" = "-" ]; then
+    LOG_FILE=/dev/stdout
+else
+    rm -f "$LOG_FILE"
+fi
+
+if [ -n "$OUTPUT_DIR" ]; then
+    CONFIG_DIR=$OUTPUT_DIR
+    MAKE_ARGS+=("O=$OUTPUT_DIR")
+fi
+
+# Join a shared jobserver instead of starting one with a private -j budget
+if [ -n "$JOBSERVER" ]; then
+    exec 3<>"$JOBSERVER"
+    export MAKEFLAGS="-j --jobserver-auth=3,3"
+    JOB_ARGS=()
+fi
+
+if [ -n "$CC_WRAPPER" ]; then
+    MAKE_ARGS+=("CC=$CC_WRAPPER clang" "HOSTCC=$CC_WRAPPER clang")
+fi
 
 # Validate Config File
-if [ ! -f "$KERNEL_SRC/.config" ]; then
-    echo "[ERROR] Configuration file .config does not exist in $KERNEL_SRC." > "$LOG_FILE"
+if [ ! -f "$CONFIG_DIR/.config" ]; then
+    echo "[ERROR] Configuration file .config does not exist in $CONFIG_DIR." > "$LOG_FILE"
     exit 1
 fi
 
 cd "$KERNEL_SRC"
 
-make.cross LLVM=1 ARCH="$ARCH" olddefconfig
+# Anything that writes the source tree holds its lock, so KLocalizer's olddefconfig never runs alongside it
+if [ -z "$OUTPUT_DIR" ]; then
+    exec 9<"$KERNEL_SRC"
+    flock 9
+fi
+
+# Kbuild refuses O= builds while the source tree holds in-tree build state
+if [ -n "$OUTPUT_DIR" ] && { [ -f .config ] || [ -d include/config ]; }; then
+    flock "$KERNEL_SRC" make.cross LLVM=1 ARCH="$ARCH" mrproper > /dev/null
+fi
+
+make.cross LLVM=1 ARCH="$ARCH" "${MAKE_ARGS[@]}" olddefconfig
 
-# Building the kernel
-rm -f $LOG_FILE
+# Building the kernel, or only the given space separated targets
+read -r -a BUILD_TARGETS <<< "${TARGETS:-$(basename $BZIMAGE)}"
 
-make.cross -j$JOB_COUNT LLVM=1 ARCH="$ARCH" "$(basename $BZIMAGE)" > $LOG_FILE 2>&1 || \
+make.cross "${JOB_ARGS[@]}" LLVM=1 ARCH="$ARCH" "${MAKE_ARGS[@]}" "${BUILD_TARGETS[@]}" > "$LOG_FILE" 2>&1 || \
     { exit 1; }
 
 cd $WORKING_DIR
@@ -10,40 +10,68 @@ LOG_FILE=$3
 ARCH=$4
 DEBIAN_IMG=$5
 TIMEOUT=${6:-300} # 5m Default
+DISK_FORMAT=${7:-raw}
+INITRD=${8:-}
 
 # Variables
-SUCCESS_STRING='login:'
+SUCCESS_STRING=${9:-login:}
 MAINTENANCE_STRING='Press Enter for maintenance'
 
 # Running QEMU
-rm -f "$LOG_FILE"
 cd "$WORKING_DIR"
 
+# A shared raw image needs locking off; a per-boot overlay is private to this guest
+DRIVE="file=$DEBIAN_IMG,format=$DISK_FORMAT"
+if [ "$DISK_FORMAT" = "raw" ]; then
+    DRIVE="$DRIVE,file.locking=off"
+fi
+
+# Smoke boots run the initramfs init instead of mounting the Debian rootfs
+if [ -n "$INITRD" ]; then
+    ROOT_ARGS=(-initrd "$INITRD")
+    ROOT='rdinit=/init'
+else
+    ROOT_ARGS=(-drive "$DRIVE")
+    ROOT=''
+fi
+
 if [ "$ARCH" = "arm64" ]; then
-    qemu-system-aarch64 \
-        -machine virt \
-        -cpu cortex-a57 \
-        -nographic \
-        -smp 1 \
-        -drive file="$DEBIAN_IMG",format=raw,file.locking=off \
-        -kernel "$IMG" \
-        -append "console=ttyAMA0 root=/dev/vda oops=panic panic_on_warn=1 panic=-1 ftrace_dump_on_oops=orig_cpu debug earlyprintk=serial slub_debug=UZ" \
-        -m 2G \
-        -net user \
-        -net nic > "$LOG_FILE" 2>&1 &
+    QEMU_CMD=(
+        qemu-system-aarch64
+        -machine virt
+        -cpu cortex-a57
+        -nographic
+        -smp 1
+        "${ROOT_ARGS[@]}"
+        -kernel "$IMG"
+        -append "console=ttyAMA0 ${ROOT:-root=/dev/vda} oops=panic panic_on_warn=1 panic=-1 ftrace_dump_on_oops=orig_cpu debug earlyprintk=serial slub_debug=UZ"
+        -m 2G
+        -net user
+        -net nic
+    )
 else
-    qemu-system-x86_64 \
-        -m 2G \
-        -smp 2 \
-        -kernel "$IMG" \
-        -append "console=ttyS0 root=/dev/sda earlyprintk=serial net.ifnames=0" \
-        -drive file="$DEBIAN_IMG",format=raw,file.locking=off \
-        -net user,host=10.0.2.10 \
-        -net nic,model=e1000 \
-        -enable-kvm \
-        -nographic > "$LOG_FILE" 2>&1 &
+    QEMU_CMD=(
+        qemu-system-x86_64
+        -m 2G
+        -smp 2
+        -kernel "$IMG"
+        -append "console=ttyS0 ${ROOT:-root=/dev/sda} earlyprintk=serial net.ifnames=0"
+        "${ROOT_ARGS[@]}"
+        -net user,host=10.0.2.10
+        -net nic,model=e1000
+        -enable-kvm
+        -nographic
+    )
+fi
+
+# A log file of "-" hands the console to the caller, which monitors and stops QEMU itself
+if [ "$LOG_FILE" = "-" ]; then
+    exec "${QEMU_CMD[@]}" 2>&1
 fi
 
+rm -f "$LOG_FILE"
+"${QEMU_CMD[@]}" > "$LOG_FILE" 2>&1 &
+
 # Waiting for Login Prompt
 PID=$!
 
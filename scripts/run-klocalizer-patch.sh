@@ -7,7 +7,11 @@ KERNEL_SRC=$1
 PATCH_FILE=$2
 LOG_FILE=$3
 ARCH=$4
-EXTRA_ARGS=("${@:5}")
+INPUT_CONFIG=$5
+OUTPUT_CONFIG=$6
+SCRATCH_DIR=$7
+FORMULAS=${8:-$KERNEL_SRC/.kmax}
+EXTRA_ARGS=("${@:9}")
 
 # Validate Dependencies
 if [ -z "$SUPERC_PATH" ] || [ ! -f "$SUPERC_PATH" ]; then
@@ -25,13 +29,27 @@ if [ ! -f "$PATCH_FILE" ]; then
     exit 1
 fi
 
+if [ ! -f "$INPUT_CONFIG" ]; then
+    echo "[ERROR] Input config $INPUT_CONFIG does not exist." > "$LOG_FILE"
+    exit 1
+fi
+
+if [ ! -d "$SCRATCH_DIR" ]; then
+    echo "[ERROR] Scratch directory $SCRATCH_DIR does not exist." > "$LOG_FILE"
+    exit 1
+fi
+
 # Running KLocalizer
-cd $KERNEL_SRC
+# Everything is written to the scratch dir, so the kernel tree is only read and runs can overlap
+cd "$SCRATCH_DIR"
 rm -f "$LOG_FILE"
+cp "$INPUT_CONFIG" base.config
 
 LLVM=1 CC="clang -fintegrated-as" LD=ld.lld \
         klocalizer -a $ARCH \
-        --repair "$KERNEL_SRC/.config" \
+        --linux-ksrc "$KERNEL_SRC" \
+        --formulas "$FORMULAS/" \
+        --repair base.config \
         --include-mutex $PATCH_FILE \
         "${EXTRA_ARGS[@]}" > "$LOG_FILE" 2>&1
         
@@ -42,7 +60,12 @@ if [ $KLOCALIZER_EXIT -ne 0 ]; then
     exit $KLOCALIZER_EXIT
 fi
 
-mv "0-$ARCH.config" ".config"
-make LLVM=1 ARCH=$ARCH olddefconfig || { cd "$WORKING_DIR"; exit 1; }
+# olddefconfig writes build state, so it goes to the scratch dir with O=. A tree holding in-tree
+# build state refuses O=. Only trees built in-tree may then run it in the tree, once no in-tree
+# build holds the tree lock; any other tree would be left dirty for its O= builds.
+make -C "$KERNEL_SRC" O="$SCRATCH_DIR/build" LLVM=1 ARCH=$ARCH KCONFIG_CONFIG="$SCRATCH_DIR/0-$ARCH.config" olddefconfig > /dev/null 2>&1 || \
+    { [ -n "$OLDDEFCONFIG_IN_TREE" ] && flock "$KERNEL_SRC" make -C "$KERNEL_SRC" LLVM=1 ARCH=$ARCH KCONFIG_CONFIG="$SCRATCH_DIR/0-$ARCH.config" olddefconfig; } || \
+    { echo "[ERROR] olddefconfig failed in $SCRATCH_DIR/build; $KERNEL_SRC may hold in-tree build state (make mrproper)." >> "$LOG_FILE"; cd "$WORKING_DIR"; exit 1; }
+cp "0-$ARCH.config" "$OUTPUT_CONFIG"
 
 cd "$WORKING_DIR"
@@ -1,4 +1,4 @@
-from .tools import agent_tools
+from .tools import agent_tools, ToolContext
 from .session import Session
 from .prompt import prompt
 from .model import model
@@ -0,0 +1,52 @@
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.outputs import ChatGeneration
+from langchain_core.messages import AIMessage
+from langchain_core.load import dumps, loads
+from singleton_decorator import singleton
+from src.config import settings
+from src.utils import text_digest, read_json, write_json
+import json
+
+# Set per call by the provider, so they never match between a recording and a replay.
+VOLATILE_KEYS = ('id', 'response_metadata', 'usage_metadata')
+
+@singleton
+class LLMCache(BaseCache):
+
+    def key(self, prompt: str, llm_string: str) -> str:
+        return f'{settings.agent.MODEL}/{text_digest(self.normalize(prompt) + llm_string)}'
+
+    def path(self, key: str) -> str:
+        return f'{settings.kernel.LLM_CACHE_DIR}/{key}.json'
+
+    def normalize(self, prompt: str) -> str:
+
+        messages = json.loads(prompt)
+        for message in messages:
+            for name in VOLATILE_KEYS:
+                message.get('kwargs', {}).pop(name, None)
+
+        return json.dumps(messages, sort_keys=True)
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+
+        if settings.runtime.LLM_CACHE == 'record':
+            return None
+
+        key = self.key(prompt, llm_string)
+        data = read_json(self.path(key))
+        if data is not None:
+            return loads(data['generations'], allowed_objects=[ChatGeneration, AIMessage])
+
+        if settings.runtime.LLM_CACHE == 'replay':
+            raise RuntimeError(f'No recorded LLM response for {key} in replay mode.')
+
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        write_json(self.path(self.key(prompt, llm_string)), {'model': settings.agent.MODEL, 'generations': dumps(return_val)})
+
+    def clear(self, **kwargs):
+        pass
+
+llm_cache = LLMCache()
@@ -4,19 +4,38 @@ from langchain_core.language_models import BaseChatModel
 from singleton_decorator import singleton
 from langchain_openai import ChatOpenAI
 from src.config import settings
+from .llmcache import llm_cache
+import threading
 
 @singleton
 class Model:
 
+    def __init__(self):
+        self.__llms: dict[tuple[str, bool], BaseChatModel] = {}
+        self.__lock = threading.Lock()
+
     def get_llm(self) -> BaseChatModel:
 
+        # One client per model keeps its connection pool alive across attempts and sessions.
+        key = (settings.agent.MODEL, settings.runtime.LLM_CACHE != 'off')
+
+        with self.__lock:
+            if key not in self.__llms:
+                self.__llms[key] = self.__create_llm()
+
+            return self.__llms[key]
+
+    def __create_llm(self) -> BaseChatModel:
+
+        cache = llm_cache if settings.runtime.LLM_CACHE != 'off' else None
+
         if settings.agent.PROVIDER == 'openai':
             if settings.agent.OPENAI_API_KEY:
-                return ChatOpenAI(model_name=settings.agent.MODEL, api_key=settings.agent.OPENAI_API_KEY)
+                return ChatOpenAI(model_name=settings.agent.MODEL, api_key=settings.agent.OPENAI_API_KEY, cache=cache)
             raise ValueError('OpenAI API key is not configured.')
         if settings.agent.PROVIDER == 'google':
             if settings.agent.GOOGLE_API_KEY:
-                return ChatGoogleGenerativeAI(model=settings.agent.MODEL, api_key=settings.agent.GOOGLE_API_KEY)
+                return ChatGoogleGenerativeAI(model=settings.agent.MODEL, api_key=settings.agent.GOOGLE_API_KEY, cache=cache)
             raise ValueError('Google API key is not configured.')
         raise ValueError(f'Unknown model provider for model: {settings.agent.MODEL}')
 
@@ -8,27 +8,50 @@ from .session import Session
 @singleton
 class Prompt:
 
-	def system(self, session: Session) -> SystemMessage:
+	def system(self) -> SystemMessage:
+		# Nothing session specific goes here, so every request starts with the same cacheable prefix.
 		return SystemMessage(content=
 			self.__role() +
 			self.__kconfig_explanation() +
 			self.__workflow() +
-			self.__constraints(session) +
 			self.__goal()
 		)
 
-	def user(self, session: Session) -> HumanMessage:
+	def session(self, session: Session) -> HumanMessage:
+		# The history itself follows as one block per attempt, so this block is the same for the whole session.
+		return HumanMessage(content=self.__constraints(session) + 'HISTORY')
+
+	def attempt(self, i: int, attempt: Attempt) -> HumanMessage:
+		if i == 0:
+			return HumanMessage(content=self.__format_initial(attempt))
+
+		return HumanMessage(content=self.__format_attempt(i, attempt).lstrip('\n'))
+
+	def current(self, session: Session) -> HumanMessage:
 		past_attempts = session.attempts[:-1]
 		content = self.__instructions(len(past_attempts))
-		content += self.__history(past_attempts)
-		
+
 		if past_attempts:
 			content += self.__current_failure(past_attempts[-1])
-				
+		else:
+			content = 'None. This is the first attempt.\n\n' + content
+
 		return HumanMessage(content=content)
 
-	def prompt(self, session: Session) -> list[BaseMessage]:
-		return [self.system(session), self.user(session)]
+	def prompt(self, session: Session, thread: list[BaseMessage] | None = None) -> list[BaseMessage]:
+		past_attempts = session.attempts[:-1]
+
+		# A continued thread already holds the blocks up to the previous attempt and the replies to them.
+		if thread and len(past_attempts) > 1:
+			return [*thread, self.attempt(len(past_attempts) - 1, past_attempts[-1]), self.current(session)]
+
+		# Blocks are only ever appended, so each request shares the previous request's prefix up to the last attempt.
+		return [
+			self.system(),
+			self.session(session),
+			*(self.attempt(i, attempt) for i, attempt in enumerate(past_attempts)),
+			self.current(session),
+		]
 
 	def __role(self) -> str:
 		return (
@@ -73,14 +96,33 @@ class Prompt:
 			'5. If the same error persists after defining an option, the root cause is likely a missing '
 			'dependency. Search for related options or grep the config for options referenced in the error.\n'
 			'6. Respond with the complete cumulative define and undefine lists and clear reasoning '
-			'explaining which error each change addresses.\n\n'
+			f'explaining which error each change addresses.{self.__dry_run_instruction()}{self.__beam_instruction()}\n\n'
+		)
+
+	def __beam_instruction(self) -> str:
+		if settings.agent.BEAM_WIDTH <= 1:
+			return ''
+
+		return (
+			f' Respond with up to {settings.agent.BEAM_WIDTH} candidate fixes, ranked from most to least likely to boot. '
+			'Each candidate is a complete, independent set of define and undefine lists, and all of them are '
+			'built and booted in parallel, so make them differ in the hypothesis they test.'
+		)
+
+	def __dry_run_instruction(self) -> str:
+		if not settings.runtime.DRY_RUN_TOOL:
+			return ''
+
+		return (
+			' Before responding, you can use check_constraints to confirm the lists are satisfiable '
+			'and see which options KLocalizer changes, without spending an attempt.'
 		)
 
 	def __constraints(self, session: Session) -> str:
 		hard = ''
 		if session.hard_define or session.hard_undefine:
-			define_line = f'  MUST DEFINE: {session.hard_define}\n' if session.hard_define else ''
-			undefine_line = f'  MUST UNDEFINE: {session.hard_undefine}\n' if session.hard_undefine else ''
+			define_line = f'  MUST DEFINE: {sorted(session.hard_define)}\n' if session.hard_define else ''
+			undefine_line = f'  MUST UNDEFINE: {sorted(session.hard_undefine)}\n' if session.hard_undefine else ''
 			hard = f'Hard config constraints (include in every response):\n{define_line}{undefine_line}'
 		return (
 			'CONSTRAINTS\n'
@@ -101,25 +143,13 @@ class Prompt:
 		return (
 			f'ATTEMPT {attempt_num} / {settings.agent.MAX_ITERATIONS}\n\n'
 			'INSTRUCTIONS\n'
-			'1. Review the history below to identify the current failure stage and what has already been tried.\n'
+			'1. Review the history above to identify the current failure stage and what has already been tried.\n'
 			'2. Grep for "error:" or "panic" in the relevant log to pinpoint the root cause.\n'
 			'3. Look up the implicated options in the original config (and latest config if available).\n'
 			'4. Respond with the COMPLETE cumulative define and undefine lists (every option you want changed, '
 			f'not just new additions). Constraints: {settings.agent.MAX_TOOL_CALLS} tool calls.\n\n'
 		)
 
-	def __history(self, past_attempts: list[Attempt]) -> str:
-		content = 'HISTORY\n'
-		if not past_attempts:
-			return content + 'None. This is the first attempt.'
-		
-		content += self.__format_initial(past_attempts[0])
-
-		for i, attempt in enumerate(past_attempts[1:], 1):
-			content += self.__format_attempt(i, attempt)
-		
-		return content
-
 	def __current_failure(self, attempt: Attempt) -> str:
 		content = ''
 		if attempt.build_summary:
@@ -149,7 +179,35 @@ class Prompt:
 			f'  Boot:       {attempt.boot_succeeded}\n'
 			f'  Defined:    {define}\n'
 			f'  Undefined:  {undefine}\n'
+			f'{self.__format_corrections(attempt)}'
 			f'  Reasoning:  {reasoning}\n'
+			f'{self.__format_candidates(attempt)}'
+		)
+
+	def __format_candidates(self, attempt: Attempt) -> str:
+		if not attempt.candidates:
+			return ''
+
+		content = f'  Candidates (candidate {attempt.adopted} adopted above):\n'
+		for candidate in attempt.candidates:
+			if candidate.stopped:
+				outcome = 'stopped, another candidate booted'
+			else:
+				build_status = 'Success' if candidate.build_succeeded else 'Failed'
+				outcome = f'KLocalizer {candidate.klocalizer_status}, Build {build_status}, Boot {candidate.boot_succeeded}'
+			define = candidate.response.define if candidate.response else None
+			undefine = candidate.response.undefine if candidate.response else None
+			content += f'    {candidate.rank}: {outcome}; Defined {define}; Undefined {undefine}\n'
+		return content
+
+	def __format_corrections(self, attempt: Attempt) -> str:
+		if not attempt.symbol_corrections:
+			return ''
+
+		corrections = ', '.join(
+			f'{option} -> {corrected}' if corrected else f'{option} (unknown, dropped)'
+			for option, corrected in attempt.symbol_corrections.items()
 		)
+		return f'  Symbols:    {corrections}\n'
 
 prompt = Prompt()
@@ -1,5 +1,6 @@
 
 from src.models import Attempt, LLMUsage, EmbeddingUsage
+from langchain_core.messages.base import BaseMessage
 from src.kernel import diffconfig
 from src.config import settings
 from typing import Tuple
@@ -15,6 +16,14 @@ class Session:
         self.patch = patch
         self.hard_define = hard_define
         self.hard_undefine = hard_undefine
+        self.thread: list[BaseMessage] = []
+
+    def apply_hard_constraints(self, define: list[str], undefine: list[str]) -> tuple[list[str], list[str]]:
+
+        define = list((set(define) - self.hard_undefine) | self.hard_define)
+        undefine = list((set(undefine) - self.hard_define) | self.hard_undefine)
+
+        return define, undefine
 
     @property
     def latest(self) -> str | None:
@@ -47,6 +56,7 @@ class Session:
             input_tokens=sum(a.token_usage.input_tokens for a in self.attempts),
             output_tokens=sum(a.token_usage.output_tokens for a in self.attempts),
             total_tokens=sum(a.token_usage.total_tokens for a in self.attempts),
+            cached_input_tokens=sum(a.token_usage.cached_input_tokens for a in self.attempts),
         )
 
     @property
@@ -61,6 +71,19 @@ class Session:
     def total_boot_time(self) -> float:
         return sum(a.boot_time for a in self.attempts)
 
+    @property
+    def build_phases(self) -> dict[str, float]:
+        phases: dict[str, float] = {}
+        for a in self.attempts:
+            for phase, duration in (a.build_phases or {}).items():
+                phases[phase] = phases.get(phase, 0.0) + duration
+
+        return phases
+
+    @property
+    def boot_milestones(self) -> list[dict[str, float]]:
+        return [a.boot_milestones for a in self.attempts if a.boot_milestones]
+
     @property
     def embedding_usage(self) -> EmbeddingUsage:
         return EmbeddingUsage(
@@ -68,6 +91,15 @@ class Session:
             boot_log_tokens=sum(a.embedding_usage.boot_log_tokens for a in self.attempts),
         )
 
+    @property
+    def artifact_store(self) -> dict:
+        return {
+            'build_hits': sum(1 for a in self.attempts if a.build_cached is True),
+            'build_misses': sum(1 for a in self.attempts if a.build_cached is False),
+            'boot_hits': sum(1 for a in self.attempts if a.boot_cached is True),
+            'boot_misses': sum(1 for a in self.attempts if a.boot_cached is False),
+        }
+
     @property
     def constraints(self) -> dict:
         if self.status == 'success':
@@ -122,6 +154,9 @@ class Session:
                 'embedding': settings.agent.EMBEDDING_MODEL if settings.runtime.USE_RAG else None,
             },
             'constraints': self.constraints,
+            'artifact_store': self.artifact_store,
+            'build_phases': self.build_phases,
+            'boot_milestones': self.boot_milestones,
             'llm_token_usage': self.token_usage.model_dump(),
             'embedding_token_usage': self.embedding_usage.model_dump(),
             'attempts': [attempt.model_dump() for attempt in self.attempts],
@@ -1,15 +1,43 @@
 from langchain_core.tools import StructuredTool, tool
 from src.models import ToolCall, EmbeddingUsage
+from langchain.tools import ToolRuntime
 from singleton_decorator import singleton
+from typing import TYPE_CHECKING
+from src.kernel import diffconfig
 from src.config import settings
 from .search import LogSearch
 from .session import Session
+import tempfile
 import re
 import os
 
+if TYPE_CHECKING:
+    from src.core.kernel import Kernel
+
+class ToolContext:
+
+    def __init__(self, session: Session, kernel: 'Kernel | None' = None, build_rag: LogSearch | None = None, boot_rag: LogSearch | None = None):
+
+        self.session = session
+        self.kernel = kernel
+        self.build_rag = build_rag
+        self.boot_rag = boot_rag
+
+    @property
+    def previous(self):
+        return self.session.attempts[-2]
+
+    @property
+    def current(self):
+        return self.session.attempts[-1]
+
 @singleton
 class AgentTools:
 
+    def __init__(self):
+        # Built once; every call reads the session it works on from the invocation's ToolContext.
+        self.__tools: dict[str, StructuredTool] = {t.name: t for t in self.__config_tools() + self.__klocalizer_tools() + self.__rag_tools() + self.__file_tools()}
+
     def __grep(self, path: str, pattern: str) -> list[str]:
 
         if not os.path.exists(path):
@@ -77,105 +105,144 @@ class AgentTools:
 
         return results
 
-    def __get_rag_tools(self, session: Session) -> list[StructuredTool]:
-
-        prev_attempt = session.attempts[-2]
+    def __config_diff(self, base: str, config: str) -> list[str]:
 
-        build_rag = LogSearch(prev_attempt.build_log, type='build') if prev_attempt.build_log else None
-        boot_rag = LogSearch(prev_attempt.boot_log, type='boot') if prev_attempt.boot_log else None
+        old = diffconfig.parse(base)
+        new = diffconfig.parse(config)
 
-        embedding_usage = EmbeddingUsage(
-            build_log_tokens=build_rag.token_usage if build_rag else 0,
-            boot_log_tokens=boot_rag.token_usage if boot_rag else 0,
-        )
+        changes = [
+            f'{key}: {old.get(key, "n")} -> {new.get(key, "n")}'
+            for key in sorted(old.keys() | new.keys())
+            if old.get(key) != new.get(key)
+        ]
 
-        session.attempts[-1].embedding_usage = embedding_usage
+        total = len(changes)
+        truncated = changes[:50]
+        if total > 50:
+            truncated.append(f'... {total - 50} more changes not shown.')
 
-        tools = []
+        return truncated
 
-        if build_rag:
+    def __klocalizer_tools(self) -> list[StructuredTool]:
 
-            @tool
-            def search_build_log(query: str) -> str:
-                """
-                Search for specific information in the build log of the latest attempt.
+        @tool
+        def check_constraints(define: list[str], undefine: list[str], runtime: ToolRuntime[ToolContext]) -> str:
+            """
+            Dry-run a define and undefine list through KLocalizer without building or booting.
+            Use it to check that a constraint set is satisfiable and to see which options
+            KLocalizer changes to satisfy it before submitting your response.
 
-                Args:
-                    query (str): A string query to search for in the build log.
-                Returns:
-                    str: A string containing the relevant information from the build log that matches the query
-                """
-                results, tokens = build_rag.query(query)
-                session.attempts[-1].tool_calls.append(ToolCall(
-                    name='search_build_log',
-                    args={ 'query': query },
-                    response=results,
-                    token_usage=EmbeddingUsage(build_log_tokens=tokens),
-                ))
+            Args:
+                define (list[str]): Configuration options to define.
+                undefine (list[str]): Configuration options to undefine.
+            Returns:
+                str: The satisfiability verdict and the options that change compared to the original config.
+            """
+            session, kernel = runtime.context.session, runtime.context.kernel
+            attempt = runtime.context.current
+            # Parallel calls in one turn each get their own directory so their outputs never overlap.
+            os.makedirs(f'{attempt.dir}/dry-run', exist_ok=True)
+            dry_run_dir = tempfile.mkdtemp(prefix=f'{sum(1 for call in attempt.tool_calls if call.name == "check_constraints")}-', dir=f'{attempt.dir}/dry-run')
+
+            resolved_define, resolved_undefine, corrections = kernel.check_symbols(define, undefine)
+            resolved_define, resolved_undefine = session.apply_hard_constraints(resolved_define, resolved_undefine)
+
+            result = kernel.run_klocalizer(dry_run_dir, session.base, resolved_define, resolved_undefine)
+
+            results = [f'{option} -> {corrected}' if corrected else f'{option} is not a Kconfig symbol and was dropped.' for option, corrected in corrections.items()]
+            if result.status == 'success':
+                changes = self.__config_diff(session.base, result.config)
+                if changes:
+                    results.append(f'Satisfiable. {len(changes)} options change compared to the original config:')
+                else:
+                    results.append('Satisfiable. No options change compared to the original config.')
+                results.extend(changes)
+            elif result.status == 'no-satisfying-constraints':
+                results.append('Unsatisfiable. KLocalizer found no config that meets these constraints.')
+            else:
+                results.append('KLocalizer failed to run on these constraints.')
 
-                return results
+            attempt.tool_calls.append(ToolCall(
+                name='check_constraints',
+                args={ 'define': define, 'undefine': undefine },
+                response=results,
+            ))
 
-            tools.append(search_build_log)
+            return '\n'.join(results)
 
-        if boot_rag:
+        return [check_constraints]
 
-            @tool
-            def search_boot_log(query: str) -> str:
-                """
-                Search for specific information in the boot log of the latest attempt.
+    def __rag_tools(self) -> list[StructuredTool]:
 
-                Args:
-                    query (str): A string query to search for in the boot log.
-                Returns:
-                    str: A string containing the relevant information from the boot log that matches the query
-                """
-                results, tokens = boot_rag.query(query)
-                session.attempts[-1].tool_calls.append(ToolCall(
-                    name='search_boot_log',
-                    args={ 'query': query },
-                    response=results,
-                    token_usage=EmbeddingUsage(boot_log_tokens=tokens),
-                ))
+        @tool
+        def search_build_log(query: str, runtime: ToolRuntime[ToolContext]) -> str:
+            """
+            Search for specific information in the build log of the latest attempt.
 
-                return results
+            Args:
+                query (str): A string query to search for in the build log.
+            Returns:
+                str: A string containing the relevant information from the build log that matches the query
+            """
+            results, tokens = runtime.context.build_rag.query(query)
+            runtime.context.current.tool_calls.append(ToolCall(
+                name='search_build_log',
+                args={ 'query': query },
+                response=results,
+                token_usage=EmbeddingUsage(build_log_tokens=tokens),
+            ))
 
-            tools.append(search_boot_log)
+            return results
 
-        if session.patch is not None:
+        @tool
+        def search_boot_log(query: str, runtime: ToolRuntime[ToolContext]) -> str:
+            """
+            Search for specific information in the boot log of the latest attempt.
 
-            @tool
-            def search_patch(options: list[str]) -> str:
-                """
-                Search for specific configuration options by name in the patch file.
+            Args:
+                query (str): A string query to search for in the boot log.
+            Returns:
+                str: A string containing the relevant information from the boot log that matches the query
+            """
+            results, tokens = runtime.context.boot_rag.query(query)
+            runtime.context.current.tool_calls.append(ToolCall(
+                name='search_boot_log',
+                args={ 'query': query },
+                response=results,
+                token_usage=EmbeddingUsage(boot_log_tokens=tokens),
+            ))
 
-                Args:
-                    options (list[str]): A list of configuration option names to look up in the patch.
-                Returns:
-                    str: A string containing the lines from the patch that reference each option.
-                """
-                results = []
-                for option in options:
-                    matches = self.__grep(session.patch, option)
-                    results.extend(matches if matches else [f'{option} not found in patch.'])
+            return results
 
-                session.attempts[-1].tool_calls.append(ToolCall(
-                    name='search_patch',
-                    args={ 'options': options },
-                    response=results,
-                ))
+        @tool
+        def search_patch(options: list[str], runtime: ToolRuntime[ToolContext]) -> str:
+            """
+            Search for specific configuration options by name in the patch file.
 
-                return '\n'.join(results)
+            Args:
+                options (list[str]): A list of configuration option names to look up in the patch.
+            Returns:
+                str: A string containing the lines from the patch that reference each option.
+            """
+            results = []
+            for option in options:
+                matches = self.__grep(runtime.context.session.patch, option)
+                results.extend(matches if matches else [f'{option} not found in patch.'])
 
-            tools.append(search_patch)
+            runtime.context.current.tool_calls.append(ToolCall(
+                name='search_patch',
+                args={ 'options': options },
+                response=results,
+            ))
 
-        return tools
+            return '\n'.join(results)
 
-    def __get_file_tools(self, session: Session) -> list[StructuredTool]:
+        return [search_build_log, search_boot_log, search_patch]
 
-        prev_attempt = session.attempts[-2]
+    def __file_tools(self) -> list[StructuredTool]:
 
         @tool
-        def grep_patch(pattern: str) -> str:
+        def grep_patch(pattern: str, runtime: ToolRuntime[ToolContext]) -> str:
             """
             Search for a pattern in the patch file that was applied to produce the broken config.
 
@@ -184,8 +251,8 @@ class AgentTools:
             Returns:
                 str: A string containing the lines from the patch file that match the pattern.
             """
-            results = self.__grep(session.patch, pattern)
-            session.attempts[-1].tool_calls.append(ToolCall(
+            results = self.__grep(runtime.context.session.patch, pattern)
+            runtime.context.current.tool_calls.append(ToolCall(
                 name='grep_patch',
                 args={ 'pattern': pattern },
                 response=results,
@@ -194,7 +261,7 @@ class AgentTools:
             return '\n'.join(results)
 
         @tool
-        def chunk_patch(line: int) -> str:
+        def chunk_patch(line: int, runtime: ToolRuntime[ToolContext]) -> str:
             """
             Get a chunk of lines from the patch file centered around a specific line number.
 
@@ -203,8 +270,8 @@ class AgentTools:
             Returns:
                 str: A string containing the lines from the patch file within the chunk.
             """
-            results = self.__chunk(session.patch, line)
-            session.attempts[-1].tool_calls.append(ToolCall(
+            results = self.__chunk(runtime.context.session.patch, line)
+            runtime.context.current.tool_calls.append(ToolCall(
                 name='chunk_patch',
                 args={ 'line': line },
                 response=results,
@@ -213,7 +280,7 @@ class AgentTools:
             return '\n'.join(results)
 
         @tool
-        def grep_build_log(pattern: str) -> str:
+        def grep_build_log(pattern: str, runtime: ToolRuntime[ToolContext]) -> str:
             """
             Search the build log of the latest attempt for lines matching a pattern.
             Start broad — patterns like "error:" are a good starting point — then narrow
@@ -224,8 +291,8 @@ class AgentTools:
             Returns:
                 str: Matching lines with line numbers, or a message indicating no matches.
             """
-            results = self.__grep(prev_attempt.build_log, pattern)
-            session.attempts[-1].tool_calls.append(ToolCall(
+            results = self.__grep(runtime.context.previous.build_log, pattern)
+            runtime.context.current.tool_calls.append(ToolCall(
                 name='grep_build_log',
                 args={ 'pattern': pattern },
                 response=results,
@@ -234,7 +301,7 @@ class AgentTools:
             return '\n'.join(results)
 
         @tool
-        def chunk_build_log(line: int) -> str:
+        def chunk_build_log(line: int, runtime: ToolRuntime[ToolContext]) -> str:
             """
             Get a chunk of lines from the build log of the latest attempt, centered around a specific line number.
 
@@ -243,8 +310,8 @@ class AgentTools:
             Returns:
                 str: A string containing the lines from the build log that are within the chunk
             """
-            results = self.__chunk(prev_attempt.build_log, line)
-            session.attempts[-1].tool_calls.append(ToolCall(
+            results = self.__chunk(runtime.context.previous.build_log, line)
+            runtime.context.current.tool_calls.append(ToolCall(
                 name='chunk_build_log',
                 args={ 'line': line },
                 response=results,
@@ -253,7 +320,7 @@ class AgentTools:
             return '\n'.join(results)
 
         @tool
-        def grep_boot_log(pattern: str) -> str:
+        def grep_boot_log(pattern: str, runtime: ToolRuntime[ToolContext]) -> str:
             """
             Search the boot log of the latest attempt for lines matching a pattern.
             Start broad — patterns like "error|panic|failed" or "BUG|WARNING" are good
@@ -265,8 +332,8 @@ class AgentTools:
             Returns:
                 str: Matching lines with line numbers, or a message indicating no matches.
             """
-            results = self.__grep(prev_attempt.boot_log, pattern)
-            session.attempts[-1].tool_calls.append(ToolCall(
+            results = self.__grep(runtime.context.previous.boot_log, pattern)
+            runtime.context.current.tool_calls.append(ToolCall(
                 name='grep_boot_log',
                 args={ 'pattern': pattern },
                 response=results,
@@ -275,7 +342,7 @@ class AgentTools:
             return '\n'.join(results)
 
         @tool
-        def chunk_boot_log(line: int) -> str:
+        def chunk_boot_log(line: int, runtime: ToolRuntime[ToolContext]) -> str:
             """
             Get a chunk of lines from the boot log of the latest attempt, centered around a specific line number.
 
@@ -284,8 +351,8 @@ class AgentTools:
             Returns:
                 str: A string containing the lines from the boot log that are within the chunk
             """
-            results = self.__chunk(prev_attempt.boot_log, line)
-            session.attempts[-1].tool_calls.append(ToolCall(
+            results = self.__chunk(runtime.context.previous.boot_log, line)
+            runtime.context.current.tool_calls.append(ToolCall(
                 name='chunk_boot_log',
                 args={ 'line': line },
                 response=results,
@@ -293,25 +360,12 @@ class AgentTools:
 
             return '\n'.join(results)
 
-        tools = []
-
-        if session.patch is not None:
-            tools.extend([grep_patch, chunk_patch])
+        return [grep_patch, chunk_patch, grep_build_log, chunk_build_log, grep_boot_log, chunk_boot_log]
 
-        if prev_attempt.build_log is not None:
-            tools.extend([grep_build_log, chunk_build_log])
-
-        if prev_attempt.boot_log is not None:
-            tools.extend([grep_boot_log, chunk_boot_log])
-
-        return tools
-
-    def get(self, session: Session) -> list[StructuredTool]:
-
-        prev_config = session.attempts[-2].config if len(session.attempts) >= 2 else None
+    def __config_tools(self) -> list[StructuredTool]:
 
         @tool
-        def search_original_config(options: list[str]) -> str:
+        def search_original_config(options: list[str], runtime: ToolRuntime[ToolContext]) -> str:
             """
             Search for the presence of specific configuration options in the original config file.
 
@@ -320,8 +374,8 @@ class AgentTools:
             Returns:
                 str: A string containing the values of the options searched for that were found in the original config file.
             """
-            results = self.__search_config(session.base, options)
-            session.attempts[-1].tool_calls.append(ToolCall(
+            results = self.__search_config(runtime.context.session.base, options)
+            runtime.context.current.tool_calls.append(ToolCall(
                 name='search_original_config',
                 args={ 'options': options },
                 response=results,
@@ -330,7 +384,7 @@ class AgentTools:
             return results
 
         @tool
-        def search_latest_config(options: list[str]) -> str:
+        def search_latest_config(options: list[str], runtime: ToolRuntime[ToolContext]) -> str:
             """
             Search for the presence of specific configuration options in the latest modified config file.
 
@@ -339,8 +393,8 @@ class AgentTools:
             Returns:
                 str: A string containing the values of the options searched for that were found in the latest modified config file.
             """
-            results = self.__search_config(prev_config, options)
-            session.attempts[-1].tool_calls.append(ToolCall(
+            results = self.__search_config(runtime.context.previous.config, options)
+            runtime.context.current.tool_calls.append(ToolCall(
                 name='search_latest_config',
                 args={ 'options': options },
                 response=results,
@@ -348,16 +402,53 @@ class AgentTools:
 
             return results
 
-        tools = [search_original_config]
+        return [search_original_config, search_latest_config]
+
+    def context(self, session: Session, kernel: 'Kernel | None' = None) -> ToolContext:
+
+        context = ToolContext(session, kernel)
+        if not settings.runtime.USE_RAG:
+            return context
+
+        prev_attempt = session.attempts[-2]
+        context.build_rag = LogSearch(prev_attempt.build_log, type='build') if prev_attempt.build_log else None
+        context.boot_rag = LogSearch(prev_attempt.boot_log, type='boot') if prev_attempt.boot_log else None
+
+        session.attempts[-1].embedding_usage = EmbeddingUsage(
+            build_log_tokens=context.build_rag.token_usage if context.build_rag else 0,
+            boot_log_tokens=context.boot_rag.token_usage if context.boot_rag else 0,
+        )
+
+        return context
+
+    def get(self, session: Session, kernel: 'Kernel | None' = None) -> list[StructuredTool]:
+
+        prev_attempt = session.attempts[-2] if len(session.attempts) >= 2 else None
+        prev_config = prev_attempt.config if prev_attempt else None
+
+        names = ['search_original_config']
 
         if prev_config is not None and prev_config != session.base:
-            tools.append(search_latest_config)
+            names.append('search_latest_config')
 
         if settings.runtime.USE_RAG:
-            tools.extend(self.__get_rag_tools(session))
+            if prev_attempt.build_log:
+                names.append('search_build_log')
+            if prev_attempt.boot_log:
+                names.append('search_boot_log')
+            if session.patch is not None:
+                names.append('search_patch')
         else:
-            tools.extend(self.__get_file_tools(session))
+            if session.patch is not None:
+                names.extend(['grep_patch', 'chunk_patch'])
+            if prev_attempt.build_log is not None:
+                names.extend(['grep_build_log', 'chunk_build_log'])
+            if prev_attempt.boot_log is not None:
+                names.extend(['grep_boot_log', 'chunk_boot_log'])
+
+        if kernel is not None and settings.runtime.DRY_RUN_TOOL:
+            names.append('check_constraints')
 
-        return tools
+        return [self.__tools[name] for name in names]
 
 agent_tools = AgentTools()
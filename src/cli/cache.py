@@ -0,0 +1,46 @@
+from src.config import settings
+from src.kernel import builder
+from src.utils import log
+import subprocess
+import click
+import os
+
+def format_size(size: int) -> str:
+	for unit in ['B', 'KB', 'MB', 'GB']:
+		if size < 1024:
+			return f'{size:.1f} {unit}'
+		size /= 1024
+
+	return f'{size:.1f} TB'
+
+@click.group()
+def main():
+	pass
+
+@main.command()
+def show():
+
+	log.info(f'Compiler cache directory: {settings.kernel.CCACHE_DIR}')
+	log.info(f'Compiler cache size: {format_size(builder.cache_size())}')
+
+	if not os.path.exists(settings.kernel.CCACHE_DIR):
+		return
+
+	env = {**os.environ, 'CCACHE_DIR': settings.kernel.CCACHE_DIR}
+	result = subprocess.run(['ccache', '--show-stats'], env=env, capture_output=True, text=True, check=False)
+	if result.returncode == 0:
+		log.info(result.stdout.rstrip())
+
+@main.command()
+@click.option('--max-size', default='20G', help='Size to trim the compiler cache down to (ccache size format, e.g. 20G).')
+def trim(max_size: str):
+
+	before = builder.cache_size()
+	if not builder.trim_cache(max_size):
+		log.error('Failed to trim the compiler cache.')
+		return
+
+	log.success(f'Compiler cache trimmed from {format_size(before)} to {format_size(builder.cache_size())}.')
+
+if __name__ == '__main__':
+	main()
@@ -1,8 +1,9 @@
-from src.experiment import experiment_metrics, session_metrics
+from src.experiment import experiment_metrics, session_metrics, session_runner
 from src.config import settings, log_settings
-from src.utils import log, dispatcher
+from src.utils import log, dispatcher, Jobserver
+from contextlib import contextmanager
 from src.kernel import worktree
-from src.models import Sample
+from src.models import Sample, Input
 from typing import Callable
 import subprocess
 import click
@@ -11,7 +12,24 @@ import time
 import sys
 import os
 
-def build_repair_cmd(sample: Sample, kernel_src: str, model: str, jobs: int, iterations: int, arch: str, img: str, mode: str, constraints: str | None = None) -> list[str]:
+@contextmanager
+def shared_jobserver():
+
+	if not settings.runtime.JOBSERVER or settings.runtime.JOBSERVER_FIFO:
+		yield
+		return
+
+	# Builds run in repair subprocesses too, so the fifo is also shared through the environment.
+	with Jobserver(settings.runtime.JOBS) as jobserver:
+		settings.runtime.JOBSERVER_FIFO = jobserver.path
+		os.environ['JOBSERVER_FIFO'] = jobserver.path
+		try:
+			yield
+		finally:
+			settings.runtime.JOBSERVER_FIFO = None
+			os.environ.pop('JOBSERVER_FIFO', None)
+
+def build_repair_cmd(sample: Sample, kernel_src: str, model: str, jobs: int, iterations: int, arch: str, img: str, mode: str, constraints: str | None = None, build_dir_mode: str = 'in-tree', incremental: bool = False, adaptive_boot_timeout: bool = False, artifact_store: bool = False, beam: int = 1, llm_cache: str = 'off') -> list[str]:
 	cmd = [
 		sys.executable, '-u', '-m', 'src.cli.repair',
 		'--output', sample.sample_dir,
@@ -21,6 +39,7 @@ def build_repair_cmd(sample: Sample, kernel_src: str, model: str, jobs: int, ite
 		'--iterations', str(iterations),
 		'--arch', arch,
 		'--img', img,
+		'--build-dir', build_dir_mode,
 	]
 
 	if mode == 'patch':
@@ -30,16 +49,63 @@ def build_repair_cmd(sample: Sample, kernel_src: str, model: str, jobs: int, ite
 
 	if constraints is not None:
 		cmd += ['--constraints', constraints]
+
+	if incremental:
+		cmd += ['--incremental']
+
+	if adaptive_boot_timeout:
+		cmd += ['--adaptive-boot-timeout']
+
+	if artifact_store:
+		cmd += ['--artifact-store']
+
+	if beam > 1:
+		cmd += ['--beam', str(beam)]
+
+	if llm_cache != 'off':
+		cmd += ['--llm-cache', llm_cache]
 	
 	return cmd
 
+def build_repair_input(sample: Sample, mode: str, constraints: str | None = None) -> Input:
+
+	if mode == 'patch':
+		return Input(original_config=sample.original_config, modified_config=sample.modified_config, patch=sample.patch, hard_constraints=constraints)
+
+	return Input(original_config=sample.original_config, hard_constraints=constraints)
+
+def build_repair_settings(model: str, jobs: int, iterations: int, arch: str, img: str, build_dir_mode: str = 'in-tree', incremental: bool = False, adaptive_boot_timeout: bool = False, artifact_store: bool = False, beam: int = 1, llm_cache: str = 'off') -> dict[str, dict]:
+	overrides = {
+		'runtime': {
+			'JOBS': jobs,
+			'BUILD_DIR_MODE': build_dir_mode,
+			'INCREMENTAL': incremental,
+			'ADAPTIVE_BOOT_TIMEOUT': adaptive_boot_timeout,
+			'ARTIFACT_STORE': artifact_store,
+			'LLM_CACHE': llm_cache,
+		},
+		'agent': {
+			'MODEL': model,
+			'MAX_ITERATIONS': iterations,
+			'BEAM_WIDTH': beam,
+		},
+		'kernel': {
+			'ARCH': arch,
+		},
+	}
+
+	if img is not None:
+		overrides['kernel']['DEBIAN_IMG'] = os.path.abspath(img)
+
+	return overrides
+
 def load_samples(output_dir: str) -> list[Sample]:
 	with open(f'{output_dir}/sampling.json', 'r') as f:
 		data = json.load(f)
 	
 	return [Sample(**s) for s in data.get('samples', [])]
 
-def make_task(s: Sample, model: str, jobs: int, iterations: int, arch: str, img: str, mode: str, constraints: str | None = None) -> Callable:
+def make_task(s: Sample, model: str, jobs: int, iterations: int, arch: str, img: str, mode: str, constraints: str | None = None, build_dir_mode: str = 'in-tree', incremental: bool = False, adaptive_boot_timeout: bool = False, artifact_store: bool = False, beam: int = 1, llm_cache: str = 'off', in_process: bool = False) -> Callable:
 	
 	sample_id = int(s.sample_dir.rstrip('/').split('_')[-1])
 
@@ -47,13 +113,17 @@ def make_task(s: Sample, model: str, jobs: int, iterations: int, arch: str, img:
 
 		start = time.time()
 		kernel_src = worktree.create(s.end_commit)
-		cmd = build_repair_cmd(s, kernel_src=kernel_src, model=model, jobs=jobs, iterations=iterations, arch=arch, img=img, mode=mode, constraints=constraints)
-		
 		log_file = f'{s.sample_dir}/terminal.log'
-		
-		os.makedirs(os.path.dirname(log_file), exist_ok=True)
-		with open(log_file, 'w', buffering=1) as f:
-			subprocess.run(cmd, stdout=f, stderr=f)
+
+		if in_process:
+			overrides = build_repair_settings(model=model, jobs=jobs, iterations=iterations, arch=arch, img=img, build_dir_mode=build_dir_mode, incremental=incremental, adaptive_boot_timeout=adaptive_boot_timeout, artifact_store=artifact_store, beam=beam, llm_cache=llm_cache)
+			session_runner.repair(build_repair_input(s, mode, constraints), kernel_src, s.sample_dir, log_file, overrides)
+		else:
+			cmd = build_repair_cmd(s, kernel_src=kernel_src, model=model, jobs=jobs, iterations=iterations, arch=arch, img=img, mode=mode, constraints=constraints, build_dir_mode=build_dir_mode, incremental=incremental, adaptive_boot_timeout=adaptive_boot_timeout, artifact_store=artifact_store, beam=beam, llm_cache=llm_cache)
+
+			os.makedirs(os.path.dirname(log_file), exist_ok=True)
+			with open(log_file, 'w', buffering=1) as f:
+				subprocess.run(cmd, stdout=f, stderr=f)
 		
 		duration = round(time.time() - start, 2)
 		summary_path = f'{s.sample_dir}/agent_repair/summary.json'
@@ -77,7 +147,18 @@ def make_task(s: Sample, model: str, jobs: int, iterations: int, arch: str, img:
 @click.option('--random', 'mode', flag_value='random', default=True, help='Use random config samples (default).')
 @click.option('--constraints', default=None, help='Path to a hard constraints file (OPTION to define, !OPTION to undefine).')
 @click.option('-n', default=None, type=int, help='Number of samples to repair (default: all).')
-def main(jobs: int, threads: int, model: str, iterations: int, arch: str, mode: str, constraints: str | None, n: int | None):
+@click.option('--build-dir', 'build_dir_mode', type=click.Choice(['in-tree', 'attempt', 'lineage']), default='in-tree', help='Where kernels are built: in the source tree, or in an O= directory per attempt or per session.')
+@click.option('--incremental', is_flag=True, help='Build each attempt on top of the previous attempt\'s object tree (with --build-dir attempt).')
+@click.option('--jobserver', is_flag=True, help='Share one make jobserver of --jobs slots across all parallel samples.')
+@click.option('--adaptive-boot-timeout', is_flag=True, help='Set the boot timeout from the history of successful boot times.')
+@click.option('--artifact-store', is_flag=True, help='Reuse build and boot results of previously tested configs from the local artifact store.')
+@click.option('--beam', default=1, type=click.IntRange(min=1), help='Number of ranked candidate fixes to build and boot in parallel per iteration (requires --build-dir attempt or lineage).')
+@click.option('--llm-cache', type=click.Choice(['off', 'record', 'replay', 'record-on-miss']), default='off', help='Record LLM responses to, or replay them from, the local LLM cache.')
+@click.option('--in-process', is_flag=True, help='Run every repair session inside this process instead of one repair subprocess per sample.')
+def main(jobs: int, threads: int, model: str, iterations: int, arch: str, mode: str, constraints: str | None, n: int | None, build_dir_mode: str, incremental: bool, jobserver: bool, adaptive_boot_timeout: bool, artifact_store: bool, beam: int, llm_cache: str, in_process: bool):
+
+	if beam > 1 and build_dir_mode == 'in-tree':
+		raise click.UsageError('--beam needs out-of-tree builds, use --build-dir attempt or lineage.')
 
 	output_dir = f'{settings.runtime.OUTPUT_DIR}/{arch}'
 	settings.runtime.OUTPUT_DIR = output_dir
@@ -86,6 +167,13 @@ def main(jobs: int, threads: int, model: str, iterations: int, arch: str, mode:
 	settings.agent.MODEL = model
 	settings.agent.MAX_ITERATIONS = iterations
 	settings.kernel.ARCH = arch
+	settings.runtime.BUILD_DIR_MODE = build_dir_mode
+	settings.runtime.INCREMENTAL = incremental
+	settings.runtime.JOBSERVER = jobserver
+	settings.runtime.ADAPTIVE_BOOT_TIMEOUT = adaptive_boot_timeout
+	settings.runtime.ARTIFACT_STORE = artifact_store
+	settings.agent.BEAM_WIDTH = beam
+	settings.runtime.LLM_CACHE = llm_cache
 
 	img = os.environ.get('DEBIAN_IMG_ARM64') if arch == 'arm64' else os.environ.get('DEBIAN_IMG_AMD64', settings.kernel.DEBIAN_IMG)
 
@@ -116,11 +204,13 @@ def main(jobs: int, threads: int, model: str, iterations: int, arch: str, mode:
 
 	labels = [f'sample {int(s.sample_dir.rstrip("/").split("_")[-1])}' for s in valid]
 
-	dispatcher.run_callables(
-		tasks=[make_task(s, model, jobs, iterations, arch, img, mode, constraints) for s in valid],
-		desc='Repairing samples',
-		labels=labels,
-	)
+	with shared_jobserver():
+		dispatcher.run_callables(
+			tasks=[make_task(s, model, jobs, iterations, arch, img, mode, constraints, build_dir_mode, incremental, adaptive_boot_timeout, artifact_store, beam, llm_cache, in_process) for s in valid],
+			max_workers=threads,
+			desc='Repairing samples',
+			labels=labels,
+		)
 
 if __name__ == '__main__':
 	main()
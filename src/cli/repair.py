@@ -47,15 +47,30 @@ def repair_config(input: Input, kernel_src: str):
 @click.option('--arch', '-a', default=None, help='Target kernel architecture (e.g. x86_64, arm64). Defaults to $ARCH env var or x86_64.')
 @click.option('--img', default=None, help='Path to the Debian root filesystem image for QEMU. Defaults to $DEBIAN_IMG env var.')
 @click.option('--constraints', default=None, help='Path to a hard constraints file.')
-def main(config: str | None, original: str | None, modified: str | None, patch: str | None, output: str | None, src: str | None, model: str, jobs: int, iterations: int, rag: bool, arch: str | None, img: str | None, constraints: str | None):
+@click.option('--build-dir', 'build_dir_mode', type=click.Choice(['in-tree', 'attempt', 'lineage']), default='in-tree', help='Where kernels are built: in the source tree, or in an O= directory per attempt or per session.')
+@click.option('--incremental', is_flag=True, help='Build each attempt on top of the previous attempt\'s object tree (with --build-dir attempt).')
+@click.option('--adaptive-boot-timeout', is_flag=True, help='Set the boot timeout from the history of successful boot times.')
+@click.option('--artifact-store', is_flag=True, help='Reuse build and boot results of previously tested configs from the local artifact store.')
+@click.option('--beam', default=1, type=click.IntRange(min=1), help='Number of ranked candidate fixes to build and boot in parallel per iteration (requires --build-dir attempt or lineage).')
+@click.option('--llm-cache', type=click.Choice(['off', 'record', 'replay', 'record-on-miss']), default='off', help='Record LLM responses to, or replay them from, the local LLM cache.')
+def main(config: str | None, original: str | None, modified: str | None, patch: str | None, output: str | None, src: str | None, model: str, jobs: int, iterations: int, rag: bool, arch: str | None, img: str | None, constraints: str | None, build_dir_mode: str, incremental: bool, adaptive_boot_timeout: bool, artifact_store: bool, beam: int, llm_cache: str):
+
+    if beam > 1 and build_dir_mode == 'in-tree':
+        raise click.UsageError('--beam needs out-of-tree builds, use --build-dir attempt or lineage.')
 
     input = get_input(config=config, original=original, modified=modified, patch=patch, constraints=constraints)
 
     settings.runtime.OUTPUT_DIR = os.path.abspath(f'{output}/agent_repair')
     settings.runtime.JOBS = jobs
     settings.runtime.USE_RAG = rag
+    settings.runtime.BUILD_DIR_MODE = build_dir_mode
+    settings.runtime.INCREMENTAL = incremental
+    settings.runtime.ADAPTIVE_BOOT_TIMEOUT = adaptive_boot_timeout
+    settings.runtime.ARTIFACT_STORE = artifact_store
+    settings.runtime.LLM_CACHE = llm_cache
     settings.agent.MODEL = model
     settings.agent.MAX_ITERATIONS = iterations
+    settings.agent.BEAM_WIDTH = beam
 
     if arch is not None:
         settings.kernel.ARCH = arch
@@ -2,7 +2,11 @@
 
 from pydantic import field_validator, model_validator, ValidationInfo, BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Optional, Literal
+from contextlib import contextmanager
+from contextvars import ContextVar
+from src.utils import log
+import json
 import os
 
 class KernelSettings(BaseModel):
@@ -24,6 +28,42 @@ class KernelSettings(BaseModel):
     def WORKTREE_DIR(self) -> str:
         return os.path.join(os.path.dirname(__file__), '..', 'workspace', 'worktrees')
 
+    @property
+    def CCACHE_DIR(self) -> str:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'workspace', 'ccache'))
+
+    @property
+    def ARTIFACT_DIR(self) -> str:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'workspace', 'artifacts'))
+
+    @property
+    def QEMU_SLOT_DIR(self) -> str:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'workspace', 'qemu-slots'))
+
+    @property
+    def BOOT_TIMES(self) -> str:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'workspace', 'boot-times.json'))
+
+    @property
+    def KLOCALIZER_CACHE_DIR(self) -> str:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'workspace', 'klocalizer-cache'))
+
+    @property
+    def FORMULA_DIR(self) -> str:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'workspace', 'formulas'))
+
+    @property
+    def KCONFIG_INDEX_DIR(self) -> str:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'workspace', 'kconfig-index'))
+
+    @property
+    def INITRAMFS_DIR(self) -> str:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'workspace', 'initramfs'))
+
+    @property
+    def LLM_CACHE_DIR(self) -> str:
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'workspace', 'llm-cache'))
+
     @field_validator('KERNEL_SRC')
     def validate_kernel_exists(cls, v: str, info: ValidationInfo) -> str:
         if not os.path.exists(v):
@@ -39,6 +79,49 @@ class RuntimeSettings(BaseModel):
     CHUNK_WINDOW: int = 20
     CLEANUP: bool = Field(default=False)
     USE_RAG: bool = Field(default=False)
+    BUILD_DIR_MODE: Literal['in-tree', 'attempt', 'lineage'] = Field(default='in-tree')
+    INCREMENTAL: bool = Field(default=False)
+    ARTIFACT_STORE: bool = Field(default=False)
+    ARTIFACT_STORE_SIZE: int = Field(default=20, ge=1)
+    KLOCALIZER_CACHE: bool = Field(default=False)
+    KLOCALIZER_CACHE_SIZE: int = Field(default=2, ge=1)
+    LLM_CACHE: Literal['off', 'record', 'replay', 'record-on-miss'] = Field(default='off')
+    KLOCALIZER_SCRATCH_DIR: Optional[str] = Field(default=None)
+    FORMULA_CACHE: bool = Field(default=False)
+    KLOCALIZER_PREWARM: bool = Field(default=False)
+    SYMBOL_CHECK: bool = Field(default=False)
+    DRY_RUN_TOOL: bool = Field(default=False)
+    SYMBOL_MATCH_CUTOFF: float = Field(default=0.85, ge=0, le=1)
+    COMPILER_CACHE: bool = Field(default=False)
+    COMPILER_CACHE_SIZE: str = Field(default='50G')
+    COMPILER_CACHE_BASEDIR: Optional[str] = Field(default=None)
+    JOBSERVER: bool = Field(default=False)
+    JOBSERVER_FIFO: Optional[str] = Field(default=None)
+    STREAM_BUILD: bool = Field(default=False)
+    BUILD_FATAL_PATTERNS: list[str] = Field(default_factory=lambda: [r'\berror:', r'\*\*\* \[.*\] Error \d+'])
+    BUILD_FATAL_GRACE: float = Field(default=2.0, ge=0)
+    BUILD_PROBE: bool = Field(default=False)
+    MODULE_ONLY_REUSE: bool = Field(default=False)
+    STREAM_BOOT: bool = Field(default=True)
+    QEMU_SLOTS: int = Field(default=2, ge=1)
+    BOOT_OVERLAY: bool = Field(default=False)
+    BOOT_OVERLAY_DIR: Optional[str] = Field(default=None)
+    BOOT_TIMEOUT: int = Field(default=300, ge=1)
+    BOOT_STALL_TIMEOUT: int = Field(default=60, ge=1)
+    BOOT_MILESTONES: dict[str, str] = Field(default_factory=lambda: {
+        'printk': r'Linux version',
+        'free_init': r'Freeing unused kernel',
+        'init': r'Run \S+ as init process',
+        'systemd': r'systemd\[1\]: ',
+        'login': r'login:',
+    })
+    SMOKE_BOOT: bool = Field(default=False)
+    SMOKE_BOOT_TIMEOUT: int = Field(default=60, ge=1)
+    ADAPTIVE_BOOT_TIMEOUT: bool = Field(default=False)
+    BOOT_TIMEOUT_PERCENTILE: float = Field(default=95, ge=0, le=100)
+    BOOT_TIMEOUT_MARGIN: int = Field(default=30, ge=0)
+    BOOT_TIMEOUT_MIN_SAMPLES: int = Field(default=10, ge=1)
+    BOOT_TIMEOUT_HISTORY: int = Field(default=500, ge=1)
 
     OUTPUT_DIR: str = Field(default=os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'workspace', 'samples')))
 
@@ -48,6 +131,20 @@ class RuntimeSettings(BaseModel):
             os.makedirs(v, exist_ok=True)
 
         return v
+
+    @field_validator('BUILD_FATAL_PATTERNS', mode='before')
+    def split_patterns(cls, v):
+        if isinstance(v, str):
+            return json.loads(v) if v.startswith('[') else [v]
+
+        return v
+
+    @field_validator('BOOT_MILESTONES', mode='before')
+    def parse_milestones(cls, v):
+        if isinstance(v, str):
+            return json.loads(v)
+
+        return v
     
 class AgentSettings(BaseModel):
 
@@ -77,6 +174,8 @@ class AgentSettings(BaseModel):
 
     MAX_ITERATIONS: int = Field(default=20, ge=1)
     MAX_TOOL_CALLS: int = Field(default=20, ge=1)
+    BEAM_WIDTH: int = Field(default=1, ge=1)
+    PROMPT_THREAD: bool = False
     MAX_MATCHES: int = 5
 
     @model_validator(mode='after')
@@ -150,19 +249,65 @@ class Settings(BaseSettings):
             'scripts': scripts_data,
         }
 
+# Resolves to the settings of the session running in the current context, or the process-wide settings outside of one.
+class ScopedSettings:
+
+    def __init__(self, base: Settings):
+        object.__setattr__(self, '_ScopedSettings__base', base)
+
+    def __getattr__(self, name: str):
+        return getattr(self.current(), name)
+
+    def __setattr__(self, name: str, value):
+        setattr(self.current(), name, value)
+
+    def current(self) -> Settings:
+        return _session_settings.get() or self.__base
+
+    @contextmanager
+    def session(self, overrides: dict[str, dict] | None = None):
+
+        scoped = self.current().model_copy(deep=True)
+        for group, values in (overrides or {}).items():
+            for name, value in values.items():
+                setattr(getattr(scoped, group), name, value)
+
+        token = _session_settings.set(scoped)
+        try:
+            yield scoped
+        finally:
+            _session_settings.reset(token)
+
+_session_settings: ContextVar[Settings | None] = ContextVar('session_settings', default=None)
+
 settings = None
 
 try:
-    settings = Settings()
+    settings = ScopedSettings(Settings())
 except Exception as e:
     raise RuntimeError(f'Failed to load configuration: {e}') from e
 
 def log_settings():
-    print(f'[INFO] Using {settings.agent.MODEL}')
-    print(f'[INFO] Model from {settings.agent.PROVIDER}')
-    print(f'[INFO] kernel-src {settings.kernel.KERNEL_SRC}')
-    print(f'[INFO] target arch: {settings.kernel.ARCH}')
-    print(f'[INFO] debian image: {settings.kernel.DEBIAN_IMG}')
-    print(f'[INFO] max tool calls: {settings.agent.MAX_TOOL_CALLS}')
-    print(f'[INFO] max iterations: {settings.agent.MAX_ITERATIONS}')
-    print(f'[INFO] jobs: {settings.runtime.JOBS}')
+
+    log.info(f'Using {settings.agent.MODEL}')
+    log.info(f'Model from {settings.agent.PROVIDER}')
+    log.info(f'kernel-src {settings.kernel.KERNEL_SRC}')
+    log.info(f'target arch: {settings.kernel.ARCH}')
+    log.info(f'debian image: {settings.kernel.DEBIAN_IMG}')
+    log.info(f'max tool calls: {settings.agent.MAX_TOOL_CALLS}')
+    log.info(f'max iterations: {settings.agent.MAX_ITERATIONS}')
+    log.info(f'beam width: {settings.agent.BEAM_WIDTH}')
+    log.info(f'prompt thread: {settings.agent.PROMPT_THREAD}')
+    log.info(f'jobs: {settings.runtime.JOBS}')
+    log.info(f'shared jobserver: {settings.runtime.JOBSERVER_FIFO or settings.runtime.JOBSERVER}')
+    log.info(f'build dir mode: {settings.runtime.BUILD_DIR_MODE}')
+    log.info(f'incremental builds: {settings.runtime.INCREMENTAL}')
+    log.info(f'artifact store: {settings.runtime.ARTIFACT_STORE}')
+    log.info(f'klocalizer cache: {settings.runtime.KLOCALIZER_CACHE}')
+    log.info(f'llm cache: {settings.runtime.LLM_CACHE}')
+    log.info(f'compiler cache: {settings.runtime.COMPILER_CACHE}')
+    log.info(f'stream build: {settings.runtime.STREAM_BUILD}')
+    log.info(f'stream boot: {settings.runtime.STREAM_BOOT}')
+    log.info(f'qemu slots: {settings.runtime.QEMU_SLOTS}')
+    log.info(f'smoke boot: {settings.runtime.SMOKE_BOOT}')
+    log.info(f'adaptive boot timeout: {settings.runtime.ADAPTIVE_BOOT_TIMEOUT}')
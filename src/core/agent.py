@@ -1,22 +1,33 @@
 from langchain.agents.middleware import ToolCallLimitMiddleware
-from src.models import Input, AgentResponse, Attempt, LLMUsage
-from src.agent import agent_tools, Session, prompt, model
+from src.models import Input, AgentResponse, AgentBeamResponse, Attempt, LLMUsage
+from src.agent import agent_tools, ToolContext, Session, prompt, model
+from langgraph.graph.state import CompiledStateGraph
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
 from langchain_core.language_models import BaseChatModel
+from langchain_core.tools import BaseTool
+from concurrent.futures import ThreadPoolExecutor
 from singleton_decorator import singleton
 from langchain.agents import create_agent
 from src.config import settings
+from src.kernel import builder, diffconfig
 from .kernel import Kernel
-from src.utils import log
+from src.utils import log, Cancellation
+import contextvars
+import threading
 import shutil
 import time
 import json
 import os
 
+# Per-attempt bookkeeping that stays with the iteration when a beam candidate is adopted.
+ADOPT_EXCLUDE = {'id', 'dir', 'rank', 'tool_calls', 'wrapper_used', 'embedding_usage', 'llm_time', 'setup_time', 'token_usage', 'candidates'}
+
 @singleton
 class Agent:
 
     def __init__(self):
-        self.middleware = [ToolCallLimitMiddleware(run_limit=settings.agent.MAX_TOOL_CALLS, exit_behavior='end')]
+        self.__graphs: dict[tuple, CompiledStateGraph] = {}
+        self.__lock = threading.Lock()
 
     def repair(self, input: Input, kernel: Kernel) -> Session:
 
@@ -26,6 +37,10 @@ class Agent:
         session = Session(input.original_config, output_dir, patch=input.patch, hard_define=input.define, hard_undefine=input.undefine)
         llm = model.get_llm()
 
+        # The formulas are derived while attempt_0 builds, so the first repair attempt's solve starts warm.
+        if settings.runtime.KLOCALIZER_PREWARM:
+            kernel.prewarm_klocalizer(session.base)
+
         inital_attempt = self.__inital_attempt(kernel, session)
         session.attempts.append(inital_attempt)
 
@@ -66,7 +81,66 @@ class Agent:
             shutil.rmtree(path)
 
         os.makedirs(path, exist_ok=True)
+
+    def __build_dir(self, session: Session, attempt_dir: str) -> str | None:
+
+        if settings.runtime.BUILD_DIR_MODE == 'attempt':
+            build_dir = f'{attempt_dir}/build'
+            if settings.runtime.INCREMENTAL:
+                self.__carry_build_dir(session, build_dir)
+            return build_dir
+        if settings.runtime.BUILD_DIR_MODE == 'lineage':
+            return f'{session.dir}/build'
+
+        return None
     
+    def __carry_build_dir(self, session: Session, build_dir: str):
+
+        # Hand the latest object tree to this attempt so Kbuild only rebuilds what the config change touched.
+        for previous in reversed(session.attempts):
+            previous_build_dir = f'{previous.dir}/build'
+            if previous_build_dir != build_dir and os.path.isdir(previous_build_dir):
+                log.info(f'Reusing object tree from attempt {previous.id}.')
+                os.rename(previous_build_dir, build_dir)
+                return
+
+    def __probe_targets(self, session: Session) -> list[str] | None:
+
+        if not settings.runtime.BUILD_PROBE:
+            return None
+
+        previous = next((a for a in reversed(session.attempts[:-1]) if a.build_log), None)
+        if previous is None or previous.build_succeeded or not os.path.exists(previous.build_log):
+            return None
+
+        return builder.failed_objects(previous.build_log) or None
+
+    def __module_only_change(self, session: Session, config: str) -> Attempt | None:
+
+        if not settings.runtime.MODULE_ONLY_REUSE:
+            return None
+
+        tested = next((a for a in reversed(session.attempts[:-1]) if a.boot_log and a.config), None)
+        if tested is None or not os.path.exists(tested.config):
+            return None
+
+        changes = diffconfig.builtin_changes(tested.config, config)
+        if changes:
+            return None
+
+        return tested
+
+    def __reuse(self, attempt: Attempt, tested: Attempt):
+
+        attempt.reused_from = tested.id
+        attempt.build_succeeded = True
+        attempt.build_log = tested.build_log
+        attempt.objects_rebuilt = 0
+        attempt.boot_log = tested.boot_log
+        attempt.boot_succeeded = tested.boot_succeeded
+        attempt.boot_summary = tested.boot_summary
+        attempt.boot_rule = tested.boot_rule
+
     def __inital_attempt(self, kernel: Kernel, session: Session) -> Attempt:
 
         log.info('Checking input configuration bootability...')
@@ -75,20 +149,33 @@ class Agent:
         self.__make_dir(dir)
 
         attempt = Attempt(id=0, dir=dir, config=session.base)
+        build_dir = self.__build_dir(session, dir)
 
-        build = kernel.build(dir, session.base)
+        build = kernel.build(dir, session.base, build_dir)
         attempt.build_log = build.log
         attempt.build_time = build.build_time
+        attempt.build_phases = build.phases
+        attempt.build_probe = build.probe
+        attempt.build_cached = build.cached
+        attempt.compiler_cache = build.compiler_cache
         attempt.build_summary = build.summary
+        attempt.build_fatal = build.fatal
+        attempt.objects_rebuilt = build.objects_rebuilt
         if not build.ok:
             log.info('Build failed with the input configuration.')
             return attempt
 
-        boot = kernel.boot(dir)
+        boot = kernel.boot(dir, build_dir)
         attempt.boot_log = boot.log
         attempt.boot_succeeded = boot.status
         attempt.boot_time = boot.boot_time
+        attempt.boot_cached = boot.cached
         attempt.boot_summary = boot.summary
+        attempt.boot_rule = boot.rule
+        attempt.boot_timeout = boot.timeout
+        attempt.boot_queue_time = boot.queue_time
+        attempt.boot_smoke = boot.smoke.model_dump() if boot.smoke else None
+        attempt.boot_milestones = boot.milestones
 
         if boot.status == 'yes':
             log.info('Input configuration boots successfully. No repair needed.')
@@ -107,52 +194,156 @@ class Agent:
         attempt = Attempt(id=len(session.attempts), dir=dir)
         session.attempts.append(attempt)
 
+        beam = settings.agent.BEAM_WIDTH > 1
+
         llm_start = time.time()
-        agent_response, token_usage, raw_response, wrapper_used = self.__generate_response(llm, session)
-        attempt.llm_time = time.time() - llm_start
+        agent_response, token_usage, raw_response, wrapper_used, setup_time = self.__generate_response(llm, kernel, session, AgentBeamResponse if beam else AgentResponse)
+        attempt.setup_time = setup_time
+        attempt.llm_time = time.time() - llm_start - setup_time
 
         attempt.token_usage = token_usage
         attempt.wrapper_used = wrapper_used
         self.__save_raw_response(f'{dir}/raw-agent-response.json', raw_response)
 
-        if agent_response is None:
+        if agent_response is None or (beam and not agent_response.candidates):
             log.error('Agent failed to provide a structured response. Skipping attempt.')
             return
 
+        if beam:
+            self.__beam(kernel, session, attempt, agent_response.candidates[:settings.agent.BEAM_WIDTH])
+            return
+
         attempt.response = agent_response
+        self.__test(kernel, session, attempt)
+
+    def __beam(self, kernel: Kernel, session: Session, attempt: Attempt, responses: list[AgentResponse]):
+
+        log.info(f'Testing {len(responses)} candidate fixes in parallel...')
+
+        for rank, response in enumerate(responses):
+            candidate_dir = f'{attempt.dir}/candidate_{rank}'
+            self.__make_dir(candidate_dir)
+            attempt.candidates.append(Attempt(id=attempt.id, dir=candidate_dir, rank=rank, response=response))
+
+        # Set by the first candidate that boots, which stops the builds and boots of the others where they are.
+        found = Cancellation()
+        with ThreadPoolExecutor(max_workers=len(attempt.candidates), thread_name_prefix='beam') as executor:
+            futures = [executor.submit(contextvars.copy_context().run, self.__test, kernel, session, candidate, found) for candidate in attempt.candidates]
+            for future in futures:
+                future.result()
+
+        best = max(attempt.candidates, key=lambda c: (c.boot_succeeded == 'yes', c.boot_succeeded == 'maintenance', c.build_succeeded, c.klocalizer_status == 'success', -c.rank))
+        log.info(f'Adopting candidate {best.rank} ({best.boot_succeeded}).')
 
-        define, undefine = self.__apply_hard_constraints(agent_response.define, agent_response.undefine, session.hard_define, session.hard_undefine)
+        for field in Attempt.model_fields.keys() - ADOPT_EXCLUDE:
+            setattr(attempt, field, getattr(best, field))
+        attempt.adopted = best.rank
 
-        klocalizer = kernel.run_klocalizer(dir, session.base, define, undefine)
+        # Only the adopted object tree is kept, where an incremental build of the next attempt looks for it.
+        for candidate in attempt.candidates:
+            build_dir = f'{candidate.dir}/build'
+            if not os.path.isdir(build_dir):
+                continue
+            if candidate is best:
+                os.rename(build_dir, f'{attempt.dir}/build')
+            else:
+                shutil.rmtree(build_dir, ignore_errors=True)
+
+    def __test(self, kernel: Kernel, session: Session, attempt: Attempt, found: Cancellation | None = None):
+
+        attempt_dir = attempt.dir
+
+        define, undefine, attempt.symbol_corrections = kernel.check_symbols(attempt.response.define, attempt.response.undefine)
+        define, undefine = session.apply_hard_constraints(define, undefine)
+
+        klocalizer = kernel.run_klocalizer(attempt_dir, session.base, define, undefine, output=f'{attempt_dir}/modified.config')
         attempt.klocalizer_log = klocalizer.log
         attempt.klocalizer_status = klocalizer.status
+        attempt.klocalizer_cached = klocalizer.cached
         if klocalizer.status != 'success':
             return
 
-        attempt.config = f'{dir}/modified.config'
-        shutil.copyfile(f'{kernel.src}/.config', attempt.config)
+        attempt.config = klocalizer.config
+
+        tested = self.__module_only_change(session, attempt.config)
+        if tested is not None:
+            log.warning(f'Config change only moves options between =m and unset, reusing the build and boot of attempt {tested.id} without testing this image.')
+            self.__reuse(attempt, tested)
+            return
+
+        if found is not None and found.cancelled:
+            attempt.stopped = True
+            return
+
+        # Beam candidates build side by side, so each gets an object tree of its own.
+        build_dir = f'{attempt_dir}/build' if attempt.rank is not None else self.__build_dir(session, attempt_dir)
 
-        build = kernel.build(dir, attempt.config)
+        build = kernel.build(attempt_dir, attempt.config, build_dir, self.__probe_targets(session), found)
         attempt.build_log = build.log
         attempt.build_time = build.build_time
+        attempt.build_phases = build.phases
+        attempt.build_probe = build.probe
+        attempt.build_cached = build.cached
+        attempt.compiler_cache = build.compiler_cache
         attempt.build_summary = build.summary
+        attempt.build_fatal = build.fatal
+        attempt.objects_rebuilt = build.objects_rebuilt
         if not build.ok:
+            attempt.stopped = found is not None and found.cancelled
             return
 
         attempt.build_succeeded = True
 
-        boot = kernel.boot(dir)
+        if found is not None and found.cancelled:
+            attempt.stopped = True
+            return
+
+        boot = kernel.boot(attempt_dir, build_dir, found)
         attempt.boot_log = boot.log
         attempt.boot_succeeded = boot.status
         attempt.boot_time = boot.boot_time
+        attempt.boot_cached = boot.cached
         attempt.boot_summary = boot.summary
-
-    def __generate_response(self, llm: BaseChatModel, session: Session) -> tuple[AgentResponse | None, LLMUsage, dict, bool]:
-
-        tools = agent_tools.get(session)
-        agent = create_agent(llm, response_format=AgentResponse, tools=tools, middleware=self.middleware)
-
-        response = agent.invoke({ 'messages': prompt.prompt(session) })
+        attempt.boot_rule = boot.rule
+        attempt.boot_timeout = boot.timeout
+        attempt.boot_queue_time = boot.queue_time
+        attempt.boot_smoke = boot.smoke.model_dump() if boot.smoke else None
+        attempt.boot_milestones = boot.milestones
+
+        if found is not None and boot.status == 'yes':
+            found.cancel()
+        elif found is not None and found.cancelled and boot.status == 'no':
+            attempt.stopped = True
+
+    def __graph(self, llm: BaseChatModel, tools: list[BaseTool], response_format: type[AgentResponse | AgentBeamResponse]) -> CompiledStateGraph:
+
+        # Tools read the session from the invocation context, so a graph only depends on which tools are offered.
+        key = (id(llm), response_format.__name__, tuple(t.name for t in tools), settings.agent.MAX_TOOL_CALLS)
+
+        with self.__lock:
+            if key not in self.__graphs:
+                middleware = [ToolCallLimitMiddleware(run_limit=settings.agent.MAX_TOOL_CALLS, exit_behavior='end')]
+                self.__graphs[key] = create_agent(llm, response_format=response_format, tools=tools, middleware=middleware, context_schema=ToolContext)
+
+            return self.__graphs[key]
+
+    def __generate_response(
+        self,
+        llm: BaseChatModel,
+        kernel: Kernel,
+        session: Session,
+        response_format: type[AgentResponse | AgentBeamResponse] = AgentResponse,
+    ) -> tuple[AgentResponse | AgentBeamResponse | None, LLMUsage, dict, bool, float]:
+
+        setup_start = time.time()
+        tools = agent_tools.get(session, kernel)
+        context = agent_tools.context(session, kernel)
+        agent = self.__graph(llm, tools, response_format)
+        thread = session.thread if settings.agent.PROMPT_THREAD else None
+        messages = prompt.prompt(session, thread)
+        setup_time = time.time() - setup_start
+
+        response = agent.invoke({ 'messages': messages }, context=context)
 
         usage = LLMUsage.from_response(response)
         agent_response = response.get('structured_response', None)
@@ -161,7 +352,7 @@ class Agent:
         if agent_response is None:
             wrapper_used = True
             try:
-                result = llm.with_structured_output(AgentResponse, include_raw=True).invoke(response['messages'])
+                result = llm.with_structured_output(response_format, include_raw=True).invoke(response['messages'])
                 if result.get('raw'):
                     usage = usage + LLMUsage.from_ai_message(result['raw'])
                     response['messages'].append(result['raw'])
@@ -169,14 +360,26 @@ class Agent:
             except Exception:
                 pass
 
-        return agent_response, usage, response, wrapper_used
+        if settings.agent.PROMPT_THREAD:
+            session.thread = self.__close_tool_calls(response['messages'])
+
+        return agent_response, usage, response, wrapper_used, setup_time
+
+    def __close_tool_calls(self, messages: list[BaseMessage]) -> list[BaseMessage]:
 
-    def __apply_hard_constraints(self, define: list[str], undefine: list[str], hard_define: set[str], hard_undefine: set[str]) -> tuple[list[str], list[str]]:
-        
-        define = list((set(define) - hard_undefine) | hard_define)
-        undefine = list((set(undefine) - hard_define) | hard_undefine)
+        # Providers reject a thread whose tool calls have no reply, as the structured-output wrapper leaves behind.
+        answered = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+        closed = []
+        for message in messages:
+            closed.append(message)
+            if isinstance(message, AIMessage):
+                closed.extend(
+                    ToolMessage(content='Response recorded.', tool_call_id=call['id'], name=call['name'])
+                    for call in message.tool_calls
+                    if call['id'] not in answered
+                )
 
-        return define, undefine
+        return closed
 
     def __save_raw_response(self, path, response: dict):
         with open(path, 'w', encoding='utf-8') as f:
@@ -1,10 +1,16 @@
-from src.models import BuildResult, BootResult, KlocalizerResult
-from src.tools import klocalizer, qemu
-from src.kernel import randconfig
+from src.models import BuildResult, BuildProbe, BootResult, BootTier, KlocalizerResult
+from src.tools import klocalizer, qemu, initramfs
+from src.tools.qemu import BootMonitor, SMOKE_RULES, boot_farm
+from concurrent.futures import Future
+from src.kernel import randconfig, diffconfig, artifact_store, boot_times, klocalizer_cache, kconfig_index
+from src.utils import log, text_digest, file_digest, Cancellation
 from src.config import settings
+from src.kernel.builder import BuildMonitor, OBJECT_PATTERN
 from src.kernel import builder
-from src.utils import log
 from git import Repo
+import contextvars
+import threading
+import tempfile
 import shutil
 import time
 import os
@@ -18,6 +24,7 @@ class Kernel:
 
         self.src = src
         self.__version: str | None = None
+        self.__commit: str | None = None
 
     @property
     def version(self) -> str:
@@ -44,7 +51,19 @@ class Kernel:
         self.__version = f'{version}.{patchlevel}.{sublevel}{extraversion}'
         return self.__version
 
-    def load_config(self, path: str) -> bool:
+    @property
+    def commit(self) -> str:
+
+        if self.__commit:
+            return self.__commit
+
+        self.__commit = Repo(self.src).head.commit.hexsha
+        return self.__commit
+
+    def output(self, build_dir: str | None = None) -> str:
+        return build_dir if build_dir is not None else self.src
+
+    def load_config(self, path: str, build_dir: str | None = None) -> bool:
 
         log.info(f'Loading config into kernel: {path}')
 
@@ -56,7 +75,9 @@ class Kernel:
             log.error(f'Config file does not exist: {path}')
             return False
         
-        shutil.copy(path, f'{self.src}/.config')
+        output = self.output(build_dir)
+        os.makedirs(output, exist_ok=True)
+        shutil.copy(path, f'{output}/.config')
 
         return True
 
@@ -86,19 +107,29 @@ class Kernel:
 
         return True
     
-    def run_klocalizer(self, dir: str, config: str, define: list[str] = [], undefine: list[str] = [], patch: str | None = None) -> KlocalizerResult:
+    def run_klocalizer(self, dir: str, config: str, define: list[str] = [], undefine: list[str] = [], patch: str | None = None, output: str | None = None) -> KlocalizerResult:
 
         log_path = f'{dir}/klocalizer.log'
+        output = output or f'{dir}/klocalizer.config'
 
-        if not self.load_config(config):
+        if not os.path.exists(config):
+            log.error(f'Config file does not exist: {config}')
             return KlocalizerResult(status='error', log=log_path)
 
+        key = self.__klocalizer_key(config, define, undefine, patch) if settings.runtime.KLOCALIZER_CACHE else None
+
+        if key is not None:
+            cached = klocalizer_cache.load(key, log_path, output)
+            if cached is not None:
+                log.success(f'KLocalizer result restored from cache ({cached.status}).')
+                return cached
+
         log.info('Running KLocalizer...')
 
         if patch is not None:
-            status = klocalizer.run_patch(self.src, patch, log_path, define, undefine)
+            status = klocalizer.run_patch(self.src, patch, log_path, define, undefine, config=config, output=output, formulas=self.formulas())
         else:
-            status = klocalizer.run(self.src, log_path, define, undefine)
+            status = klocalizer.run(self.src, log_path, define, undefine, config=config, output=output, formulas=self.formulas())
 
         if status == 'success':
             log.success('KLocalizer completed successfully.')
@@ -107,41 +138,248 @@ class Kernel:
         else:
             log.error('KLocalizer failed.')
 
-        return KlocalizerResult(status=status, log=log_path)
+        result = KlocalizerResult(status=status, log=log_path, config=output if status == 'success' else None, cached=False if key else None)
+
+        if key is not None:
+            klocalizer_cache.save(key, result, output)
+
+        return result
+
+    def check_symbols(self, define: list[str], undefine: list[str]) -> tuple[list[str], list[str], dict[str, str | None]]:
+
+        if not settings.runtime.SYMBOL_CHECK:
+            return define, undefine, {}
+
+        try:
+            symbols = kconfig_index.load(self.src, self.commit)
+        except Exception as e:
+            log.warning(f'Could not load Kconfig symbol index: {e}')
+            return define, undefine, {}
+
+        define, define_corrections = kconfig_index.resolve(symbols, define)
+        undefine, undefine_corrections = kconfig_index.resolve(symbols, undefine)
+        corrections = {**define_corrections, **undefine_corrections}
+
+        for option, corrected in corrections.items():
+            if corrected is None:
+                log.warning(f'Dropping unknown Kconfig symbol {option}.')
+            else:
+                log.info(f'Correcting unknown Kconfig symbol {option} to {corrected}.')
+
+        return define, undefine, corrections
+
+    def formulas(self) -> str:
+
+        if not settings.runtime.FORMULA_CACHE:
+            return f'{self.src}/.kmax'
+
+        try:
+            return f'{settings.kernel.FORMULA_DIR}/{settings.kernel.ARCH}/{self.commit}'
+        except Exception as e:
+            log.warning(f'Could not resolve kernel commit for the formula cache: {e}')
+            return f'{self.src}/.kmax'
+
+    def prewarm_klocalizer(self, config: str) -> threading.Thread | None:
 
-    def build(self, dir: str, config: str) -> BuildResult:
+        formulas = self.formulas()
+        if klocalizer.warm(formulas):
+            return None
+
+        log.info('Prewarming KLocalizer formulas in the background...')
+
+        thread = threading.Thread(target=contextvars.copy_context().run, args=(self.__prewarm, config, formulas), daemon=True)
+        thread.start()
+
+        return thread
+
+    def __prewarm(self, config: str, formulas: str):
+
+        # An unconstrained solve derives every formula the repair attempts will need.
+        with tempfile.TemporaryDirectory(prefix='klocalizer-prewarm-', dir=settings.runtime.KLOCALIZER_SCRATCH_DIR) as scratch:
+            status = klocalizer.run(self.src, f'{scratch}/klocalizer.log', config=config, output=f'{scratch}/.config', formulas=formulas)
+
+        if status == 'error':
+            log.warning('KLocalizer prewarm failed.')
+        else:
+            log.info('KLocalizer formulas are warm.')
+
+    def build(self, dir: str, config: str, build_dir: str | None = None, probe: list[str] | None = None, cancel: Cancellation | None = None) -> BuildResult:
 
         log_path = f'{dir}/build.log'
 
-        if not self.load_config(config):
+        if not self.load_config(config, build_dir):
             return BuildResult(ok=False, log=log_path)
 
+        output = self.output(build_dir)
+        # Looked up by the config as given, so the store never runs an extra make pass in the source tree.
+        # Configs from KLocalizer and from earlier builds are already olddefconfig output, so they hit directly.
+        key = self.__artifact_key(output) if settings.runtime.ARTIFACT_STORE else None
+
+        if key is not None:
+            cached = artifact_store.load_build(key, log_path, output)
+            if cached is not None:
+                log.success(f'Build result restored from artifact store ({"ok" if cached.ok else "failed"}).')
+                return cached
+
+        stats_log = f'{dir}/ccache-stats.log'
+        if os.path.exists(stats_log):
+            os.remove(stats_log)
+
+        build_probe = None
+        if probe:
+            log.info(f'Probing previously failing objects: {", ".join(probe)}')
+
+            result = self.__compile(log_path, stats_log, build_dir, key, cancel, probe)
+            still_failing = set(builder.failed_objects(log_path)) & set(probe)
+            build_probe = BuildProbe(targets=probe, ok=result.ok, time=result.build_time)
+
+            # Objects the new config no longer builds fail for unrelated reasons, so only a repeat failure is conclusive.
+            if not result.ok and still_failing:
+                log.error(f'Previously failing objects still fail: {", ".join(sorted(still_failing))}')
+                result = result.model_copy(update={'probe': build_probe})
+                if key is not None and not (cancel and cancel.cancelled):
+                    self.__save_build(key, result, output)
+                return result
+
+            log.info('Probe passed, continuing with the full build.')
+
         log.info('Building kernel...')
 
+        result = self.__compile(log_path, stats_log, build_dir, key, cancel)
+        if build_probe is not None:
+            result = result.model_copy(update={'probe': build_probe, 'build_time': result.build_time + build_probe.time})
+
+        if not result.ok:
+            log.error('Build failed. Check log for details.')
+        else:
+            log.success('Build completed successfully.')
+
+        # A stopped build says nothing about the config, so it is not worth replaying.
+        if key is not None and not (cancel and cancel.cancelled):
+            self.__save_build(key, result, output)
+
+        return result
+
+    def __save_build(self, key: str, result: BuildResult, output: str):
+
+        # The build ran olddefconfig on the output config, so boots key on that; the given config's key aliases it.
+        built = self.__artifact_key(output)
+        for entry in {key, built} - {None}:
+            artifact_store.save_build(entry, result, output)
+
+    def __compile(
+        self,
+        log_path: str,
+        stats_log: str,
+        build_dir: str | None,
+        key: str | None,
+        cancel: Cancellation | None,
+        targets: list[str] | None = None,
+    ) -> BuildResult:
+
+        # Only a streamed build can be stopped, so cancellable builds always stream.
+        monitor = BuildMonitor(log_path, cancel=cancel) if settings.runtime.STREAM_BUILD or cancel else None
+
         start = time.time()
-        ok = builder.build(self.src, log_path)
+        ok = builder.build(self.src, log_path, build_dir, stats_log, monitor, targets)
         build_time = time.time() - start
 
+        compiler_cache = builder.cache_stats(stats_log, self.src, build_dir)
+        objects_rebuilt = monitor.objects if monitor and monitor.lines else self.__count_objects(log_path)
+        phases = monitor.phases if monitor and monitor.lines else None
+
         if not ok:
-            log.error('Build failed. Check log for details.')
-            return BuildResult(ok=False, log=log_path, build_time=build_time, summary=self.__extract_build_summary(log_path))
+            summary = monitor.summary if monitor and monitor.lines else self.__extract_build_summary(log_path)
+            fatal = monitor.fatal if monitor else None
+            return BuildResult(
+                ok=False,
+                log=log_path,
+                build_time=build_time,
+                summary=summary,
+                cached=False if key else None,
+                compiler_cache=compiler_cache,
+                fatal=fatal,
+                objects_rebuilt=objects_rebuilt,
+                phases=phases,
+            )
+
+        return BuildResult(
+            ok=True,
+            log=log_path,
+            build_time=build_time,
+            cached=False if key else None,
+            compiler_cache=compiler_cache,
+            objects_rebuilt=objects_rebuilt,
+            phases=phases,
+        )
+
+    def boot(self, dir: str, build_dir: str | None = None, cancel: Cancellation | None = None) -> BootResult:
+        return self.boot_async(dir, build_dir, cancel).result()
+
+    def boot_async(self, attempt_dir: str, build_dir: str | None = None, cancel: Cancellation | None = None) -> Future[BootResult]:
+
+        log_path = f'{attempt_dir}/boot.log'
+        output = self.output(build_dir)
+
+        if not os.path.exists(f'{output}/{settings.kernel.BZIMAGE}'):
+            log.error('Kernel binary not found. Please build the kernel before booting.')
+            return self.__resolved(BootResult(status='no', log=log_path))
 
-        log.success('Build completed successfully.')
+        key = self.__artifact_key(output) if settings.runtime.ARTIFACT_STORE else None
+        timeout = self.__boot_timeout()
 
-        return BuildResult(ok=True, log=log_path, build_time=build_time)
+        if key is not None:
+            cached = artifact_store.load_boot(key, log_path, self.__boot_conditions(), timeout)
+            if cached is not None:
+                log.success(f'Boot result restored from artifact store ({cached.status}).')
+                return self.__resolved(cached)
 
-    def boot(self, dir: str) -> BootResult:
+        # The image is copied out so the build tree can be rebuilt while the boot waits for a slot.
+        image = f'{attempt_dir}/{os.path.basename(settings.kernel.BZIMAGE)}'
+        shutil.copyfile(f'{output}/{settings.kernel.BZIMAGE}', image)
 
-        log.info('Running QEMU test on kernel...')
+        smoke = settings.runtime.SMOKE_BOOT and diffconfig.parse(f'{output}/.config').get('CONFIG_BLK_DEV_INITRD') == 'y'
 
-        log_path = f'{dir}/boot.log'
+        log.info('Queueing QEMU test on kernel...')
 
-        if not os.path.exists(f'{self.src}/{settings.kernel.BZIMAGE}'):
-            log.error('Kernel binary not found. Please build the kernel before booting.')
-            return BootResult(status='no', log=log_path)
+        return boot_farm.submit(self.__boot, log_path, image, key, time.time(), smoke, timeout, cancel)
+
+    def __boot(self, log_path: str, image: str, key: str | None, queued: float, smoke: bool, boot_timeout: int, cancel: Cancellation | None) -> BootResult:
+
+        # Cancelled while it waited for a slot.
+        if cancel is not None and cancel.cancelled:
+            os.remove(image)
+            return BootResult(status='no', log=log_path, queue_time=time.time() - queued)
+
+        # Only a streamed boot can be stopped, so cancellable boots always stream.
+        stream = settings.runtime.STREAM_BOOT or cancel is not None
+        tier = None
 
         start = time.time()
-        status = qemu.test(self.src, log_path)
+        try:
+            if smoke:
+                log.info('Running QEMU smoke test on kernel...')
+
+                # Kept apart from the full boot's log so a smoke failure can still be diagnosed afterwards.
+                smoke_log = f'{os.path.dirname(log_path)}/boot-smoke.log'
+                timeout = settings.runtime.SMOKE_BOOT_TIMEOUT
+                monitor = BootMonitor(smoke_log, timeout=timeout, rules=SMOKE_RULES, cancel=cancel) if stream else None
+
+                status = qemu.test(os.path.dirname(image), smoke_log, monitor, timeout, image, initramfs.path(settings.kernel.ARCH))
+                tier = BootTier(status=status, log=smoke_log, boot_time=time.time() - start, rule=monitor.rule if monitor else None)
+
+            # A kernel that cannot reach a trivial init will not reach the Debian login either.
+            if tier is not None and tier.status in ('panic', 'timeout'):
+                log_path = tier.log
+            else:
+                log.info('Running QEMU test on kernel...')
+
+                timeout = boot_timeout
+                monitor = BootMonitor(log_path, timeout=timeout, cancel=cancel) if stream else None
+
+                status = qemu.test(os.path.dirname(image), log_path, monitor, timeout, image)
+        finally:
+            os.remove(image)
         boot_time = time.time() - start
 
         if status == 'yes':
@@ -155,7 +393,88 @@ class Kernel:
         else:
             log.error('QEMU process failed. Check log for details.')
 
-        return BootResult(status=status, log=log_path, boot_time=boot_time, summary=self.__extract_boot_summary(log_path, status))
+        summary = monitor.summary(status) if monitor and monitor.lines else self.__extract_boot_summary(log_path, status)
+        rule = monitor.rule if monitor else None
+        milestones = monitor.milestones if monitor and monitor.lines else None
+        result = BootResult(
+            status=status,
+            log=log_path,
+            boot_time=boot_time,
+            summary=summary,
+            cached=False if key else None,
+            rule=rule,
+            timeout=timeout,
+            queue_time=start - queued,
+            smoke=tier,
+            milestones=milestones,
+        )
+
+        if status == 'yes' and settings.runtime.ADAPTIVE_BOOT_TIMEOUT:
+            boot_times.record(self.__boot_commit(), boot_time - (tier.boot_time if tier else 0.0))
+
+        if key is not None:
+            artifact_store.save_boot(key, result, self.__boot_conditions())
+
+        return result
+
+    def __resolved(self, result: BootResult) -> Future[BootResult]:
+        future: Future[BootResult] = Future()
+        future.set_result(result)
+        return future
+
+    def __boot_timeout(self) -> int:
+
+        if not settings.runtime.ADAPTIVE_BOOT_TIMEOUT:
+            return settings.runtime.BOOT_TIMEOUT
+
+        timeout = boot_times.timeout(self.__boot_commit())
+        log.info(f'Using adaptive boot timeout of {timeout}s.')
+
+        return timeout
+
+    def __boot_conditions(self) -> dict:
+
+        # Everything besides the kernel and the boot timeout that a stored boot verdict depends on.
+        image = settings.kernel.DEBIAN_IMG
+        try:
+            stat = os.stat(image)
+            image = f'{image}:{stat.st_size}:{stat.st_mtime_ns}'
+        except OSError:
+            pass
+
+        return {
+            'image': text_digest(image),
+            'smoke_timeout': settings.runtime.SMOKE_BOOT_TIMEOUT if settings.runtime.SMOKE_BOOT else None,
+            'stall_timeout': settings.runtime.BOOT_STALL_TIMEOUT if settings.runtime.STREAM_BOOT else None,
+        }
+
+    def __boot_commit(self) -> str | None:
+        try:
+            return self.commit
+        except Exception as e:
+            log.warning(f'Could not resolve kernel commit for boot times: {e}')
+            return None
+
+    def __artifact_key(self, output: str) -> str | None:
+        try:
+            return artifact_store.key(self.commit, text_digest(diffconfig.normalize(f'{output}/.config')))
+        except Exception as e:
+            log.warning(f'Could not compute artifact store key: {e}')
+            return None
+
+    def __klocalizer_key(self, config: str, define: list[str], undefine: list[str], patch: str | None) -> str | None:
+        try:
+            return klocalizer_cache.key(self.commit, text_digest(diffconfig.normalize(config)), define, undefine, file_digest(patch) if patch else None)
+        except Exception as e:
+            log.warning(f'Could not compute KLocalizer cache key: {e}')
+            return None
+
+    def __count_objects(self, log_path: str) -> int | None:
+        try:
+            with open(log_path, encoding='utf-8', errors='replace') as f:
+                return sum(1 for line in f if OBJECT_PATTERN.match(line))
+        except OSError:
+            return None
 
     def __extract_build_summary(self, log_path: str) -> str | None:
         try:
@@ -1,3 +1,4 @@
 from .metrics import session_metrics, experiment_metrics
 from .gdrive import DriveUploader
 from .sample import sampler
+from .runner import session_runner
@@ -1,4 +1,6 @@
 from singleton_decorator import singleton
+from src.kernel.builder import BUILD_PHASES
+from src.kernel import boot_times
 from src.config import settings
 import json
 
@@ -19,6 +21,8 @@ class SessionMetrics:
 			'constraints': data['constraints'],
 			'llm_token_usage': data['llm_token_usage'],
 			'embedding_token_usage': data['embedding_token_usage'],
+			'build_phases': data.get('build_phases', {}),
+			'boot_milestones': data.get('boot_milestones', []),
 		}
 
 @singleton
@@ -37,6 +41,10 @@ class ExperimentMetrics:
 		sorted_entries = sorted(self.__completed, key=lambda t: t[0])
 		successes = [d for d in entries if d['status'] in ['success', 'success-maintenance']]
 		total_attempts = sum(d['attempts'] for d in entries)
+		build_phases = {phase: sum(d.get('build_phases', {}).get(phase, 0.0) for d in entries) for phase in BUILD_PHASES}
+		boot_milestones = self.__milestone_percentiles([m for d in entries for m in d.get('boot_milestones', [])])
+		input_tokens = sum(d['llm_token_usage']['input_tokens'] for d in entries)
+		cached_input_tokens = sum(d['llm_token_usage'].get('cached_input_tokens', 0) for d in entries)
 
 		with open(f'{settings.runtime.OUTPUT_DIR}/results.json', 'w', encoding='utf-8') as f:
 			json.dump({
@@ -73,7 +81,11 @@ class ExperimentMetrics:
 						'input_tokens': sum(d['llm_token_usage']['input_tokens'] for d in entries) / total_attempts if total_attempts > 0 else -1,
 						'output_tokens': sum(d['llm_token_usage']['output_tokens'] for d in entries) / total_attempts if total_attempts > 0 else -1,
 						'total_tokens': sum(d['llm_token_usage']['total_tokens'] for d in entries) / total_attempts if total_attempts > 0 else -1,
-					}
+					},
+					'prompt_cache': {
+						'cached_input_tokens': cached_input_tokens,
+						'hit_rate': cached_input_tokens / input_tokens if input_tokens > 0 else -1,
+					},
 				},
 				'embedding_token_usage': {
 					'model': settings.agent.EMBEDDING_MODEL if settings.runtime.USE_RAG else None,
@@ -84,6 +96,11 @@ class ExperimentMetrics:
 				'time': {
 					'avg_duration': sum(d['duration'] for d in entries) / n,
 					'avg_duration_per_attempt': sum(d['duration'] for d in entries) / total_attempts if total_attempts > 0 else -1,
+					'build_phases': {
+						'total': build_phases,
+						'avg_per_repair': {phase: total / n for phase, total in build_phases.items()},
+					},
+					'boot_milestones': boot_milestones,
 				},
 				'samples': [
 					{
@@ -100,5 +117,22 @@ class ExperimentMetrics:
 				]
 			}, f, indent=4)
 
+	def __milestone_percentiles(self, boots: list[dict[str, float]]) -> dict[str, dict[str, float]]:
+
+		samples: dict[str, list[float]] = {}
+		for milestones in boots:
+			for name, seconds in milestones.items():
+				samples.setdefault(name, []).append(seconds)
+
+		return {
+			name: {
+				'n': len(values),
+				'p50': boot_times.percentile(values, 50),
+				'p90': boot_times.percentile(values, 90),
+				'p95': boot_times.percentile(values, 95),
+				'max': max(values),
+			} for name, values in samples.items()
+		}
+
 session_metrics = SessionMetrics()
 experiment_metrics = ExperimentMetrics()
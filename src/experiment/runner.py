@@ -0,0 +1,34 @@
+from src.config import settings, log_settings
+from singleton_decorator import singleton
+from src.core.kernel import Kernel
+from src.agent import Session
+from src.models import Input
+from src.core import agent
+from src.utils import log
+import traceback
+import os
+
+@singleton
+class SessionRunner:
+
+    def repair(self, repair_input: Input, kernel_src: str, output: str, log_file: str, overrides: dict[str, dict] | None = None) -> Session | None:
+
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+
+        # Each session works on its own copy of the settings, so sessions in one process can differ.
+        with settings.session(overrides), log.capture(log_file):
+            settings.runtime.OUTPUT_DIR = os.path.abspath(f'{output}/agent_repair')
+            log_settings()
+            log.info('Starting agent repair process...')
+
+            try:
+                session = agent.repair(repair_input, Kernel(kernel_src))
+            except Exception as e:
+                log.error(f'Repair failed with error: {e}')
+                log.error(f'Traceback:\n{"".join(traceback.format_exception(type(e), e, e.__traceback__))}')
+                return None
+
+            log.info(f'See {settings.runtime.OUTPUT_DIR} for full details of the agent repair attempts.')
+            return session
+
+session_runner = SessionRunner()
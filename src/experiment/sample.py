@@ -72,7 +72,7 @@ class Sampler:
 						if result.status != 'success':
 							log.warning(f'KLocalizer failed to apply constraints for sample {i + 1}. Proceeding with unconstrained config.')
 						else:
-							shutil.copyfile(f'{kernel.src}/.config', sample.original_config)
+							shutil.copyfile(result.config, sample.original_config)
 
 					build_result = kernel.build(sample.sample_dir, sample.original_config)
 					sample.built = build_result.ok
@@ -107,7 +107,7 @@ class Sampler:
 					worktree.cleanup(sample.kernel_src)
 
 		tasks = [lambda idx=i: process(idx) for i in range(n)]
-		dispatcher.run_callables(tasks)
+		dispatcher.run_callables(tasks, settings.runtime.MAX_THREADS)
 
 		return summary, completed
 
@@ -179,7 +179,7 @@ class Sampler:
 					worktree.cleanup(sample.kernel_src)
 
 		tasks = [lambda idx=i: process(idx) for i in range(n)]
-		dispatcher.run_callables(tasks)
+		dispatcher.run_callables(tasks, settings.runtime.MAX_THREADS)
 
 		return summary, completed
 
@@ -241,28 +241,44 @@ class Sampler:
 		log.success('Base configuration generated successfully.')
 		log.info('Verifying base configuration bootability...')
 
-		if kernel.build(sample.sample_dir, original_config).ok and kernel.boot(sample.sample_dir).status == 'yes':
-			log.success('Base configuration is valid and bootable.')
-			sample.original_config = original_config
-		else:
-			log.error('Base configuration failed to boot.')
+		if not kernel.build(sample.sample_dir, original_config).ok:
+			log.error('Base configuration failed to build.')
 			return False
-		
+
+		# The modified config does not depend on the boot outcome, so it is made while the base boots.
+		boot = kernel.boot_async(sample.sample_dir)
+
 		# Modified Config
 
 		patch_path = f'{sample.sample_dir}/changes.patch'
-		if not kernel.make_patch(patch_path):
+		patch_ok = kernel.make_patch(patch_path)
+		modified_config = f'{sample.sample_dir}/modified.config'
+		klocalizer_ok = patch_ok and kernel.run_klocalizer(
+			sample.sample_dir,
+			original_config,
+			define=list(hard_define),
+			undefine=list(hard_undefine),
+			patch=patch_path,
+			output=modified_config,
+		).status == 'success'
+
+		if boot.result().status != 'yes':
+			log.error('Base configuration failed to boot.')
+			return False
+
+		log.success('Base configuration is valid and bootable.')
+		sample.original_config = original_config
+
+		if not patch_ok:
 			log.error('Failed to create patch for sample.')
 			return False
 
 		sample.patch = patch_path
-		
-		if kernel.run_klocalizer(sample.sample_dir, original_config, define=list(hard_define), undefine=list(hard_undefine), patch=patch_path).status != 'success':
+
+		if not klocalizer_ok:
 			log.error('KLocalizer failed for patch sample.')
 			return False
-		
-		modified_config = f'{sample.sample_dir}/modified.config'
-		shutil.copyfile(f'{kernel.src}/.config', modified_config)
+
 		sample.modified_config = modified_config
 
 		return True
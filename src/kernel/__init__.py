@@ -2,3 +2,7 @@ from .diffconfig import diffconfig
 from .randconfig import randconfig
 from .worktree import worktree
 from .builder import builder
+from .store import artifact_store
+from .boottimes import boot_times
+from .klocalizercache import klocalizer_cache
+from .kconfigindex import kconfig_index
@@ -0,0 +1,61 @@
+from singleton_decorator import singleton
+from contextlib import contextmanager
+from src.utils import file_lock, read_json, write_json
+from src.config import settings
+import fcntl
+import math
+import os
+
+@singleton
+class BootTimes:
+
+    def record(self, commit: str | None, boot_time: float):
+
+        with self.__locked():
+            data = (read_json(settings.kernel.BOOT_TIMES) or {})
+            arch = data.setdefault(settings.kernel.ARCH, {'all': [], 'commits': {}})
+
+            self.__append(arch['all'], boot_time)
+            if commit:
+                self.__append(arch['commits'].setdefault(commit, []), boot_time)
+
+            write_json(settings.kernel.BOOT_TIMES, data)
+
+    def timeout(self, commit: str | None = None) -> int:
+
+        ceiling = settings.runtime.BOOT_TIMEOUT
+
+        arch = (read_json(settings.kernel.BOOT_TIMES) or {}).get(settings.kernel.ARCH, {})
+        samples = arch.get('commits', {}).get(commit, []) if commit else []
+        if len(samples) < settings.runtime.BOOT_TIMEOUT_MIN_SAMPLES:
+            samples = arch.get('all', [])
+        if len(samples) < settings.runtime.BOOT_TIMEOUT_MIN_SAMPLES:
+            return ceiling
+
+        timeout = self.percentile(samples, settings.runtime.BOOT_TIMEOUT_PERCENTILE) + settings.runtime.BOOT_TIMEOUT_MARGIN
+        return min(ceiling, math.ceil(timeout))
+
+    def percentile(self, samples: list[float], p: float) -> float:
+
+        ordered = sorted(samples)
+        rank = (len(ordered) - 1) * p / 100
+        low = math.floor(rank)
+        high = math.ceil(rank)
+
+        return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+    def __append(self, samples: list[float], boot_time: float):
+        samples.append(round(boot_time, 3))
+        del samples[:-settings.runtime.BOOT_TIMEOUT_HISTORY]
+
+    @contextmanager
+    def __locked(self):
+
+        # Repair sessions run as separate processes during experiments, so the thread lock alone is not enough.
+        with file_lock:
+            os.makedirs(os.path.dirname(settings.kernel.BOOT_TIMES), exist_ok=True)
+            with open(f'{settings.kernel.BOOT_TIMES}.lock', 'w', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+boot_times = BootTimes()
@@ -1,15 +1,368 @@
+from src.models import CompilerCacheStats
 from singleton_decorator import singleton
+from functools import partial
 from src.config import settings
+from collections import deque
+from src.utils import log, job_slot, release_tokens, dir_size, Cancellation
 import subprocess
+import threading
+import signal
+import time
+import shutil
+import re
+import os
+
+ERROR_PATTERN = re.compile(r'\berror:|\*\*\* |\bError \d+')
+OBJECT_PATTERN = re.compile(r'^\s+(CC|AS)(\s+\[M\])?\s+\S+\.o$')
+STEP_PATTERN = re.compile(r'^\s+([A-Z][A-Z0-9_]*)(\s+\[M\])?\s+(\S+)')
+CONFIG_DONE_PATTERN = re.compile(r'^# (configuration written to|No change to)')
+FAILED_TARGET_PATTERN = re.compile(r'\*\*\* \[[^\]]*?(\S+\.o)\] Error \d+')
+FAILED_SOURCE_PATTERN = re.compile(r'^([\w./-]+)\.[cS]:\d+:\d+: (fatal )?error:')
+
+BUILD_PHASES = ('olddefconfig', 'prepare', 'host_tools', 'compile', 'link', 'image')
+HOST_STEPS = {'HOSTCC', 'HOSTCXX', 'HOSTLD', 'HOSTAR', 'YACC', 'LEX'}
+COMPILE_STEPS = {'CC', 'AS', 'CPP', 'LDS', 'AR'}
+LINK_STEPS = {'LD', 'KSYMS', 'KSYM', 'SORTTAB', 'SYSMAP', 'MODPOST', 'NM', 'BTF', 'MODINFO'}
+IMAGE_STEPS = {'OBJCOPY', 'GZIP', 'LZ4', 'LZMA', 'LZO', 'XZKERN', 'BZIP2', 'ZSTD', 'ZSTD22', 'MKPIGGY', 'RELOCS', 'VOFFSET', 'ZOFFSET', 'BUILD'}
+
+def build_phase(step: str, target: str) -> str:
+
+    if step in HOST_STEPS:
+        return 'host_tools'
+    if step in IMAGE_STEPS or '/boot/' in target:
+        return 'image'
+    if step in LINK_STEPS:
+        return 'link'
+    if step in COMPILE_STEPS:
+        return 'compile'
+
+    return 'prepare'
+
+class BuildMonitor:
+
+    def __init__(
+        self,
+        log_file: str,
+        fatal_patterns: list[str] | None = None,
+        grace: float | None = None,
+        tail: int = 50,
+        max_errors: int = 20,
+        cancel: Cancellation | None = None,
+    ):
+
+        patterns = settings.runtime.BUILD_FATAL_PATTERNS if fatal_patterns is None else fatal_patterns
+
+        self.log_file = log_file
+        self.grace = settings.runtime.BUILD_FATAL_GRACE if grace is None else grace
+        self.fatal_patterns = [re.compile(p) for p in patterns]
+        self.max_errors = max_errors
+        self.cancel = cancel or Cancellation()
+
+        self.lines = 0
+        self.objects = 0
+        self.tail: deque[tuple[int, str]] = deque(maxlen=tail)
+        self.errors: list[tuple[int, str]] = []
+        self.fatal: str | None = None
+
+        self.phases: dict[str, float] = {}
+        self.__phase = 'olddefconfig'
+        self.__last = time.monotonic()
+
+    def feed(self, line: str) -> bool:
+
+        i = self.lines
+        self.lines += 1
+        self.tail.append((i, line))
+        self.__time(line)
+
+        if OBJECT_PATTERN.match(line):
+            self.objects += 1
+
+        if len(self.errors) < self.max_errors and ERROR_PATTERN.search(line):
+            self.errors.append((i, line))
+
+        if self.fatal is None and any(p.search(line) for p in self.fatal_patterns):
+            self.fatal = line.strip()
+            return True
+
+        return False
+
+    def finish(self):
+        self.__elapse()
+
+    def __time(self, line: str):
+
+        # Wall time between lines is charged to the phase of the later line, so phases add up to the build time under -j.
+        phase = self.__phase
+        if CONFIG_DONE_PATTERN.match(line):
+            self.__elapse()
+            self.__phase = 'prepare'
+            return
+
+        step = STEP_PATTERN.match(line)
+        if step is not None:
+            phase = build_phase(step.group(1), step.group(3))
+            # Kconfig's own host tools and mrproper run before the config is written.
+            if self.__phase == 'olddefconfig' and (phase == 'host_tools' or step.group(1) == 'CLEAN'):
+                phase = 'olddefconfig'
+
+        self.__phase = phase
+        self.__elapse()
+
+    def __elapse(self):
+        now = time.monotonic()
+        self.phases[self.__phase] = self.phases.get(self.__phase, 0.0) + now - self.__last
+        self.__last = now
+
+    @property
+    def summary(self) -> str | None:
+
+        # Errors that already scrolled out of the tail are listed ahead of it.
+        first = self.tail[0][0] if self.tail else self.lines
+        lines = [(i, l) for i, l in self.errors if i < first] + list(self.tail)
+
+        return ''.join(f'{i}: {l}' for i, l in lines).strip() or None
 
 @singleton
 class Builder:
 
-    def build(self, kernel_src: str, log_file: str) -> bool:
+    def build(
+        self,
+        kernel_src: str,
+        log_file: str,
+        output_dir: str | None = None,
+        stats_log: str | None = None,
+        monitor: BuildMonitor | None = None,
+        targets: list[str] | None = None,
+    ) -> bool:
+
+        wrapper = 'ccache' if self.__use_cache() else ''
+        env = self.__cache_env(stats_log) if wrapper else None
 
-        cmd = ['bash', settings.scripts.BUILD_SCRIPT, kernel_src, log_file, settings.kernel.ARCH, settings.kernel.BZIMAGE, str(settings.runtime.JOBS)]
-        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        cmd = [
+            'bash',
+            settings.scripts.BUILD_SCRIPT,
+            kernel_src,
+            '-' if monitor else log_file,
+            settings.kernel.ARCH,
+            settings.kernel.BZIMAGE,
+            str(settings.runtime.JOBS),
+            output_dir or '',
+            wrapper,
+            settings.runtime.JOBSERVER_FIFO or '',
+            ' '.join(targets or []),
+        ]
+
+        with job_slot(settings.runtime.JOBSERVER_FIFO):
+            if monitor is not None:
+                return self.__stream(cmd, env, monitor)
+
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env, check=False)
 
         return result.returncode == 0
-    
+
+    def failed_objects(self, log_file: str, limit: int = 20) -> list[str]:
+
+        objects: list[str] = []
+
+        try:
+            with open(log_file, encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    target = FAILED_TARGET_PATTERN.search(line)
+                    source = FAILED_SOURCE_PATTERN.match(line)
+                    if target:
+                        obj = target.group(1)
+                    elif source and not source.group(1).startswith(('/', '..')):
+                        obj = f'{source.group(1)}.o'
+                    else:
+                        continue
+
+                    if obj not in objects:
+                        objects.append(obj)
+        except OSError:
+            return []
+
+        return objects[:limit]
+
+    def cache_stats(self, stats_log: str, kernel_src: str, output_dir: str | None = None) -> CompilerCacheStats | None:
+
+        if not os.path.exists(stats_log):
+            return None
+
+        output = output_dir or kernel_src
+        hits = 0
+        misses = 0
+        bytes_saved = 0
+
+        # ccache writes one "# <source>" line per compilation followed by its outcome counters.
+        source = None
+        with open(stats_log, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('# '):
+                    source = line[2:]
+                elif line in ('direct_cache_hit', 'preprocessed_cache_hit'):
+                    hits += 1
+                    bytes_saved += self.__object_size(source, kernel_src, output)
+                elif line == 'cache_miss':
+                    misses += 1
+
+        return CompilerCacheStats(hits=hits, misses=misses, bytes_saved=bytes_saved)
+
+    def cache_size(self) -> int:
+        return dir_size(settings.kernel.CCACHE_DIR)
+
+    def trim_cache(self, max_size: str) -> bool:
+
+        env = {**os.environ, 'CCACHE_DIR': settings.kernel.CCACHE_DIR, 'CCACHE_MAXSIZE': max_size}
+        result = subprocess.run(['ccache', '--cleanup'], env=env, capture_output=True, text=True, check=False)
+
+        if result.returncode != 0:
+            log.error(f'ccache cleanup failed with exit code {result.returncode}')
+            if result.stderr:
+                log.error(f'Stderr: {result.stderr}')
+
+        return result.returncode == 0
+
+    def __stream(self, cmd: list[str], env: dict | None, monitor: BuildMonitor) -> bool:
+
+        os.makedirs(os.path.dirname(os.path.abspath(monitor.log_file)), exist_ok=True)
+
+        # A new session makes the script the leader of a process group holding every make and compiler job.
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env, text=True, errors='replace', start_new_session=True) as proc:
+            timer = None
+
+            with monitor.cancel.on_cancel(partial(self.__stop, proc)), open(monitor.log_file, 'w', encoding='utf-8') as f:
+                for line in proc.stdout:
+                    f.write(line)
+                    if monitor.feed(line):
+                        log.warning(f'Fatal build error detected, stopping make: {monitor.fatal}')
+                        # Let the failing compiler finish reporting before the group is killed.
+                        timer = threading.Timer(monitor.grace, self.__kill, args=(proc,))
+                        timer.start()
+
+            proc.wait()
+            monitor.finish()
+            if timer is not None:
+                timer.cancel()
+
+        return proc.returncode == 0
+
+    def __stop(self, proc: subprocess.Popen):
+        # Called under the cancellation's lock, so the kill, which can wait on the process, runs apart.
+        threading.Thread(target=self.__kill, args=(proc,), daemon=True).start()
+
+    def __kill(self, proc: subprocess.Popen):
+
+        # Killing make would strand the jobserver tokens held by its jobs; killing only the
+        # jobs lets make fail normally and hand its tokens back.
+        fifo = settings.runtime.JOBSERVER_FIFO
+        if fifo:
+            self.__kill_jobs(proc.pid)
+            try:
+                proc.wait(timeout=30)
+                return
+            except subprocess.TimeoutExpired:
+                pass
+
+        held = self.__held_tokens(proc.pid) if fifo else 0
+
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+        # Make dies with its tokens still taken, so they are put back for the other builds.
+        if held:
+            proc.wait()
+            release_tokens(fifo, held)
+            log.warning(f'Returned {held} jobserver tokens stranded by the killed build.')
+
+    def __kill_jobs(self, pgid: int):
+
+        for pid, (_, comm) in self.__group(pgid).items():
+            if comm in ('bash', 'sh', 'make', 'make.cross'):
+                continue
+
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def __held_tokens(self, pgid: int) -> int:
+
+        # Every make runs its first job without a token, so each one holds a token per job beyond that.
+        group = self.__group(pgid)
+        makes = {pid for pid, (_, comm) in group.items() if comm == 'make'}
+        jobs = [ppid for ppid, _ in group.values() if ppid in makes]
+
+        return len(jobs) - len(set(jobs))
+
+    def __group(self, pgid: int) -> dict[int, tuple[int, str]]:
+
+        group = {}
+        for pid in filter(str.isdigit, os.listdir('/proc')):
+            try:
+                with open(f'/proc/{pid}/stat', encoding='utf-8') as f:
+                    stat = f.read()
+            except OSError:
+                continue
+
+            # comm may contain spaces, so fields are split after its closing parenthesis.
+            comm = stat[stat.index('(') + 1:stat.rindex(')')]
+            fields = stat[stat.rindex(')') + 2:].split()
+            if int(fields[2]) == pgid:
+                group[int(pid)] = (int(fields[1]), comm)
+
+        return group
+
+    def __use_cache(self) -> bool:
+
+        if not settings.runtime.COMPILER_CACHE:
+            return False
+
+        if shutil.which('ccache') is None:
+            log.warning('ccache not found, building without the compiler cache.')
+            return False
+
+        return True
+
+    def __cache_env(self, stats_log: str | None) -> dict:
+
+        os.makedirs(settings.kernel.CCACHE_DIR, exist_ok=True)
+
+        env = {
+            **os.environ,
+            'CCACHE_DIR': settings.kernel.CCACHE_DIR,
+            'CCACHE_MAXSIZE': settings.runtime.COMPILER_CACHE_SIZE,
+            # Paths under one root shared by every worktree and build dir are hashed relative to it, so objects are shared across them
+            'CCACHE_BASEDIR': self.__cache_basedir(),
+            'CCACHE_NOHASHDIR': '1',
+            'CCACHE_SLOPPINESS': 'file_macro,time_macros,include_file_mtime,include_file_ctime,locale',
+        }
+
+        if stats_log:
+            env['CCACHE_STATSLOG'] = stats_log
+
+        return env
+
+    def __cache_basedir(self) -> str:
+
+        # Worktrees, the kernel tree and sample outputs all live under the workspace that holds the cache.
+        return os.path.abspath(settings.runtime.COMPILER_CACHE_BASEDIR or os.path.dirname(settings.kernel.CCACHE_DIR))
+
+    def __object_size(self, source: str | None, kernel_src: str, output: str) -> int:
+
+        if not source:
+            return 0
+
+        path = os.path.normpath(os.path.join(output, source))
+        if path.startswith(f'{os.path.normpath(kernel_src)}/'):
+            path = os.path.join(output, os.path.relpath(path, kernel_src))
+
+        try:
+            return os.path.getsize(f'{os.path.splitext(path)[0]}.o')
+        except OSError:
+            return 0
+
 builder = Builder()
@@ -23,4 +23,32 @@ class DiffConfig:
 
         return diff_lines, num_differences
 
+    def parse(self, path: str) -> dict[str, str]:
+
+        values = {}
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('CONFIG_') and '=' in line:
+                    key, value = line.split('=', 1)
+                    values[key] = value
+
+        return values
+
+    def builtin_changes(self, old_config: str, new_config: str) -> list[str]:
+
+        old = self.parse(old_config)
+        new = self.parse(new_config)
+
+        # Treats =m <-> unset as module-only. That is a heuristic: IS_ENABLED(), IS_REACHABLE() and selects
+        # can still change vmlinux when a tristate flips between m and n, so callers must opt in.
+        return sorted(
+            key for key in old.keys() | new.keys()
+            if old.get(key) != new.get(key) and not {old.get(key), new.get(key)} <= {'m', None}
+        )
+
+    def normalize(self, path: str) -> str:
+        values = self.parse(path)
+        return '\n'.join(f'{key}={values[key]}' for key in sorted(values))
+
 diffconfig = DiffConfig()
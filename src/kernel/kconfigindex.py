@@ -0,0 +1,88 @@
+from singleton_decorator import singleton
+from src.config import settings
+from src.utils import log, read_json, write_json
+import threading
+import difflib
+import re
+import os
+
+SYMBOL_PATTERN = re.compile(r'^\s*(?:menu)?config\s+([A-Za-z0-9_]+)\s*$')
+TYPE_PATTERN = re.compile(r'^\s*(bool|tristate|string|hex|int|def_bool|def_tristate)\b')
+HELP_PATTERN = re.compile(r'^\s*(---help---|help)\s*$')
+
+@singleton
+class KconfigIndex:
+
+    def __init__(self):
+        self.__loaded: dict[str, dict[str, dict]] = {}
+        self.__lock = threading.Lock()
+
+    def load(self, kernel_src: str, commit: str) -> dict[str, dict]:
+
+        with self.__lock:
+            if commit in self.__loaded:
+                return self.__loaded[commit]
+
+            path = f'{settings.kernel.KCONFIG_INDEX_DIR}/{commit}.json'
+            symbols = read_json(path)
+            if symbols is None:
+                log.info(f'Indexing Kconfig symbols for commit {commit[:12]}...')
+                symbols = self.build(kernel_src)
+                write_json(path, symbols)
+
+            self.__loaded[commit] = symbols
+            return symbols
+
+    def build(self, kernel_src: str) -> dict[str, dict]:
+
+        symbols: dict[str, dict] = {}
+
+        for root, dirs, files in os.walk(kernel_src):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(files):
+                if name == 'Kconfig' or name.startswith('Kconfig.'):
+                    self.__parse(os.path.join(root, name), os.path.relpath(os.path.join(root, name), kernel_src), symbols)
+
+        return symbols
+
+    def resolve(self, symbols: dict[str, dict], options: list[str]) -> tuple[list[str], dict[str, str | None]]:
+
+        resolved = []
+        corrections: dict[str, str | None] = {}
+
+        for option in options:
+            if option in symbols:
+                resolved.append(option)
+                continue
+
+            # Only a single close match is trusted; anything vaguer is dropped rather than guessed.
+            matches = difflib.get_close_matches(option, symbols, n=1, cutoff=settings.runtime.SYMBOL_MATCH_CUTOFF)
+            corrections[option] = matches[0] if matches else None
+            if matches and matches[0] not in resolved:
+                resolved.append(matches[0])
+
+        return resolved, corrections
+
+    def __parse(self, path: str, relpath: str, symbols: dict[str, dict]):
+
+        current = None
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                match = SYMBOL_PATTERN.match(line)
+                if match:
+                    current = f'CONFIG_{match.group(1)}'
+                    symbols.setdefault(current, {'type': None, 'file': relpath})
+                    continue
+
+                # Help text is free-form, so nothing after it is read as a type.
+                if HELP_PATTERN.match(line):
+                    current = None
+                    continue
+
+                match = TYPE_PATTERN.match(line)
+                if match and current is not None and symbols[current]['type'] is None:
+                    symbols[current]['type'] = match.group(1).removeprefix('def_')
+                elif line.strip() and not line[0].isspace():
+                    current = None
+
+kconfig_index = KconfigIndex()
@@ -0,0 +1,66 @@
+from src.models import KlocalizerResult
+from singleton_decorator import singleton
+from src.config import settings
+from src.utils import text_digest, read_json, write_json, copy_file, touch, evict_lru, EvictionBudget
+import json
+import os
+
+@singleton
+class KlocalizerCache:
+
+    def __init__(self):
+        self.__budget = EvictionBudget()
+
+    def key(self, commit: str, base_digest: str, define: list[str], undefine: list[str], patch_digest: str | None = None) -> str:
+
+        constraints = json.dumps({'define': sorted(set(define)), 'undefine': sorted(set(undefine)), 'patch': patch_digest, 'base': base_digest}, sort_keys=True)
+        return f'{settings.kernel.ARCH}/{commit}/{text_digest(constraints)}'
+
+    def path(self, key: str) -> str:
+        return f'{settings.kernel.KLOCALIZER_CACHE_DIR}/{key}'
+
+    def load(self, key: str, log_path: str, config_path: str) -> KlocalizerResult | None:
+
+        entry = self.path(key)
+        data = read_json(f'{entry}/result.json')
+        if data is None:
+            return None
+
+        config = f'{entry}/.config'
+        if data['status'] == 'success' and not os.path.exists(config):
+            return None
+
+        # Another process may evict the entry while it is being restored.
+        try:
+            if os.path.exists(f'{entry}/klocalizer.log'):
+                copy_file(f'{entry}/klocalizer.log', log_path)
+            if data['status'] == 'success':
+                copy_file(config, config_path)
+        except OSError:
+            return None
+
+        touch(entry)
+
+        return KlocalizerResult(status=data['status'], log=log_path, config=config_path if data['status'] == 'success' else None, cached=True)
+
+    def save(self, key: str, result: KlocalizerResult, config_path: str):
+
+        # Errors come from the toolchain rather than the constraints, so only verdicts are kept.
+        if result.status == 'error' or (result.status == 'success' and not os.path.exists(config_path)):
+            return
+
+        entry = self.path(key)
+        os.makedirs(entry, exist_ok=True)
+
+        if os.path.exists(result.log):
+            copy_file(result.log, f'{entry}/klocalizer.log')
+        if result.status == 'success':
+            copy_file(config_path, f'{entry}/.config')
+
+        write_json(f'{entry}/result.json', {'status': result.status}, indent=4)
+
+        limit = settings.runtime.KLOCALIZER_CACHE_SIZE * 1024 ** 3
+        if self.__budget.due(entry, limit):
+            evict_lru(settings.kernel.KLOCALIZER_CACHE_DIR, limit)
+
+klocalizer_cache = KlocalizerCache()
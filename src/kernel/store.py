@@ -0,0 +1,128 @@
+from src.models import BuildResult, BootResult
+from singleton_decorator import singleton
+from src.utils import read_json, write_json, copy_file, touch, evict_lru, EvictionBudget
+from src.config import settings
+import os
+
+@singleton
+class ArtifactStore:
+
+    def __init__(self):
+        self.__budget = EvictionBudget()
+
+    def key(self, commit: str, config_digest: str) -> str:
+        return f'{settings.kernel.ARCH}/{commit}/{config_digest}'
+
+    def path(self, key: str) -> str:
+        return f'{settings.kernel.ARTIFACT_DIR}/{key}'
+
+    def load_build(self, key: str, log_path: str, output_dir: str) -> BuildResult | None:
+
+        entry = self.path(key)
+        data = read_json(f'{entry}/build.json')
+        if data is None:
+            return None
+
+        image = f'{entry}/{os.path.basename(settings.kernel.BZIMAGE)}'
+        if data['ok'] and not os.path.exists(image):
+            return None
+
+        # Another process may evict the entry while it is being restored.
+        try:
+            if os.path.exists(f'{entry}/build.log'):
+                copy_file(f'{entry}/build.log', log_path)
+            if os.path.exists(f'{entry}/config'):
+                copy_file(f'{entry}/config', f'{output_dir}/.config')
+            if data['ok']:
+                copy_file(image, f'{output_dir}/{settings.kernel.BZIMAGE}')
+        except OSError:
+            return None
+
+        touch(entry)
+
+        return BuildResult(ok=data['ok'], log=log_path, build_time=0.0, summary=data['summary'], cached=True)
+
+    def save_build(self, key: str, result: BuildResult, output_dir: str):
+
+        entry = self.path(key)
+        os.makedirs(entry, exist_ok=True)
+
+        if os.path.exists(result.log):
+            copy_file(result.log, f'{entry}/build.log')
+
+        # The config olddefconfig produced during the build, restored with the image so boots key on it too.
+        if os.path.exists(f'{output_dir}/.config'):
+            copy_file(f'{output_dir}/.config', f'{entry}/config')
+
+        if result.ok:
+            copy_file(f'{output_dir}/{settings.kernel.BZIMAGE}', f'{entry}/{os.path.basename(settings.kernel.BZIMAGE)}')
+
+        write_json(f'{entry}/build.json', {'ok': result.ok, 'build_time': result.build_time, 'summary': result.summary}, indent=4)
+        self.__saved(entry)
+
+    def load_boot(self, key: str, log_path: str, conditions: dict, timeout: int) -> BootResult | None:
+
+        entry = self.path(key)
+        data = read_json(f'{entry}/boot.json')
+        if data is None or not self.__replayable(data, conditions, timeout):
+            return None
+
+        try:
+            if os.path.exists(f'{entry}/boot.log'):
+                copy_file(f'{entry}/boot.log', log_path)
+        except OSError:
+            return None
+        touch(entry)
+
+        return BootResult(status=data['status'], log=log_path, boot_time=0.0, summary=data['summary'], cached=True, rule=data.get('rule'), smoke=data.get('smoke'))
+
+    def save_boot(self, key: str, result: BootResult, conditions: dict):
+
+        # A QEMU process failure says nothing about the kernel, so it is not worth replaying.
+        if result.status == 'no':
+            return
+
+        entry = self.path(key)
+        os.makedirs(entry, exist_ok=True)
+
+        if os.path.exists(result.log):
+            copy_file(result.log, f'{entry}/boot.log')
+
+        write_json(f'{entry}/boot.json', {
+            'status': result.status,
+            'boot_time': result.boot_time,
+            'summary': result.summary,
+            'rule': result.rule,
+            'smoke': result.smoke.model_dump() if result.smoke else None,
+            'timeout': result.timeout,
+            'conditions': conditions,
+        }, indent=4)
+        self.__saved(entry)
+
+    def __replayable(self, data: dict, conditions: dict, timeout: int) -> bool:
+
+        # A verdict only holds for the guest image, smoke tier and stall window it was reached with.
+        if data.get('conditions') != conditions:
+            return False
+
+        smoke = data.get('smoke')
+        if smoke and smoke['status'] in ('panic', 'timeout'):
+            return True
+
+        # A timeout holds for any timeout up to the one it hit, any other verdict for any timeout it arrived within.
+        if data['status'] == 'timeout' and data.get('rule') != 'stall':
+            return data.get('timeout') is not None and timeout <= data['timeout']
+
+        return data['boot_time'] - (smoke['boot_time'] if smoke else 0.0) <= timeout
+
+    def __saved(self, entry: str):
+        if self.__budget.due(entry, self.__limit()):
+            self.evict()
+
+    def evict(self):
+        evict_lru(settings.kernel.ARTIFACT_DIR, self.__limit())
+
+    def __limit(self) -> int:
+        return settings.runtime.ARTIFACT_STORE_SIZE * 1024 ** 3
+
+artifact_store = ArtifactStore()
@@ -1,6 +1,6 @@
-from .results import BuildResult, BootResult, KlocalizerResult
+from .results import BuildResult, BuildProbe, BootResult, BootTier, KlocalizerResult, CompilerCacheStats
 from .token import LLMUsage, EmbeddingUsage
-from .response import AgentResponse
+from .response import AgentResponse, AgentBeamResponse
 from .attempt import Attempt
 from .tool import ToolCall
 from .sample import Sample
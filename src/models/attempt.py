@@ -1,4 +1,5 @@
 from .token import LLMUsage, EmbeddingUsage
+from .results import CompilerCacheStats, BuildProbe
 from pydantic import BaseModel, Field
 from .response import AgentResponse
 from .tool import ToolCall
@@ -13,22 +14,43 @@ class Attempt(BaseModel):
 
     klocalizer_status: Literal['success', 'no-satisfying-constraints', 'error', 'not-run'] = Field(default='not-run')
     klocalizer_log: str | None = Field(default=None)
+    klocalizer_cached: bool | None = Field(default=None)
+    symbol_corrections: dict[str, str | None] = Field(default_factory=dict)
 
     build_succeeded: bool = Field(default=False)
     build_log: str | None = Field(default=None)
     build_time: float = Field(default=0.0, ge=0)
+    build_cached: bool | None = Field(default=None)
+    compiler_cache: CompilerCacheStats | None = Field(default=None)
 
     boot_succeeded: Literal['yes', 'maintenance', 'panic', 'timeout', 'no'] = Field(default='no')
     boot_log: str | None = Field(default=None)
     boot_time: float = Field(default=0.0, ge=0)
+    boot_cached: bool | None = Field(default=None)
     boot_summary: str | None = Field(default=None)
+    boot_rule: str | None = Field(default=None)
+    boot_timeout: int | None = Field(default=None)
+    boot_queue_time: float = Field(default=0.0, ge=0)
+    boot_smoke: dict | None = Field(default=None)
+    boot_milestones: dict[str, float] | None = Field(default=None)
     build_summary: str | None = Field(default=None)
+    build_fatal: str | None = Field(default=None)
+    objects_rebuilt: int | None = Field(default=None)
+    build_phases: dict[str, float] | None = Field(default=None)
+    build_probe: BuildProbe | None = Field(default=None)
+    reused_from: int | None = Field(default=None)
+
+    rank: int | None = Field(default=None)
+    adopted: int | None = Field(default=None)
+    stopped: bool = Field(default=False)
+    candidates: list['Attempt'] = Field(default_factory=list)
 
     tool_calls: list[ToolCall] = Field(default_factory=list)
     response: AgentResponse | None = Field(default=None)
     wrapper_used: bool = Field(default=False)
     
     embedding_usage: EmbeddingUsage = Field(default_factory=EmbeddingUsage)
+    setup_time: float = Field(default=0.0, ge=0)
     llm_time: float = Field(default=0.0, ge=0)
     token_usage: LLMUsage = Field(default=LLMUsage(input_tokens=0, output_tokens=0, total_tokens=0))
 
@@ -39,15 +61,34 @@ class Attempt(BaseModel):
             'summary': {
                 'klocalizer_status': self.klocalizer_status,
                 'klocalizer_log': self.klocalizer_log,
+                'klocalizer_cached': self.klocalizer_cached,
+                'symbol_corrections': self.symbol_corrections,
                 'modified_config': self.config,
                 'build_succeeded': self.build_succeeded,
                 'build_log': self.build_log,
                 'build_time': self.build_time,
+                'build_phases': self.build_phases,
+                'build_probe': self.build_probe.model_dump() if self.build_probe else None,
+                'build_cached': self.build_cached,
+                'compiler_cache': self.compiler_cache.model_dump() if self.compiler_cache else None,
                 'boot_succeeded': self.boot_succeeded,
                 'boot_log': self.boot_log,
                 'boot_time': self.boot_time,
+                'boot_cached': self.boot_cached,
                 'boot_summary': self.boot_summary,
+                'boot_rule': self.boot_rule,
+                'boot_timeout': self.boot_timeout,
+                'boot_queue_time': self.boot_queue_time,
+                'boot_smoke': self.boot_smoke,
+                'boot_milestones': self.boot_milestones,
                 'build_summary': self.build_summary,
+                'build_fatal': self.build_fatal,
+                'objects_rebuilt': self.objects_rebuilt,
+                'reused_from': self.reused_from,
+                'rank': self.rank,
+                'adopted': self.adopted,
+                'stopped': self.stopped,
+                'setup_time': self.setup_time,
                 'llm_time': self.llm_time,
                 'tool_call_count': len(self.tool_calls),
                 'wrapper_used': self.wrapper_used,
@@ -60,5 +101,6 @@ class Attempt(BaseModel):
                 'define': self.response.define if self.response else None,
                 'undefine': self.response.undefine if self.response else None,
                 'reason': self.response.reasoning if self.response else None,
-            }
+            },
+            'candidates': [candidate.model_dump() for candidate in self.candidates],
         }
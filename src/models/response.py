@@ -36,3 +36,7 @@ class AgentResponse(BaseModel):
                 result.extend(matches)
         
         return result
+
+class AgentBeamResponse(BaseModel):
+
+    candidates: list[AgentResponse] = Field(description='Candidate fixes ranked from most to least likely to make the kernel boot. Each is a complete, independent set of changes.')
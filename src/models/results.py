@@ -1,18 +1,48 @@
 from pydantic import BaseModel, Field
 from typing import Literal
 
+class CompilerCacheStats(BaseModel):
+	hits: int = Field(default=0, ge=0, frozen=True)
+	misses: int = Field(default=0, ge=0, frozen=True)
+	bytes_saved: int = Field(default=0, ge=0, frozen=True)
+
+class BuildProbe(BaseModel):
+	targets: list[str] = Field(..., frozen=True)
+	ok: bool = Field(..., frozen=True)
+	time: float = Field(default=0.0, ge=0, frozen=True)
+
 class BuildResult(BaseModel):
 	ok: bool = Field(..., frozen=True)
 	log: str = Field(..., frozen=True)
 	build_time: float = Field(..., ge=0, frozen=True)
 	summary: str | None = Field(default=None, frozen=True)
+	cached: bool | None = Field(default=None, frozen=True)
+	compiler_cache: CompilerCacheStats | None = Field(default=None, frozen=True)
+	fatal: str | None = Field(default=None, frozen=True)
+	objects_rebuilt: int | None = Field(default=None, ge=0, frozen=True)
+	phases: dict[str, float] | None = Field(default=None, frozen=True)
+	probe: BuildProbe | None = Field(default=None, frozen=True)
+
+class BootTier(BaseModel):
+	status: Literal['yes', 'maintenance', 'panic', 'timeout', 'no'] = Field(..., frozen=True)
+	log: str | None = Field(default=None, frozen=True)
+	boot_time: float = Field(default=0.0, ge=0, frozen=True)
+	rule: Literal['login', 'smoke', 'maintenance', 'panic', 'oops', 'stall', 'timeout', 'exit'] | None = Field(default=None, frozen=True)
 
 class BootResult(BaseModel):
 	status: Literal['yes', 'maintenance', 'panic', 'timeout', 'no'] = Field(..., frozen=True)
 	log: str = Field(..., frozen=True)
 	boot_time: float = Field(default=0.0, ge=0, frozen=True)
 	summary: str | None = Field(default=None, frozen=True)
+	cached: bool | None = Field(default=None, frozen=True)
+	rule: Literal['login', 'smoke', 'maintenance', 'panic', 'oops', 'stall', 'timeout', 'exit'] | None = Field(default=None, frozen=True)
+	timeout: int | None = Field(default=None, frozen=True)
+	queue_time: float = Field(default=0.0, ge=0, frozen=True)
+	smoke: BootTier | None = Field(default=None, frozen=True)
+	milestones: dict[str, float] | None = Field(default=None, frozen=True)
 
 class KlocalizerResult(BaseModel):
 	status: Literal['success', 'no-satisfying-constraints', 'error'] = Field(..., frozen=True)
 	log: str = Field(..., frozen=True)
+	config: str | None = Field(default=None, frozen=True)
+	cached: bool | None = Field(default=None, frozen=True)
@@ -4,6 +4,7 @@ class LLMUsage(BaseModel):
 	input_tokens: int = Field(..., frozen=True)
 	output_tokens: int = Field(..., frozen=True)
 	total_tokens: int = Field(..., frozen=True)
+	cached_input_tokens: int = Field(default=0, frozen=True)
 
 	@classmethod
 	def from_response(cls, response: dict) -> 'LLMUsage':
@@ -12,6 +13,7 @@ class LLMUsage(BaseModel):
 			input_tokens=sum(msg.usage_metadata['input_tokens'] for msg in ai_messages if msg.usage_metadata),
 			output_tokens=sum(msg.usage_metadata['output_tokens'] for msg in ai_messages if msg.usage_metadata),
 			total_tokens=sum(msg.usage_metadata['total_tokens'] for msg in ai_messages if msg.usage_metadata),
+			cached_input_tokens=sum(cls.__cache_read(msg.usage_metadata) for msg in ai_messages if msg.usage_metadata),
 		)
 
 	@classmethod
@@ -21,13 +23,20 @@ class LLMUsage(BaseModel):
 			input_tokens=meta.get('input_tokens', 0),
 			output_tokens=meta.get('output_tokens', 0),
 			total_tokens=meta.get('total_tokens', 0),
+			cached_input_tokens=cls.__cache_read(meta),
 		)
 
+	@staticmethod
+	def __cache_read(meta: dict) -> int:
+		# Providers report prompt cache hits as part of input_tokens, broken out under input_token_details.
+		return (meta.get('input_token_details') or {}).get('cache_read') or 0
+
 	def __add__(self, other: 'LLMUsage') -> 'LLMUsage':
 		return LLMUsage(
 			input_tokens=self.input_tokens + other.input_tokens,
 			output_tokens=self.output_tokens + other.output_tokens,
 			total_tokens=self.total_tokens + other.total_tokens,
+			cached_input_tokens=self.cached_input_tokens + other.cached_input_tokens,
 		)
 
 	def model_dump(self) -> dict:
@@ -35,6 +44,7 @@ class LLMUsage(BaseModel):
 			'input_tokens': self.input_tokens,
 			'output_tokens': self.output_tokens,
 			'total_tokens': self.total_tokens,
+			'cached_input_tokens': self.cached_input_tokens,
 		}
 
 class EmbeddingUsage(BaseModel):
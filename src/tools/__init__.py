@@ -1,3 +1,4 @@
 from .klocalizer import klocalizer
 from .syzkaller import syzkaller
-from .qemu import qemu
+from .qemu import qemu, boot_farm
+from .initramfs import initramfs
@@ -0,0 +1,81 @@
+from singleton_decorator import singleton
+from src.utils import file_lock
+from src.config import settings
+import struct
+import os
+
+SMOKE_MARKER = 'KBOOTREPAIR-SMOKE-OK'
+
+LOAD_ADDRESS = 0x400000
+CODE_OFFSET = 64 + 56
+
+@singleton
+class Initramfs:
+
+    def path(self, arch: str) -> str:
+
+        path = f'{settings.kernel.INITRAMFS_DIR}/{arch}.cpio'
+
+        with file_lock:
+            if not os.path.exists(path):
+                os.makedirs(settings.kernel.INITRAMFS_DIR, exist_ok=True)
+                with open(f'{path}.tmp', 'wb') as f:
+                    f.write(self.archive(arch))
+                os.replace(f'{path}.tmp', path)
+
+        return path
+
+    def archive(self, arch: str) -> bytes:
+
+        # The kernel only hands init a console if /dev/console exists in the initramfs.
+        return b''.join([
+            self.__entry('dev', 0o040755),
+            self.__entry('dev/console', 0o020600, rdev=(5, 1)),
+            self.__entry('init', 0o100755, self.init(arch)),
+            self.__entry('TRAILER!!!', 0),
+        ])
+
+    def init(self, arch: str) -> bytes:
+
+        message = f'\n{SMOKE_MARKER}\n'.encode()
+
+        # A freestanding init that writes the marker to the console and spins, so no toolchain is needed.
+        if arch == 'arm64':
+            machine = 183
+            code = b''.join(struct.pack('<I', op) for op in (
+                0xd2800020,                         # mov x0, #1
+                0x100000a1,                         # adr x1, message
+                0xd2800002 | (len(message) << 5),   # mov x2, #len
+                0xd2800808,                         # mov x8, #64 (write)
+                0xd4000001,                         # svc #0
+                0x14000000,                         # b .
+            ))
+        else:
+            machine = 62
+            code = b''.join((
+                b'\xb8\x01\x00\x00\x00',                # mov eax, 1 (write)
+                b'\xbf\x01\x00\x00\x00',                # mov edi, 1
+                b'\x48\x8d\x35\x09\x00\x00\x00',        # lea rsi, [rip + 9]
+                b'\xba' + struct.pack('<I', len(message)),  # mov edx, len
+                b'\x0f\x05',                            # syscall
+                b'\xeb\xfe',                            # jmp .
+            ))
+
+        size = CODE_OFFSET + len(code) + len(message)
+        header = struct.pack('<4sBBBBB7xHHIQQQIHHHHHH', b'\x7fELF', 2, 1, 1, 0, 0, 2, machine, 1, LOAD_ADDRESS + CODE_OFFSET, 64, 0, 0, 64, 56, 1, 0, 0, 0)
+        program = struct.pack('<IIQQQQQQ', 1, 5, 0, LOAD_ADDRESS, LOAD_ADDRESS, size, size, 0x1000)
+
+        return header + program + code + message
+
+    def __entry(self, name: str, mode: int, data: bytes = b'', rdev: tuple[int, int] = (0, 0)) -> bytes:
+
+        name_bytes = name.encode() + b'\0'
+        fields = (0, mode, 0, 0, 1, 0, len(data), 0, 0, rdev[0], rdev[1], len(name_bytes), 0)
+        header = b'070701' + ''.join(f'{v:08x}' for v in fields).encode()
+
+        return self.__pad(header + name_bytes) + self.__pad(data)
+
+    def __pad(self, data: bytes) -> bytes:
+        return data + b'\0' * (-len(data) % 4)
+
+initramfs = Initramfs()
@@ -1,13 +1,32 @@
 from singleton_decorator import singleton
+from contextlib import contextmanager
 from src.config import settings
+from src.utils import copy_file
 from typing import Literal
+from pathlib import Path
 import subprocess
+import threading
+import tempfile
+import filecmp
+import shutil
+import fcntl
 import os
 
+FORMULAS_COMPLETE = '.complete'
+
 @singleton
 class KLocalizer:
 
-    def run(self, kernel_src: str, log: str, define: list[str] = [], undefine: list[str] = []) -> Literal['success', 'no-satisfying-constraints', 'error']:
+    def run(
+        self,
+        kernel_src: str,
+        log: str,
+        define: list[str] = [],
+        undefine: list[str] = [],
+        config: str | None = None,
+        output: str | None = None,
+        formulas: str | None = None,
+    ) -> Literal['success', 'no-satisfying-constraints', 'error']:
 
         if set(define) & set(undefine):
             return 'no-satisfying-constraints'
@@ -21,27 +40,76 @@ class KLocalizer:
             for option in undefine:
                 f.write(f'!{option}\n')
 
-        cmd = ['bash', settings.scripts.RUN_KLOCALIZER_SCRIPT, kernel_src, f'{parent}/constraints.txt', log, settings.kernel.ARCH]
+        cmd = ['bash', settings.scripts.RUN_KLOCALIZER_SCRIPT, kernel_src, os.path.abspath(f'{parent}/constraints.txt'), os.path.abspath(log), settings.kernel.ARCH]
 
-        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        return self.__run(cmd, kernel_src, config, output, formulas, symbols_only=True)
 
-        if result.returncode == 0:
-            return 'success'
-        if result.returncode == 11:
-            return 'no-satisfying-constraints'
-        return 'error'
-
-    def run_patch(self, kernel_src: str, patch: str, log: str, define: list[str] = [], undefine: list[str] = []) -> Literal['success', 'no-satisfying-constraints', 'error']:
+    def run_patch(
+        self,
+        kernel_src: str,
+        patch: str,
+        log: str,
+        define: list[str] = [],
+        undefine: list[str] = [],
+        config: str | None = None,
+        output: str | None = None,
+        formulas: str | None = None,
+    ) -> Literal['success', 'no-satisfying-constraints', 'error']:
 
-        cmd = ['bash', settings.scripts.RUN_KLOCALIZER_PATCH_SCRIPT, kernel_src, patch, log, settings.kernel.ARCH]
+        cmd = ['bash', settings.scripts.RUN_KLOCALIZER_PATCH_SCRIPT, kernel_src, os.path.abspath(patch), os.path.abspath(log), settings.kernel.ARCH]
 
+        extra = []
         for opt in define:
-            cmd.extend(['--define', opt])
+            extra.extend(['--define', opt])
 
         for opt in undefine:
-            cmd.extend(['--undefine', opt])
-
-        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+            extra.extend(['--undefine', opt])
+
+        return self.__run(cmd, kernel_src, config, output, formulas, extra=extra)
+
+    def warm(self, formulas: str) -> bool:
+        return os.path.exists(f'{formulas}/{FORMULAS_COMPLETE}')
+
+    def __run(
+        self,
+        cmd: list[str],
+        kernel_src: str,
+        config: str | None,
+        output: str | None,
+        formulas: str | None,
+        extra: list[str] | None = None,
+        symbols_only: bool = False,
+    ) -> Literal['success', 'no-satisfying-constraints', 'error']:
+
+        config = os.path.abspath(config or f'{kernel_src}/.config')
+        output = os.path.abspath(output or f'{kernel_src}/.config')
+        formulas = os.path.abspath(formulas) if formulas else None
+
+        if settings.runtime.KLOCALIZER_SCRATCH_DIR:
+            os.makedirs(settings.runtime.KLOCALIZER_SCRATCH_DIR, exist_ok=True)
+
+        # Only a tree that is built in-tree may take olddefconfig's build state when it refuses O=.
+        env = {**os.environ, 'OLDDEFCONFIG_IN_TREE': '1'} if settings.runtime.BUILD_DIR_MODE == 'in-tree' else None
+
+        # Each solve gets its own scratch dir and only writes the tree under the lock in-tree builds hold,
+        # so solves on one tree can run alongside each other and alongside builds.
+        with (
+            self.__formulas(formulas) as exclusive,
+            tempfile.TemporaryDirectory(prefix='klocalizer-', dir=settings.runtime.KLOCALIZER_SCRATCH_DIR) as scratch,
+        ):
+
+            # Patch solves on warm formulas share them, so the Kbuild formulas they derive go to a private copy first.
+            staged = self.__stage(formulas, scratch) if formulas and not exclusive and not symbols_only else None
+            args = [*cmd, config, output, scratch, staged or formulas or '', *(extra or [])]
+            result = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env, check=False)
+
+            if staged and result.returncode in (0, 11):
+                self.__publish(staged, formulas)
+
+            # A symbol-only solve that reached a verdict has derived the Kconfig formulas for the whole tree.
+            # Patch solves also derive Kbuild formulas for the units they touch, so they never mark the set complete.
+            if formulas and symbols_only and result.returncode in (0, 11) and not self.warm(formulas):
+                Path(f'{formulas}/{FORMULAS_COMPLETE}').touch()
 
         if result.returncode == 0:
             return 'success'
@@ -49,4 +117,52 @@ class KLocalizer:
             return 'no-satisfying-constraints'
         return 'error'
 
+    @contextmanager
+    def __formulas(self, formulas: str | None):
+
+        if formulas is None:
+            yield False
+            return
+
+        os.makedirs(formulas, exist_ok=True)
+
+        # Deriving the Kconfig formulas of a cold commit runs alone; every solve on warm formulas shares them.
+        exclusive = not self.warm(formulas)
+        with open(f'{formulas}.lock', 'w', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield exclusive
+
+    def __stage(self, formulas: str, scratch: str) -> str:
+
+        # Directories hold the Kconfig formulas, which are only read once warm; files such as the
+        # Kbuild formulas may be rewritten by the solve, so those are copied.
+        staged = f'{scratch}/formulas'
+        os.makedirs(staged)
+        for entry in os.scandir(formulas):
+            if entry.is_dir():
+                os.symlink(entry.path, f'{staged}/{entry.name}')
+            elif entry.is_file():
+                shutil.copyfile(entry.path, f'{staged}/{entry.name}')
+
+        return staged
+
+    def __publish(self, staged: str, formulas: str):
+
+        # Each file is replaced atomically, so solves reading the formulas keep the version they opened.
+        # Two patch solves finishing together keep only the last one's additions; the rest are derived again.
+        for entry in os.scandir(staged):
+            target = f'{formulas}/{entry.name}'
+            if entry.is_symlink():
+                continue
+            if entry.is_dir():
+                if not os.path.exists(target):
+                    tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+                    shutil.copytree(entry.path, tmp)
+                    try:
+                        os.rename(tmp, target)
+                    except OSError:
+                        shutil.rmtree(tmp, ignore_errors=True)
+            elif not os.path.exists(target) or not filecmp.cmp(entry.path, target, shallow=False):
+                copy_file(entry.path, target)
+
 klocalizer = KLocalizer()
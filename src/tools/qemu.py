@@ -1,14 +1,152 @@
+from concurrent.futures import ThreadPoolExecutor, Future
 from singleton_decorator import singleton
+from functools import partial
+from typing import Callable, Literal, TypeVar
+from contextlib import contextmanager
 from src.config import settings
-from typing import Literal
+from collections import deque
+from .initramfs import SMOKE_MARKER
+from src.utils import log, Cancellation
+import contextvars
 import subprocess
+import threading
+import tempfile
+import shutil
+import signal
+import fcntl
+import queue
+import time
+import re
+import os
+
+T = TypeVar('T')
+
+BootStatus = Literal['yes', 'maintenance', 'panic', 'timeout', 'no']
+BootRule = Literal['login', 'smoke', 'maintenance', 'panic', 'oops', 'stall', 'timeout', 'exit']
+
+# Checked in order against every console line; the first match ends the boot.
+BOOT_RULES: tuple[tuple[str, re.Pattern, str], ...] = (
+    ('login', re.compile(r'login:'), 'yes'),
+    ('maintenance', re.compile(r'Press Enter for maintenance'), 'maintenance'),
+    ('panic', re.compile(r'Kernel panic'), 'panic'),
+    ('oops', re.compile(r'\bOops: '), 'panic'),
+)
+SMOKE_RULES: tuple[tuple[str, re.Pattern, str], ...] = (
+    ('smoke', re.compile(re.escape(SMOKE_MARKER)), 'yes'),
+    *BOOT_RULES[2:],
+)
+PANIC_END_PATTERN = re.compile(r'---\[ end ')
+
+class BootMonitor:
+
+    def __init__(
+        self,
+        log_file: str,
+        timeout: float | None = None,
+        stall: float | None = None,
+        grace: float = 2.0,
+        tail: int = 50,
+        rules: tuple[tuple[str, re.Pattern, str], ...] = BOOT_RULES,
+        milestones: dict[str, str] | None = None,
+        cancel: Cancellation | None = None,
+    ):
+
+        self.log_file = log_file
+        self.rules = rules
+        self.milestone_patterns = {name: re.compile(pattern) for name, pattern in (settings.runtime.BOOT_MILESTONES if milestones is None else milestones).items()}
+        self.timeout = settings.runtime.BOOT_TIMEOUT if timeout is None else timeout
+        self.stall = settings.runtime.BOOT_STALL_TIMEOUT if stall is None else stall
+        self.grace = grace
+        self.cancel = cancel or Cancellation()
+
+        self.lines = 0
+        self.rule: BootRule | None = None
+        self.tail: deque[tuple[int, str]] = deque(maxlen=tail)
+        self.panic: list[tuple[int, str]] = []
+        self.failed: list[tuple[int, str]] = []
+
+        self.started = time.monotonic()
+        self.milestones: dict[str, float] = {}
+
+    def start(self):
+        self.started = time.monotonic()
+        self.milestones = {}
+
+    def feed(self, line: str) -> BootStatus | None:
+
+        i = self.lines
+        self.lines += 1
+        self.tail.append((i, line))
+
+        # Seconds since QEMU was started, for the first line matching each milestone.
+        for name, pattern in self.milestone_patterns.items():
+            if name not in self.milestones and pattern.search(line):
+                self.milestones[name] = round(time.monotonic() - self.started, 3)
+
+        if self.panic and len(self.panic) < 25:
+            self.panic.append((i, line))
+        if 'FAILED' in line and len(self.failed) < 20:
+            self.failed.append((i, line))
+
+        if self.rule is not None:
+            return None
+
+        for rule, pattern, status in self.rules:
+            if pattern.search(line):
+                self.rule = rule
+                if status == 'panic':
+                    self.panic.append((i, line))
+                return status
+
+        return None
+
+    def summary(self, status: BootStatus) -> str | None:
+
+        if status == 'panic':
+            lines = self.panic
+        elif status == 'timeout':
+            lines = list(self.tail)
+        elif status == 'maintenance':
+            lines = self.failed
+        else:
+            return None
+
+        return ''.join(f'{i}: {l}' for i, l in lines).strip() or None
 
 @singleton
 class Qemu:
 
-    def test(self, kernel_src: str, log_file: str) -> Literal['yes', 'maintenance', 'panic', 'timeout', 'no']:
+    def test(
+        self,
+        output_dir: str,
+        log_file: str,
+        monitor: BootMonitor | None = None,
+        timeout: int | None = None,
+        image: str | None = None,
+        initrd: str | None = None,
+    ) -> BootStatus:
+
+        if monitor is not None:
+            timeout = int(monitor.timeout)
+        elif timeout is None:
+            timeout = settings.runtime.BOOT_TIMEOUT
+        overlay = self.__overlay() if settings.runtime.BOOT_OVERLAY and initrd is None else None
+        try:
+            return self.__test(output_dir, log_file, monitor, timeout, image or f'{output_dir}/{settings.kernel.BZIMAGE}', overlay, initrd)
+        finally:
+            if overlay is not None and os.path.exists(overlay):
+                os.remove(overlay)
+
+    def __test(self, output_dir: str, log_file: str, monitor: BootMonitor | None, timeout: int, image: str, overlay: str | None, initrd: str | None) -> BootStatus:
+
+        disk, disk_format = (overlay, 'qcow2') if overlay else (settings.kernel.DEBIAN_IMG, 'raw')
+        cmd = ['bash', settings.scripts.QEMU_TEST_SCRIPT, output_dir, image, '-' if monitor else log_file, settings.kernel.ARCH, disk, str(timeout), disk_format]
+        if initrd is not None:
+            cmd += [initrd, SMOKE_MARKER]
+
+        if monitor is not None:
+            return self.__stream(cmd, monitor)
 
-        cmd = ['bash', settings.scripts.QEMU_TEST_SCRIPT, kernel_src, f'{kernel_src}/{settings.kernel.BZIMAGE}', log_file, settings.kernel.ARCH, settings.kernel.DEBIAN_IMG]
         result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
 
         if result.returncode == 0:
@@ -18,14 +156,181 @@ class Qemu:
 
         try:
             with open(log_file, encoding='utf-8', errors='replace') as f:
-                log = f.read()
-            if 'Kernel panic' in log:
+                console = f.read()
+            if 'Kernel panic' in console:
                 return 'panic'
-            if log.strip():
+            if console.strip():
                 return 'timeout'
         except OSError:
             pass
 
         return 'no'
 
+    def __overlay(self) -> str | None:
+
+        if shutil.which('qemu-img') is None:
+            log.warning('qemu-img not found, booting from the shared Debian image.')
+            return None
+
+        if settings.runtime.BOOT_OVERLAY_DIR:
+            os.makedirs(settings.runtime.BOOT_OVERLAY_DIR, exist_ok=True)
+
+        fd, path = tempfile.mkstemp(prefix='kbootrepair-boot-', suffix='.qcow2', dir=settings.runtime.BOOT_OVERLAY_DIR)
+        os.close(fd)
+
+        # Guest writes land in the overlay; the base image is only ever opened read-only as its backing file.
+        base = os.path.abspath(settings.kernel.DEBIAN_IMG)
+        result = subprocess.run(['qemu-img', 'create', '-q', '-f', 'qcow2', '-F', 'raw', '-b', base, path], capture_output=True, text=True, check=False)
+
+        if result.returncode != 0:
+            log.warning(f'Could not create boot overlay, booting from the shared Debian image: {result.stderr.strip()}')
+            os.remove(path)
+            return None
+
+        return path
+
+    def __stream(self, cmd: list[str], monitor: BootMonitor) -> BootStatus:
+
+        os.makedirs(os.path.dirname(os.path.abspath(monitor.log_file)), exist_ok=True)
+
+        monitor.start()
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors='replace', start_new_session=True) as proc:
+
+            # The console is read on a separate thread so silence can be timed out.
+            lines: queue.Queue[str | None] = queue.Queue()
+            reader = threading.Thread(target=self.__read, args=(proc.stdout, lines), daemon=True)
+            reader.start()
+
+            try:
+                with monitor.cancel.on_cancel(partial(self.__stop, proc)):
+                    status = self.__watch(lines, monitor)
+            finally:
+                self.__kill(proc)
+                # The pipe is closed on leaving the block, so the reader must be done with it first.
+                reader.join(timeout=10)
+
+        return status
+
+    def __watch(self, lines: queue.Queue, monitor: BootMonitor) -> BootStatus:
+
+        deadline = time.monotonic() + monitor.timeout
+        status: BootStatus | None = None
+
+        with open(monitor.log_file, 'w', encoding='utf-8') as f:
+            while status is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    monitor.rule = 'timeout'
+                    status = 'timeout'
+                    break
+
+                try:
+                    line = lines.get(timeout=min(remaining, monitor.stall))
+                except queue.Empty:
+                    if monitor.stall <= remaining:
+                        monitor.rule = 'stall'
+                        status = 'timeout'
+                    continue
+
+                if line is None:
+                    monitor.rule = 'exit'
+                    status = 'no'
+                    break
+
+                f.write(line)
+                status = monitor.feed(line)
+
+            # Keep the panic report that follows the first panic line.
+            if status == 'panic':
+                self.__drain(f, lines, monitor)
+
+        return status
+
+    def __read(self, stdout, lines: queue.Queue):
+        for line in stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def __drain(self, f, lines: queue.Queue, monitor: BootMonitor):
+
+        end = time.monotonic() + monitor.grace
+        while (remaining := end - time.monotonic()) > 0:
+            try:
+                line = lines.get(timeout=remaining)
+            except queue.Empty:
+                return
+
+            if line is None:
+                return
+
+            f.write(line)
+            monitor.feed(line)
+            if PANIC_END_PATTERN.search(line):
+                return
+
+    def __stop(self, proc: subprocess.Popen):
+        # Called under the cancellation's lock, so the kill, which can wait on the process, runs apart.
+        threading.Thread(target=self.__kill, args=(proc,), daemon=True).start()
+
+    def __kill(self, proc: subprocess.Popen):
+
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+@singleton
+class BootFarm:
+
+    def __init__(self):
+        self.__executor: ThreadPoolExecutor | None = None
+        self.__lock = threading.Lock()
+        self.__waits = 0
+
+    def submit(self, fn: Callable[..., T], *args) -> Future[T]:
+
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers=settings.runtime.QEMU_SLOTS, thread_name_prefix='qemu-slot')
+
+        # Boots run with the settings and log of the session that queued them.
+        return self.__executor.submit(contextvars.copy_context().run, self.__run, fn, *args)
+
+    def __run(self, fn: Callable[..., T], *args) -> T:
+        with self.__slot():
+            return fn(*args)
+
+    @contextmanager
+    def __slot(self):
+
+        # Slots are lock files so that repair subprocesses share the same limit.
+        os.makedirs(settings.kernel.QEMU_SLOT_DIR, exist_ok=True)
+        slots = settings.runtime.QEMU_SLOTS
+
+        for i in range(slots):
+            with open(f'{settings.kernel.QEMU_SLOT_DIR}/slot-{i}.lock', 'w', encoding='utf-8') as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+
+                yield i
+                return
+
+        # Every slot is busy, so wait in the kernel for one instead of polling; waiters are spread over the slots.
+        with self.__lock:
+            i = self.__waits % slots
+            self.__waits += 1
+
+        with open(f'{settings.kernel.QEMU_SLOT_DIR}/slot-{i}.lock', 'w', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield i
+
 qemu = Qemu()
+boot_farm = BootFarm()
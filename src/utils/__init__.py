@@ -1,3 +1,7 @@
 from .lock import file_lock, embedding_lock, seed_lock
+from .digest import text_digest, file_digest
 from .dispatcher import dispatcher
+from .cancel import Cancellation
+from .files import read_json, write_json, copy_file, dir_size, touch, evict_lru, EvictionBudget
+from .jobserver import Jobserver, job_slot, release_tokens
 from .logger import log
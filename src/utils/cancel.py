@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+from typing import Callable
+import threading
+
+class Cancellation:
+
+	def __init__(self):
+		self.__cancelled = False
+		self.__callbacks: dict[int, Callable[[], None]] = {}
+		self.__lock = threading.Lock()
+
+	@property
+	def cancelled(self) -> bool:
+		return self.__cancelled
+
+	def cancel(self):
+
+		# Callbacks run under the lock, so none runs once its work has left on_cancel.
+		with self.__lock:
+			if self.__cancelled:
+				return
+			self.__cancelled = True
+			for callback in self.__callbacks.values():
+				callback()
+
+	@contextmanager
+	def on_cancel(self, callback: Callable[[], None]):
+
+		# Work started after the cancellation is stopped straight away.
+		with self.__lock:
+			if self.__cancelled:
+				callback()
+			key = id(callback)
+			self.__callbacks[key] = callback
+
+		try:
+			yield
+		finally:
+			with self.__lock:
+				self.__callbacks.pop(key, None)
@@ -0,0 +1,13 @@
+import hashlib
+
+def text_digest(text: str) -> str:
+	return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def file_digest(path: str) -> str:
+
+	h = hashlib.sha256()
+	with open(path, 'rb') as f:
+		for block in iter(lambda: f.read(1 << 20), b''):
+			h.update(block)
+
+	return h.hexdigest()
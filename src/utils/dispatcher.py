@@ -1,5 +1,3 @@
-# pylint: disable=import-outside-toplevel
-
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from singleton_decorator import singleton
 from typing import Callable
@@ -10,11 +8,9 @@ import traceback
 @singleton
 class Dispatcher:
 
-    def run_callables(self, tasks: list[Callable], desc: str = 'Running tasks', labels: list[str] | None = None):
+    def run_callables(self, tasks: list[Callable], max_workers: int, desc: str = 'Running tasks', labels: list[str] | None = None):
 
-        from src.config import settings
         n = len(tasks)
-        max_workers = settings.runtime.MAX_THREADS
         active: set[str] = set()
 
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
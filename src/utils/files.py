@@ -0,0 +1,101 @@
+from .lock import file_lock
+from .logger import log
+import threading
+import shutil
+import fcntl
+import json
+import math
+import os
+
+# Share of the size limit saved between two scans of a directory for eviction.
+EVICT_INTERVAL = 0.05
+
+def read_json(path: str) -> dict | None:
+	try:
+		with open(path, encoding='utf-8') as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		return None
+
+def write_json(path: str, data: dict, indent: int | None = None):
+
+	# Written aside and renamed, so concurrent readers never see a partial file.
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+	with open(tmp, 'w', encoding='utf-8') as f:
+		json.dump(data, f, indent=indent)
+	os.replace(tmp, path)
+
+def copy_file(src: str, dst: str):
+	os.makedirs(os.path.dirname(dst), exist_ok=True)
+	tmp = f'{dst}.{os.getpid()}.{threading.get_ident()}.tmp'
+	shutil.copyfile(src, tmp)
+	os.replace(tmp, dst)
+
+def dir_size(path: str) -> int:
+
+	total = 0
+	for root, _, files in os.walk(path):
+		for name in files:
+			try:
+				total += os.path.getsize(os.path.join(root, name))
+			except OSError:
+				pass
+
+	return total
+
+def touch(path: str):
+	try:
+		os.utime(path)
+	except OSError:
+		pass
+
+def evict_lru(root: str, limit: int):
+
+	# The directory is shared by every repair process, so the thread lock alone is not enough.
+	with file_lock:
+		os.makedirs(root, exist_ok=True)
+		with open(f'{root}.lock', 'w', encoding='utf-8') as f:
+			fcntl.flock(f, fcntl.LOCK_EX)
+
+			entries = []
+			for entry, dirs, files in os.walk(root):
+				if dirs or not files:
+					continue
+				# Saves in other processes write temp files that are renamed away mid-walk.
+				try:
+					size = sum(os.path.getsize(os.path.join(entry, name)) for name in files)
+					entries.append((os.path.getmtime(entry), size, entry))
+				except OSError:
+					continue
+
+			total = sum(size for _, size, _ in entries)
+			for _, size, entry in sorted(entries):
+				if total <= limit:
+					break
+
+				log.info(f'Evicting cache entry: {entry}')
+				shutil.rmtree(entry, ignore_errors=True)
+				total -= size
+
+class EvictionBudget:
+
+	def __init__(self):
+		# Starts due, so the first save in a process trims a directory that was left over the limit.
+		self.__pending = math.inf
+		self.__lock = threading.Lock()
+
+	def due(self, entry: str, limit: int) -> bool:
+
+		# Scanning the whole directory on every save would serialize parallel sessions behind the walk.
+		try:
+			size = sum(e.stat().st_size for e in os.scandir(entry) if e.is_file())
+		except OSError:
+			size = 0
+
+		with self.__lock:
+			self.__pending += size
+			if self.__pending < limit * EVICT_INTERVAL:
+				return False
+			self.__pending = 0
+			return True
@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+from .logger import log
+import tempfile
+import termios
+import shutil
+import fcntl
+import array
+import os
+
+class Jobserver:
+
+    def __init__(self, jobs: int):
+        self.jobs = jobs
+        self.path: str | None = None
+        self.__fd: int | None = None
+        self.__dir: str | None = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
+
+    def start(self):
+
+        self.__dir = tempfile.mkdtemp(prefix='kbootrepair-jobserver-')
+        self.path = f'{self.__dir}/fifo'
+        os.mkfifo(self.path)
+
+        # Holding the fifo open keeps unclaimed tokens alive while no build is running.
+        self.__fd = os.open(self.path, os.O_RDWR)
+
+        # Every build holds one token for its make's implicit job slot (see job_slot), so the tokens bound every job on the host.
+        os.write(self.__fd, b'+' * self.jobs)
+
+        log.info(f'Started make jobserver with {self.jobs} jobs at {self.path}')
+
+    def available(self) -> int:
+
+        if self.__fd is None:
+            return 0
+
+        count = array.array('i', [0])
+        fcntl.ioctl(self.__fd, termios.FIONREAD, count)
+        return count[0]
+
+    def stop(self):
+
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+
+        if self.__dir is not None:
+            shutil.rmtree(self.__dir, ignore_errors=True)
+            self.__dir = None
+
+        self.path = None
+
+@contextmanager
+def job_slot(path: str | None):
+
+    # Make runs one job without a token, so a client joining the jobserver first takes one to back that slot.
+    if not path:
+        yield
+        return
+
+    fd = os.open(path, os.O_RDWR)
+    try:
+        token = os.read(fd, 1)
+        try:
+            yield
+        finally:
+            os.write(fd, token)
+    finally:
+        os.close(fd)
+
+def release_tokens(path: str, count: int):
+
+    fd = os.open(path, os.O_RDWR)
+    try:
+        os.write(fd, b'+' * count)
+    finally:
+        os.close(fd)
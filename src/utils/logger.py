@@ -1,18 +1,38 @@
 from singleton_decorator import singleton
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TextIO
 
 @singleton
 class Logger:
-    
+
+    def __init__(self):
+        self.__sink: ContextVar[TextIO | None] = ContextVar('log_sink', default=None)
+
+    @contextmanager
+    def capture(self, path: str):
+
+        # Messages logged by the current context, and threads started from it, go to the file instead of stdout.
+        with open(path, 'w', encoding='utf-8', buffering=1) as f:
+            token = self.__sink.set(f)
+            try:
+                yield f
+            finally:
+                self.__sink.reset(token)
+
     def success(self, message: str):
-        print(f'[SUCCESS] {message}')
+        self.__write(f'[SUCCESS] {message}')
 
     def info(self, message: str):
-        print(f'[INFO] {message}')
+        self.__write(f'[INFO] {message}')
 
     def warning(self, message: str):
-        print(f'[WARNING] {message}')
+        self.__write(f'[WARNING] {message}')
 
     def error(self, message: str):
-        print(f'[ERROR] {message}')
+        self.__write(f'[ERROR] {message}')
+
+    def __write(self, line: str):
+        print(line, file=self.__sink.get())
 
 log = Logger()
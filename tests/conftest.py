@@ -1,4 +1,4 @@
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, PropertyMock
 import pytest
 import os
 
@@ -18,6 +18,18 @@ def _copy_fixture(name, tmp_path):
 def chdir_tmp(tmp_path, monkeypatch):
 	monkeypatch.chdir(tmp_path)
 
+@pytest.fixture(autouse=True)
+def qemu_slot_dir(tmp_path):
+	from src.config import settings
+	with patch.object(type(settings.kernel), 'QEMU_SLOT_DIR', new_callable=PropertyMock, return_value=str(tmp_path / 'qemu-slots')):
+		yield
+
+@pytest.fixture(autouse=True)
+def klocalizer_cache_dir(tmp_path):
+	from src.config import settings
+	with patch.object(type(settings.kernel), 'KLOCALIZER_CACHE_DIR', new_callable=PropertyMock, return_value=str(tmp_path / 'klocalizer-cache')):
+		yield
+
 @pytest.fixture
 def tmp_config(tmp_path):
 	return _copy_fixture('sample.config', tmp_path)
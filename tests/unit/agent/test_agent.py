@@ -0,0 +1,55 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from src.models import AgentResponse, AgentBeamResponse, Attempt
+from unittest.mock import patch, MagicMock
+from src.core.agent import agent
+from src.config import settings
+from src.agent import Session
+import sys
+
+agent_module = sys.modules['src.core.agent']
+
+def _tool(name):
+	tool = MagicMock()
+	tool.name = name
+	return tool
+
+# Agent graph built once per model and tool set: Success
+def test_graph_reused():
+	llm = MagicMock()
+
+	with patch.object(agent_module, 'create_agent') as mock_create:
+		first = agent._Agent__graph(llm, [_tool('a'), _tool('b')], AgentResponse)
+		second = agent._Agent__graph(llm, [_tool('a'), _tool('b')], AgentResponse)
+		agent._Agent__graph(llm, [_tool('a')], AgentResponse)
+		agent._Agent__graph(llm, [_tool('a'), _tool('b')], AgentBeamResponse)
+
+	assert first is second
+	assert mock_create.call_count == 3
+
+# Thread stored after the structured-output wrapper answers every tool call: Success
+def test_thread_closes_wrapper_tool_calls(tmp_path):
+	base = tmp_path / 'base.config'
+	base.touch()
+	session = Session(str(base), str(tmp_path))
+	session.attempts.append(Attempt(id=0, dir=str(tmp_path / 'attempt_0'), config=str(base)))
+	session.attempts.append(Attempt(id=1, dir=str(tmp_path / 'attempt_1')))
+
+	raw = AIMessage(content='', tool_calls=[{'name': 'AgentResponse', 'args': {'define': [], 'undefine': [], 'reasoning': 'r'}, 'id': 'call_1'}])
+	graph = MagicMock()
+	graph.invoke.return_value = {'messages': [HumanMessage(content='prompt'), AIMessage(content='no structured response')]}
+	llm = MagicMock()
+	llm.with_structured_output.return_value.invoke.return_value = {'raw': raw, 'parsed': AgentResponse(define=[], undefine=[], reasoning='r')}
+
+	saved = settings.agent.PROMPT_THREAD
+	settings.agent.PROMPT_THREAD = True
+	try:
+		with patch.object(agent, '_Agent__graph', return_value=graph), patch.object(agent_module, 'agent_tools'):
+			response, _, _, wrapper_used, _ = agent._Agent__generate_response(llm, MagicMock(), session)
+	finally:
+		settings.agent.PROMPT_THREAD = saved
+
+	assert wrapper_used is True
+	assert response.reasoning == 'r'
+	assert session.thread[-2] is raw
+	assert isinstance(session.thread[-1], ToolMessage)
+	assert session.thread[-1].tool_call_id == 'call_1'
@@ -0,0 +1,118 @@
+from src.models import AgentResponse, AgentBeamResponse, Attempt, BuildResult, BootResult, KlocalizerResult, LLMUsage
+from unittest.mock import patch, MagicMock
+from src.core.agent import agent
+from src.config import settings
+from src.agent import Session, prompt
+from src.utils import Cancellation
+import pytest
+
+@pytest.fixture(autouse=True)
+def restore_settings():
+	saved_beam = settings.agent.BEAM_WIDTH
+	saved_mode = settings.runtime.BUILD_DIR_MODE
+	yield
+	settings.agent.BEAM_WIDTH = saved_beam
+	settings.runtime.BUILD_DIR_MODE = saved_mode
+
+def _kernel(boot_status):
+
+	kernel = MagicMock()
+	kernel.check_symbols.side_effect = lambda define, undefine: (define, undefine, {})
+	kernel.run_klocalizer.side_effect = lambda dir, config, define, undefine, output: KlocalizerResult(status='success', log=f'{dir}/klocalizer.log', config=output)
+	kernel.build.side_effect = lambda dir, config, build_dir, probe, cancel: BuildResult(ok=True, log=f'{dir}/build.log', build_time=1.0)
+	kernel.boot.side_effect = lambda dir, build_dir, cancel: BootResult(status=boot_status(dir), log=f'{dir}/boot.log')
+
+	return kernel
+
+def _session(tmp_path):
+
+	base = tmp_path / 'base.config'
+	base.touch()
+
+	session = Session(str(base), str(tmp_path))
+	session.attempts.append(Attempt(id=0, dir=str(tmp_path / 'attempt_0'), config=str(base)))
+
+	return session
+
+# Beam attempt adopts the booting candidate and records every candidate: Success
+def test_beam_adopts_booting_candidate(tmp_path):
+	settings.agent.BEAM_WIDTH = 3
+	settings.runtime.BUILD_DIR_MODE = 'attempt'
+
+	session = _session(tmp_path)
+	kernel = _kernel(lambda dir: 'yes' if dir.endswith('candidate_1') else 'panic')
+	response = AgentBeamResponse(candidates=[
+		AgentResponse(define=[f'CONFIG_{name}'], undefine=[], reasoning=name)
+		for name in ('A', 'B', 'C', 'D')
+	])
+
+	with patch.object(agent, '_Agent__generate_response', return_value=(response, LLMUsage(input_tokens=10, output_tokens=5, total_tokens=15), {}, False, 0.0)):
+		agent._Agent__attempt(MagicMock(), kernel, session)
+
+	attempt = session.attempts[-1]
+	assert len(attempt.candidates) == 3
+	assert attempt.rank is None
+	assert attempt.adopted == 1
+	assert attempt.boot_succeeded == 'yes'
+	assert attempt.response.define == ['CONFIG_B']
+	assert attempt.config == f'{attempt.dir}/candidate_1/modified.config'
+	assert attempt.token_usage.total_tokens == 15
+	assert session.status == 'success'
+
+	summary = attempt.model_dump()
+	assert summary['summary']['rank'] is None
+	assert summary['summary']['adopted'] == 1
+	assert 'Candidates (candidate 1 adopted above)' in prompt.attempt(1, attempt).content
+	assert [c['summary']['rank'] for c in summary['candidates']] == [0, 1, 2]
+
+# Beam attempt without a booting candidate adopts the furthest one: Success
+def test_beam_adopts_furthest_candidate(tmp_path):
+	settings.agent.BEAM_WIDTH = 2
+	settings.runtime.BUILD_DIR_MODE = 'attempt'
+
+	session = _session(tmp_path)
+	kernel = _kernel(lambda dir: 'maintenance' if dir.endswith('candidate_1') else 'panic')
+	response = AgentBeamResponse(candidates=[
+		AgentResponse(define=['CONFIG_A'], undefine=[], reasoning='a'),
+		AgentResponse(define=['CONFIG_B'], undefine=[], reasoning='b'),
+	])
+
+	with patch.object(agent, '_Agent__generate_response', return_value=(response, LLMUsage(input_tokens=0, output_tokens=0, total_tokens=0), {}, False, 0.0)):
+		agent._Agent__attempt(MagicMock(), kernel, session)
+
+	attempt = session.attempts[-1]
+	assert attempt.adopted == 1
+	assert attempt.boot_succeeded == 'maintenance'
+	assert not any(c.stopped for c in attempt.candidates)
+
+# Candidate is stopped before building once another candidate boots: Success
+def test_candidate_stopped_after_boot_found(tmp_path):
+	session = _session(tmp_path)
+	kernel = _kernel(lambda dir: 'yes')
+
+	candidate = Attempt(id=1, dir=str(tmp_path / 'candidate_0'), rank=0, response=AgentResponse(define=['CONFIG_A'], undefine=[], reasoning='a'))
+	found = Cancellation()
+	found.cancel()
+
+	agent._Agent__test(kernel, session, candidate, found)
+
+	assert candidate.stopped is True
+	assert candidate.klocalizer_status == 'success'
+	kernel.build.assert_not_called()
+	kernel.boot.assert_not_called()
+
+# Candidate whose build is stopped by another candidate's boot is marked stopped: Success
+def test_candidate_stopped_mid_build(tmp_path):
+	session = _session(tmp_path)
+	kernel = _kernel(lambda dir: 'yes')
+
+	def build(dir, config, build_dir, probe, cancel):
+		cancel.cancel()
+		return BuildResult(ok=False, log=f'{dir}/build.log', build_time=1.0)
+	kernel.build.side_effect = build
+
+	candidate = Attempt(id=1, dir=str(tmp_path / 'candidate_0'), rank=0, response=AgentResponse(define=['CONFIG_A'], undefine=[], reasoning='a'))
+	agent._Agent__test(kernel, session, candidate, Cancellation())
+
+	assert candidate.stopped is True
+	kernel.boot.assert_not_called()
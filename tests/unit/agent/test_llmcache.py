@@ -0,0 +1,48 @@
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import HumanMessage, AIMessage
+from unittest.mock import patch, PropertyMock
+from src.agent.llmcache import llm_cache
+from src.config import settings
+import pytest
+
+@pytest.fixture(autouse=True)
+def llm_cache_dir(tmp_path):
+	with patch.object(type(settings.kernel), 'LLM_CACHE_DIR', new_callable=PropertyMock, return_value=str(tmp_path / 'llm-cache')):
+		yield
+
+def _llm(responses):
+	return FakeListChatModel(responses=responses, cache=llm_cache)
+
+# Recorded response is replayed for the same messages: Success
+def test_record_then_replay():
+	llm = _llm(['recorded', 'live'])
+
+	with patch.object(settings.runtime, 'LLM_CACHE', 'record'):
+		assert llm.invoke([HumanMessage(content='hello')]).content == 'recorded'
+
+	with patch.object(settings.runtime, 'LLM_CACHE', 'replay'):
+		assert llm.invoke([HumanMessage(content='hello')]).content == 'recorded'
+
+# Replay misses fail instead of calling the model: Failure
+def test_replay_miss():
+	with patch.object(settings.runtime, 'LLM_CACHE', 'replay'):
+		with pytest.raises(RuntimeError, match='replay mode'):
+			_llm(['live']).invoke([HumanMessage(content='not recorded')])
+
+# Record on miss only calls the model once per request: Success
+def test_record_on_miss():
+	with patch.object(settings.runtime, 'LLM_CACHE', 'record-on-miss'):
+		llm = _llm(['first', 'second'])
+		assert llm.invoke([HumanMessage(content='hello')]).content == 'first'
+		assert llm.invoke([HumanMessage(content='hello')]).content == 'first'
+		assert llm.invoke([HumanMessage(content='other')]).content == 'second'
+
+# Message IDs and usage metadata do not change the key: Success
+def test_key_ignores_volatile_fields():
+	with patch.object(settings.runtime, 'LLM_CACHE', 'record-on-miss'):
+		llm = _llm(['recorded', 'live'])
+		history = [HumanMessage(content='hello'), AIMessage(content='hi', id='run-1', usage_metadata={'input_tokens': 1, 'output_tokens': 1, 'total_tokens': 2})]
+		llm.invoke([*history, HumanMessage(content='again')])
+
+		history[1] = AIMessage(content='hi', id='run-2', usage_metadata={'input_tokens': 5, 'output_tokens': 5, 'total_tokens': 10})
+		assert llm.invoke([*history, HumanMessage(content='again')]).content == 'recorded'
@@ -89,3 +89,13 @@ def test_get_embedding_model_unknown_provider():
 			assert False, 'Expected ValueError'
 		except ValueError as e:
 			assert 'Unknown model provider' in str(e)
+
+# Client reused for the same model: Success
+def test_get_llm_reused():
+	with patch.object(model_module, 'settings') as mock_settings:
+		mock_settings.agent.PROVIDER = 'google'
+		mock_settings.agent.MODEL = 'gemini-reuse'
+		mock_settings.agent.GOOGLE_API_KEY = 'fake-google-key'
+		mock_settings.runtime.LLM_CACHE = 'off'
+
+		assert model.get_llm() is model.get_llm()
@@ -0,0 +1,51 @@
+from src.models import AgentResponse, Attempt
+from src.agent import Session, prompt
+
+def _session(tmp_path, attempts: int) -> Session:
+
+	session = Session(str(tmp_path / 'base.config'), str(tmp_path), hard_define={'CONFIG_B', 'CONFIG_A'})
+	session.attempts.append(Attempt(id=0, dir=str(tmp_path / 'attempt_0')))
+	for i in range(1, attempts + 1):
+		response = AgentResponse(define=[f'CONFIG_X{i}'], undefine=[], reasoning=f'attempt {i}')
+		session.attempts.append(Attempt(id=i, dir=str(tmp_path / f'attempt_{i}'), response=response, build_summary=f'error {i}'))
+
+	return session
+
+# Each prompt extends the previous prompt and only the last message changes: Success
+def test_prompt_prefix_is_stable(tmp_path):
+	session = _session(tmp_path, 2)
+	before = [m.content for m in prompt.prompt(session)]
+
+	session.attempts.append(Attempt(id=3, dir=str(tmp_path / 'attempt_3')))
+	after = [m.content for m in prompt.prompt(session)]
+
+	assert len(after) == len(before) + 1
+	assert after[:-2] == before[:-1]
+	assert 'CONFIG_X2' in after[-2]
+	assert 'ATTEMPT 3' in after[-1]
+	assert "['CONFIG_A', 'CONFIG_B']" in after[1]
+	assert 'CONFIG_A' not in after[0]
+
+# Continued thread only appends the previous attempt and the current instructions: Success
+def test_prompt_continues_thread(tmp_path):
+	session = _session(tmp_path, 2)
+	thread = prompt.prompt(session)
+
+	session.attempts.append(Attempt(id=3, dir=str(tmp_path / 'attempt_3')))
+	messages = prompt.prompt(session, thread)
+
+	assert messages[:len(thread)] == thread
+	assert len(messages) == len(thread) + 2
+	assert messages[-2].content.startswith('Attempt 2 /')
+
+# The session block stays the same from the first attempt on, and the initial test is appended after it: Success
+def test_prompt_initial_block_appended(tmp_path):
+	session = _session(tmp_path, 0)
+	first = [m.content for m in prompt.prompt(session)]
+
+	session.attempts.append(Attempt(id=1, dir=str(tmp_path / 'attempt_1')))
+	second = [m.content for m in prompt.prompt(session)]
+
+	assert second[:2] == first[:2]
+	assert second[2].startswith('Initial config test:')
+	assert first[-1].startswith('None. This is the first attempt.')
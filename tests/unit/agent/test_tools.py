@@ -0,0 +1,84 @@
+from src.models import Attempt, KlocalizerResult
+from unittest.mock import MagicMock, patch
+from langchain.tools import ToolRuntime
+from src.agent import agent_tools, Session
+from src.config import settings
+import threading
+import pytest
+import os
+
+@pytest.fixture
+def session(tmp_path):
+	base = tmp_path / 'base.config'
+	base.write_text('CONFIG_A=y\nCONFIG_B=m\n')
+
+	session = Session(str(base), str(tmp_path), hard_define={'CONFIG_HARD'})
+	session.attempts.append(Attempt(id=0, dir=str(tmp_path / 'attempt_0'), config=str(base)))
+	session.attempts.append(Attempt(id=1, dir=str(tmp_path / 'attempt_1')))
+	return session
+
+def check_constraints(session, kernel, define, undefine):
+	with patch.object(settings.runtime, 'DRY_RUN_TOOL', True):
+		tool = next(t for t in agent_tools.get(session, kernel) if t.name == 'check_constraints')
+	runtime = ToolRuntime(state={}, context=agent_tools.context(session, kernel), config={}, stream_writer=None, tool_call_id=None, store=None)
+	return tool.invoke({'define': define, 'undefine': undefine, 'runtime': runtime})
+
+# Dry run reports the verdict and the diff against the original config: Success
+def test_check_constraints(session, tmp_path):
+	solved = tmp_path / 'solved.config'
+	solved.write_text('CONFIG_A=y\nCONFIG_C=y\n')
+
+	kernel = MagicMock()
+	kernel.check_symbols.return_value = (['CONFIG_C'], [], {'CONFIG_CC': 'CONFIG_C'})
+	kernel.run_klocalizer.return_value = KlocalizerResult(status='success', log='klocalizer.log', config=str(solved))
+
+	response = check_constraints(session, kernel, ['CONFIG_CC'], [])
+
+	assert response.split('\n') == [
+		'CONFIG_CC -> CONFIG_C',
+		'Satisfiable. 2 options change compared to the original config:',
+		'CONFIG_B: m -> n',
+		'CONFIG_C: n -> y',
+	]
+	args = kernel.run_klocalizer.call_args[0]
+	assert os.path.dirname(args[0]) == str(tmp_path / 'attempt_1' / 'dry-run')
+	assert os.path.basename(args[0]).startswith('0-')
+	assert sorted(args[2]) == ['CONFIG_C', 'CONFIG_HARD']
+	assert session.attempts[-1].tool_calls[0].name == 'check_constraints'
+
+# Dry run reports unsatisfiable constraints: Failure
+def test_check_constraints_unsatisfiable(session):
+	kernel = MagicMock()
+	kernel.check_symbols.return_value = (['CONFIG_A'], ['CONFIG_A'], {})
+	kernel.run_klocalizer.return_value = KlocalizerResult(status='no-satisfying-constraints', log='klocalizer.log')
+
+	response = check_constraints(session, kernel, ['CONFIG_A'], ['CONFIG_A'])
+
+	assert response.startswith('Unsatisfiable.')
+	assert not kernel.build.called
+
+# Parallel dry runs in one turn get separate directories: Success
+def test_check_constraints_parallel_dirs(session):
+	kernel = MagicMock()
+	kernel.check_symbols.return_value = (['CONFIG_A'], [], {})
+	kernel.run_klocalizer.return_value = KlocalizerResult(status='no-satisfying-constraints', log='klocalizer.log')
+
+	threads = [threading.Thread(target=check_constraints, args=(session, kernel, ['CONFIG_A'], [])) for _ in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	dirs = {call[0][0] for call in kernel.run_klocalizer.call_args_list}
+	assert len(dirs) == 4
+	assert all(os.path.isdir(dir) for dir in dirs)
+
+# Tools are built once and shared by every session: Success
+def test_tools_shared_across_sessions(session, tmp_path):
+	other = Session(str(tmp_path / 'other.config'), str(tmp_path))
+	other.attempts.append(Attempt(id=0, dir=str(tmp_path / 'other_0'), build_log=str(tmp_path / 'build.log')))
+	other.attempts.append(Attempt(id=1, dir=str(tmp_path / 'other_1')))
+
+	original = agent_tools.get(session)[0]
+	assert original is agent_tools.get(other)[0]
+	assert [t.name for t in agent_tools.get(other)] == ['search_original_config', 'grep_build_log', 'chunk_build_log']
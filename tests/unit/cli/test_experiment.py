@@ -0,0 +1,16 @@
+from unittest.mock import patch
+from src.cli.experiment import shared_jobserver
+from src.config import settings
+import os
+
+# Experiment shares one jobserver with every repair: Success
+def test_shared_jobserver():
+	with patch.object(settings.runtime, 'JOBSERVER', True), patch.object(settings.runtime, 'JOBSERVER_FIFO', None):
+		with shared_jobserver():
+			fifo, env = settings.runtime.JOBSERVER_FIFO, os.environ.get('JOBSERVER_FIFO')
+
+		assert settings.runtime.JOBSERVER_FIFO is None
+
+	assert fifo is not None
+	assert fifo == env
+	assert 'JOBSERVER_FIFO' not in os.environ
@@ -0,0 +1,44 @@
+from unittest.mock import patch
+from src.experiment.metrics import experiment_metrics
+from src.config import settings
+import json
+
+def session(boot_milestones: list[dict[str, float]], llm_token_usage: dict | None = None) -> dict:
+	return {
+		'path': 'summary.json',
+		'status': 'success',
+		'attempts': 1,
+		'edit_distance': 0,
+		'llm_time': 0.0,
+		'constraints': {'total': 0},
+		'llm_token_usage': llm_token_usage or {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0},
+		'embedding_token_usage': {'build_log_tokens': 0, 'boot_log_tokens': 0, 'total_tokens': 0},
+		'build_phases': {},
+		'boot_milestones': boot_milestones,
+	}
+
+# Boot milestones are aggregated into percentiles across samples: Success
+def test_boot_milestone_percentiles(tmp_path):
+	with patch.object(settings.runtime, 'OUTPUT_DIR', str(tmp_path)), \
+		 patch.object(experiment_metrics, '_ExperimentMetrics__completed', []):
+		experiment_metrics.record(0, session([{'printk': 1.0, 'login': 10.0}, {'printk': 2.0, 'login': 20.0}]), 60.0)
+		experiment_metrics.record(1, session([{'printk': 3.0}]), 60.0)
+
+	with open(tmp_path / 'results.json', encoding='utf-8') as f:
+		milestones = json.load(f)['time']['boot_milestones']
+
+	assert milestones['printk'] == {'n': 3, 'p50': 2.0, 'p90': 2.8, 'p95': 2.9, 'max': 3.0}
+	assert milestones['login']['n'] == 2
+	assert milestones['login']['p50'] == 15.0
+
+# Prompt cache tokens and hit rate are reported across samples: Success
+def test_prompt_cache(tmp_path):
+	with patch.object(settings.runtime, 'OUTPUT_DIR', str(tmp_path)), \
+		 patch.object(experiment_metrics, '_ExperimentMetrics__completed', []):
+		experiment_metrics.record(0, session([], {'input_tokens': 3000, 'output_tokens': 10, 'total_tokens': 3010, 'cached_input_tokens': 2000}), 60.0)
+		experiment_metrics.record(1, session([], {'input_tokens': 1000, 'output_tokens': 10, 'total_tokens': 1010}), 60.0)
+
+	with open(tmp_path / 'results.json', encoding='utf-8') as f:
+		cache = json.load(f)['llm_token_usage']['prompt_cache']
+
+	assert cache == {'cached_input_tokens': 2000, 'hit_rate': 0.5}
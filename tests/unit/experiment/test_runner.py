@@ -0,0 +1,45 @@
+from src.experiment import session_runner
+from unittest.mock import patch, MagicMock
+from src.config import settings
+from src.utils import log
+import threading
+import sys
+
+runner_module = sys.modules['src.experiment.runner']
+
+# Concurrent sessions see their own settings and log to their own files: Success
+def test_sessions_isolated(tmp_path):
+	base_model = settings.agent.MODEL
+	seen = {}
+	barrier = threading.Barrier(2)
+
+	def repair(repair_input, kernel):
+		# Both sessions are inside their scopes at the same time.
+		barrier.wait(timeout=10)
+		log.info(f'repairing with {settings.agent.MODEL}')
+		seen[settings.agent.MODEL] = settings.runtime.OUTPUT_DIR
+		return MagicMock()
+
+	def run(name):
+		session_runner.repair(MagicMock(), str(tmp_path), str(tmp_path / name), str(tmp_path / name / 'terminal.log'), {'agent': {'MODEL': name}})
+
+	with patch.object(runner_module.agent, 'repair', side_effect=repair), patch.object(runner_module, 'Kernel'):
+		threads = [threading.Thread(target=run, args=(name,)) for name in ('gemini-a', 'gemini-b')]
+		for t in threads:
+			t.start()
+		for t in threads:
+			t.join()
+
+	assert seen == {name: str(tmp_path / name / 'agent_repair') for name in ('gemini-a', 'gemini-b')}
+	assert settings.agent.MODEL == base_model
+	for name in ('gemini-a', 'gemini-b'):
+		assert f'[INFO] repairing with {name}' in (tmp_path / name / 'terminal.log').read_text()
+
+# Failed session is logged to its own file: Failure
+def test_session_failure_logged(tmp_path, capsys):
+	with patch.object(runner_module.agent, 'repair', side_effect=RuntimeError('boom')), patch.object(runner_module, 'Kernel'):
+		session = session_runner.repair(MagicMock(), str(tmp_path), str(tmp_path), str(tmp_path / 'terminal.log'))
+
+	assert session is None
+	assert '[ERROR] Repair failed with error: boom' in (tmp_path / 'terminal.log').read_text()
+	assert 'boom' not in capsys.readouterr().out
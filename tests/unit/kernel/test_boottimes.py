@@ -0,0 +1,39 @@
+from unittest.mock import patch, PropertyMock
+from src.kernel.boottimes import boot_times
+from src.config import settings
+import pytest
+
+@pytest.fixture(autouse=True)
+def boot_times_file(tmp_path):
+	with patch.object(type(settings.kernel), 'BOOT_TIMES', new_callable=PropertyMock, return_value=str(tmp_path / 'boot-times.json')):
+		yield
+
+# Timeout without enough history falls back to the ceiling: Success
+def test_timeout_without_history():
+	assert boot_times.timeout('abc') == settings.runtime.BOOT_TIMEOUT
+
+# Timeout from the arch history percentile plus margin: Success
+def test_timeout_from_history():
+	for t in range(1, 21):
+		boot_times.record('abc', float(t))
+
+	with patch.object(settings.runtime, 'BOOT_TIMEOUT_PERCENTILE', 95), patch.object(settings.runtime, 'BOOT_TIMEOUT_MARGIN', 10):
+		assert boot_times.timeout('def') == 30
+		assert boot_times.timeout('abc') == 30
+
+# Per-commit history is preferred once it has enough samples: Success
+def test_timeout_per_commit():
+	for _ in range(10):
+		boot_times.record('slow', 100.0)
+		boot_times.record('fast', 10.0)
+
+	with patch.object(settings.runtime, 'BOOT_TIMEOUT_MARGIN', 0):
+		assert boot_times.timeout('fast') == 10
+		assert boot_times.timeout('slow') == 100
+
+# Timeout never exceeds the fixed ceiling: Success
+def test_timeout_ceiling():
+	for _ in range(10):
+		boot_times.record('abc', 1000.0)
+
+	assert boot_times.timeout('abc') == settings.runtime.BOOT_TIMEOUT
@@ -1,5 +1,10 @@
-from unittest.mock import patch, MagicMock
-from src.kernel.builder import builder
+from unittest.mock import patch, MagicMock, PropertyMock
+from src.kernel.builder import builder, BuildMonitor
+from src.config import settings
+from src.utils import Cancellation
+import subprocess
+import threading
+import time
 
 # Build kernel: Success
 def test_build_success(tmp_path):
@@ -22,3 +27,203 @@ def test_build_failure(tmp_path):
 		result = builder.build('/fake/src', log_file)
 
 	assert result is False
+
+# Build kernel with O= output dir: Success
+def test_build_output_dir(tmp_path):
+	log_file = str(tmp_path / 'build.log')
+	mock_result = MagicMock()
+	mock_result.returncode = 0
+
+	with patch('subprocess.run', return_value=mock_result) as mock_run:
+		result = builder.build('/fake/src', log_file, '/fake/out')
+
+	assert result is True
+	assert mock_run.call_args[0][0][-4] == '/fake/out'
+
+# Compiler cache base dir is shared by every worktree and attempt dir: Success
+def test_cache_basedir_shared(tmp_path):
+	mock_result = MagicMock()
+	mock_result.returncode = 0
+
+	with patch.object(settings.runtime, 'COMPILER_CACHE', True), \
+		 patch.object(type(settings.kernel), 'CCACHE_DIR', new_callable=PropertyMock, return_value=str(tmp_path / 'ccache')), \
+		 patch('src.kernel.builder.shutil.which', return_value='/usr/bin/ccache'), \
+		 patch('subprocess.run', return_value=mock_result) as mock_run:
+		builder.build(str(tmp_path / 'worktrees' / 'sample_0'), str(tmp_path / 'build.log'), str(tmp_path / 'samples' / 'sample_0' / 'attempt_1' / 'build'))
+		builder.build(str(tmp_path / 'worktrees' / 'sample_1'), str(tmp_path / 'build.log'), str(tmp_path / 'samples' / 'sample_1' / 'attempt_2' / 'build'))
+
+	basedirs = [call[1]['env']['CCACHE_BASEDIR'] for call in mock_run.call_args_list]
+	assert basedirs == [str(tmp_path), str(tmp_path)]
+
+# Compiler cache base dir can be configured: Success
+def test_cache_basedir_configured(tmp_path):
+	mock_result = MagicMock()
+	mock_result.returncode = 0
+
+	with patch.object(settings.runtime, 'COMPILER_CACHE', True), \
+		 patch.object(type(settings.kernel), 'CCACHE_DIR', new_callable=PropertyMock, return_value=str(tmp_path / 'ccache')), \
+		 patch.object(settings.runtime, 'COMPILER_CACHE_BASEDIR', '/data'), \
+		 patch('src.kernel.builder.shutil.which', return_value='/usr/bin/ccache'), \
+		 patch('subprocess.run', return_value=mock_result) as mock_run:
+		builder.build('/fake/src', str(tmp_path / 'build.log'), '/fake/out')
+
+	assert mock_run.call_args[1]['env']['CCACHE_BASEDIR'] == '/data'
+
+# Compiler cache stats parsed from ccache stats log: Success
+def test_cache_stats(tmp_path):
+	src = tmp_path / 'src'
+	(src / 'drivers').mkdir(parents=True)
+	(src / 'drivers' / 'a.o').write_bytes(b'x' * 100)
+	stats_log = tmp_path / 'ccache-stats.log'
+	stats_log.write_text(
+		'# drivers/a.c\n'
+		'direct_cache_hit\n'
+		'# drivers/b.c\n'
+		'cache_miss\n'
+		'# drivers/c.c\n'
+		'preprocessed_cache_hit\n'
+	)
+
+	stats = builder.cache_stats(str(stats_log), str(src))
+
+	assert stats.hits == 2
+	assert stats.misses == 1
+	assert stats.bytes_saved == 100
+
+# Compiler cache stats without a stats log: Failure
+def test_cache_stats_missing_log(tmp_path):
+	assert builder.cache_stats(str(tmp_path / 'missing.log'), str(tmp_path)) is None
+
+# Trim compiler cache: Failure
+def test_trim_cache_failure():
+	mock_result = MagicMock()
+	mock_result.returncode = 1
+	mock_result.stderr = 'error'
+
+	with patch('subprocess.run', return_value=mock_result):
+		assert builder.trim_cache('1G') is False
+
+# Build monitor keeps earlier errors ahead of the rolling tail: Success
+def test_build_monitor_summary(tmp_path):
+	monitor = BuildMonitor(str(tmp_path / 'build.log'), fatal_patterns=[], tail=3)
+	for line in ['CC a.o\n', 'a.c:1:1: error: boom\n', 'CC b.o\n', 'CC c.o\n', 'CC d.o\n']:
+		assert monitor.feed(line) is False
+
+	assert monitor.summary == '1: a.c:1:1: error: boom\n2: CC b.o\n3: CC c.o\n4: CC d.o'
+
+# Streaming build killed on first fatal error: Failure
+def test_build_stream_fail_fast(tmp_path):
+	script = tmp_path / 'build.sh'
+	script.write_text('echo "CC a.o"\necho "a.c:1:1: error: boom"\nsleep 30\necho "CC b.o"\n')
+	log_file = str(tmp_path / 'build.log')
+	monitor = BuildMonitor(log_file, fatal_patterns=[r'\berror:'], grace=0)
+
+	with patch.object(type(settings.scripts), 'BUILD_SCRIPT', new_callable=PropertyMock, return_value=str(script)), \
+		 patch.object(settings.runtime, 'COMPILER_CACHE', False):
+		start = time.time()
+		result = builder.build('/fake/src', log_file, monitor=monitor)
+
+	assert result is False
+	assert time.time() - start < 10
+	assert monitor.fatal == 'a.c:1:1: error: boom'
+	assert open(log_file).read() == 'CC a.o\na.c:1:1: error: boom\n'
+
+# Streaming build killed when it is cancelled: Failure
+def test_build_stream_cancel(tmp_path):
+	script = tmp_path / 'build.sh'
+	script.write_text('echo "CC a.o"\nsleep 30\n')
+	cancel = Cancellation()
+	monitor = BuildMonitor(str(tmp_path / 'build.log'), fatal_patterns=[], cancel=cancel)
+
+	with patch.object(type(settings.scripts), 'BUILD_SCRIPT', new_callable=PropertyMock, return_value=str(script)), \
+		 patch.object(settings.runtime, 'COMPILER_CACHE', False):
+		threading.Timer(0.5, cancel.cancel).start()
+		start = time.time()
+		result = builder.build('/fake/src', str(tmp_path / 'build.log'), monitor=monitor)
+
+	assert result is False
+	assert time.time() - start < 10
+
+# Build monitor counts compiled objects: Success
+def test_build_monitor_objects(tmp_path):
+	monitor = BuildMonitor(str(tmp_path / 'build.log'), fatal_patterns=[])
+	for line in ['  CC      init/main.o\n', '  CC [M]  drivers/foo.o\n', '  AS      arch/x86/entry.o\n', '  LD      vmlinux\n']:
+		monitor.feed(line)
+
+	assert monitor.objects == 3
+
+# Build joins the shared jobserver: Success
+def test_build_jobserver(tmp_path):
+	log_file = str(tmp_path / 'build.log')
+	mock_result = MagicMock()
+	mock_result.returncode = 0
+
+	with patch.object(settings.runtime, 'JOBSERVER_FIFO', '/tmp/jobserver/fifo'), \
+		 patch('src.kernel.builder.job_slot') as mock_slot, \
+		 patch('subprocess.run', return_value=mock_result) as mock_run:
+		builder.build('/fake/src', log_file)
+
+	assert mock_run.call_args[0][0][-2] == '/tmp/jobserver/fifo'
+	mock_slot.assert_called_once_with('/tmp/jobserver/fifo')
+
+# Tokens held by a make tree count every job beyond each make's first: Success
+def test_held_tokens():
+	group = {
+		10: (1, 'make.cross'),
+		11: (10, 'make'),
+		12: (11, 'make'),
+		13: (11, 'clang'),
+		14: (12, 'clang'),
+		15: (12, 'clang'),
+		16: (12, 'clang'),
+	}
+	with patch.object(builder, '_Builder__group', return_value=group):
+		assert builder._Builder__held_tokens(10) == 3
+
+# Forced kill returns the tokens its jobs held: Success
+def test_kill_returns_stranded_tokens():
+	proc = MagicMock()
+	proc.pid = 10
+	proc.wait.side_effect = [subprocess.TimeoutExpired('make', 30), 0]
+
+	with patch.object(settings.runtime, 'JOBSERVER_FIFO', '/tmp/jobserver/fifo'), \
+		 patch.object(builder, '_Builder__kill_jobs'), \
+		 patch.object(builder, '_Builder__held_tokens', return_value=3), \
+		 patch('os.killpg'), \
+		 patch('src.kernel.builder.release_tokens') as mock_release:
+		builder._Builder__kill(proc)
+
+	mock_release.assert_called_once_with('/tmp/jobserver/fifo', 3)
+
+# Build monitor charges wall time to build phases: Success
+def test_build_monitor_phases(tmp_path):
+	lines = [
+		'  HOSTCC  scripts/kconfig/conf.o\n',
+		'# configuration written to .config\n',
+		'  SYSHDR  arch/x86/include/generated/uapi/asm/unistd_32.h\n',
+		'  HOSTCC  scripts/sorttable\n',
+		'  CC      init/main.o\n',
+		'  LD      vmlinux.o\n',
+		'  CC      arch/x86/boot/compressed/misc.o\n',
+		'  BUILD   arch/x86/boot/bzImage\n',
+	]
+
+	with patch('src.kernel.builder.time.monotonic', side_effect=range(len(lines) + 2)):
+		monitor = BuildMonitor(str(tmp_path / 'build.log'), fatal_patterns=[])
+		for line in lines:
+			monitor.feed(line)
+		monitor.finish()
+
+	assert monitor.phases == {'olddefconfig': 2.0, 'prepare': 1.0, 'host_tools': 1.0, 'compile': 1.0, 'link': 1.0, 'image': 3.0}
+
+# Failing objects parsed from make and compiler errors: Success
+def test_failed_objects(tmp_path):
+	log_file = tmp_path / 'build.log'
+	log_file.write_text(
+		'drivers/foo/bar.c:12:3: error: use of undeclared identifier\n'
+		'make[4]: *** [scripts/Makefile.build:243: drivers/foo/bar.o] Error 1\n'
+		'make[4]: *** [scripts/Makefile.build:243: fs/baz.o] Error 1\n'
+		'make[1]: *** [Makefile:1234: vmlinux] Error 2\n'
+	)
+
+	assert builder.failed_objects(str(log_file)) == ['drivers/foo/bar.o', 'fs/baz.o']
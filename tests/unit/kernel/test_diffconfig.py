@@ -23,3 +23,30 @@ def test_compare_failure():
 
 	assert diff_lines == []
 	assert count == -1
+
+# Normalized config ignores comments and ordering: Success
+def test_normalize(tmp_path):
+	a = tmp_path / 'a.config'
+	b = tmp_path / 'b.config'
+	a.write_text('#\n# header\n#\nCONFIG_B=m\nCONFIG_A=y\n# CONFIG_C is not set\n')
+	b.write_text('CONFIG_A=y\n\nCONFIG_B=m\n')
+
+	assert diffconfig.normalize(str(a)) == diffconfig.normalize(str(b)) == 'CONFIG_A=y\nCONFIG_B=m'
+
+# Module-only changes do not touch built-in code: Success
+def test_builtin_changes_modules_only(tmp_path):
+	a = tmp_path / 'a.config'
+	b = tmp_path / 'b.config'
+	a.write_text('CONFIG_A=y\nCONFIG_B=m\n# CONFIG_C is not set\n')
+	b.write_text('CONFIG_A=y\n# CONFIG_B is not set\nCONFIG_C=m\nCONFIG_D=m\n')
+
+	assert diffconfig.builtin_changes(str(a), str(b)) == []
+
+# Built-in, tristate promotion and value changes are reported: Success
+def test_builtin_changes(tmp_path):
+	a = tmp_path / 'a.config'
+	b = tmp_path / 'b.config'
+	a.write_text('CONFIG_A=y\nCONFIG_B=m\nCONFIG_LOG_BUF_SHIFT=17\n')
+	b.write_text('CONFIG_B=y\nCONFIG_E=m\nCONFIG_LOG_BUF_SHIFT=18\n')
+
+	assert diffconfig.builtin_changes(str(a), str(b)) == ['CONFIG_A', 'CONFIG_B', 'CONFIG_LOG_BUF_SHIFT']
@@ -0,0 +1,51 @@
+from unittest.mock import patch, PropertyMock
+from src.tools.initramfs import initramfs, SMOKE_MARKER
+from src.config import settings
+import struct
+
+def read_cpio(data: bytes) -> list[tuple[str, int, bytes]]:
+	entries = []
+	offset = 0
+	while True:
+		header = data[offset:offset + 110]
+		assert header[:6] == b'070701'
+		fields = [int(header[6 + 8 * i:14 + 8 * i], 16) for i in range(13)]
+		mode, size, namesize = fields[1], fields[6], fields[11]
+
+		offset += 110
+		name = data[offset:offset + namesize - 1].decode()
+		offset += namesize + (-(110 + namesize) % 4)
+		body = data[offset:offset + size]
+		offset += size + (-size % 4)
+
+		if name == 'TRAILER!!!':
+			return entries
+		entries.append((name, mode, body))
+
+# Archive holds the console node and an executable init: Success
+def test_archive():
+	entries = read_cpio(initramfs.archive('x86_64'))
+
+	assert [name for name, _, _ in entries] == ['dev', 'dev/console', 'init']
+	assert entries[1][1] == 0o020600
+	assert entries[2][1] == 0o100755
+
+# Init is a static ELF for the target arch that prints the marker: Success
+def test_init_elf():
+	for arch, machine in (('x86_64', 62), ('arm64', 183)):
+		init = initramfs.init(arch)
+
+		assert init[:4] == b'\x7fELF'
+		assert struct.unpack_from('<H', init, 18)[0] == machine
+		assert SMOKE_MARKER.encode() in init
+
+# Archive is written once per arch: Success
+def test_path(tmp_path):
+	with patch.object(type(settings.kernel), 'INITRAMFS_DIR', new_callable=PropertyMock, return_value=str(tmp_path)):
+		path = initramfs.path('arm64')
+		with patch.object(initramfs, 'archive') as mock_archive:
+			assert initramfs.path('arm64') == path
+
+	assert path == str(tmp_path / 'arm64.cpio')
+	assert not mock_archive.called
+	assert read_cpio(open(path, 'rb').read())[2][0] == 'init'
@@ -0,0 +1,58 @@
+from unittest.mock import patch, PropertyMock
+from src.kernel.kconfigindex import kconfig_index
+from src.config import settings
+import pytest
+import os
+
+@pytest.fixture
+def kconfig_tree(tmp_path):
+	src = tmp_path / 'src'
+	(src / 'drivers' / 'net').mkdir(parents=True)
+	(src / '.git').mkdir()
+	(src / 'Kconfig').write_text(
+		'mainmenu "Linux"\n'
+		'config MODULES\n'
+		'\tbool "Enable loadable module support"\n'
+		'menuconfig NETDEVICES\n'
+		'\tdef_bool y\n'
+		'source "drivers/net/Kconfig"\n'
+	)
+	(src / 'drivers' / 'net' / 'Kconfig').write_text(
+		'config E1000\n'
+		'\ttristate "Intel PRO/1000"\n'
+		'\tdepends on PCI\n'
+		'\n'
+		'config NET_VENDOR_INTEL\n'
+		'\thelp\n'
+		'\t  bool in the help text is not a type\n'
+	)
+	(src / '.git' / 'Kconfig').write_text('config IGNORED\n\tbool\n')
+	return str(src)
+
+# Symbols are indexed with their type and defining file: Success
+def test_build(kconfig_tree):
+	symbols = kconfig_index.build(kconfig_tree)
+
+	assert set(symbols) == {'CONFIG_MODULES', 'CONFIG_NETDEVICES', 'CONFIG_E1000', 'CONFIG_NET_VENDOR_INTEL'}
+	assert symbols['CONFIG_MODULES'] == {'type': 'bool', 'file': 'Kconfig'}
+	assert symbols['CONFIG_NETDEVICES']['type'] == 'bool'
+	assert symbols['CONFIG_E1000'] == {'type': 'tristate', 'file': os.path.join('drivers', 'net', 'Kconfig')}
+	assert symbols['CONFIG_NET_VENDOR_INTEL']['type'] is None
+
+# Index is cached per commit: Success
+def test_load_cached(kconfig_tree, tmp_path):
+	with patch.object(type(settings.kernel), 'KCONFIG_INDEX_DIR', new_callable=PropertyMock, return_value=str(tmp_path / 'index')):
+		symbols = kconfig_index.load(kconfig_tree, 'test-load-cached')
+		with patch.object(kconfig_index, 'build') as mock_build:
+			assert kconfig_index.load(kconfig_tree, 'test-load-cached') == symbols
+
+	assert not mock_build.called
+	assert os.path.exists(tmp_path / 'index' / 'test-load-cached.json')
+
+# Unknown symbols are corrected or dropped: Success
+def test_resolve(kconfig_tree):
+	symbols = kconfig_index.build(kconfig_tree)
+	resolved, corrections = kconfig_index.resolve(symbols, ['CONFIG_MODULES', 'CONFIG_E100O', 'CONFIG_NOT_A_SYMBOL'])
+
+	assert resolved == ['CONFIG_MODULES', 'CONFIG_E1000']
+	assert corrections == {'CONFIG_E100O': 'CONFIG_E1000', 'CONFIG_NOT_A_SYMBOL': None}
@@ -1,5 +1,6 @@
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, PropertyMock
 from src.core.kernel import Kernel
+from src.models import BuildResult
 from src.config import settings
 import pytest
 import os
@@ -57,6 +58,13 @@ def test_load_config_success(fake_kernel_src, config_file):
 	assert kernel.load_config(config_file) is True
 	assert os.path.exists(f'{fake_kernel_src}/.config')
 
+# Load config into out-of-tree build dir: Success
+def test_load_config_build_dir(fake_kernel_src, config_file, tmp_path):
+	kernel = Kernel(fake_kernel_src)
+	build_dir = str(tmp_path / 'build')
+	assert kernel.load_config(config_file, build_dir) is True
+	assert os.path.exists(f'{build_dir}/.config')
+
 # Load config wrong extension: Failure
 def test_load_config_wrong_extension(fake_kernel_src, tmp_path):
 	bad_file = str(tmp_path / 'test.txt')
@@ -121,6 +129,48 @@ def test_build_failure(fake_kernel_src, config_file, tmp_path):
 		result = kernel.build(str(tmp_path), config_file)
 	assert result.ok is False
 
+# Build in out-of-tree build dir: Success
+def test_build_passes_build_dir(fake_kernel_src, config_file, tmp_path):
+	kernel = Kernel(fake_kernel_src)
+	build_dir = str(tmp_path / 'build')
+	with patch('src.core.kernel.builder.build', return_value=True) as mock_build:
+		result = kernel.build(str(tmp_path), config_file, build_dir)
+	assert result.ok is True
+	assert mock_build.call_args[0][:3] == (fake_kernel_src, str(tmp_path / 'build.log'), build_dir)
+
+# Build restored from artifact store: Success
+def test_build_artifact_store_hit(fake_kernel_src, config_file, tmp_path):
+	kernel = Kernel(fake_kernel_src)
+	cached = BuildResult(ok=True, log=str(tmp_path / 'build.log'), build_time=0.0, cached=True)
+	with patch.object(settings.runtime, 'ARTIFACT_STORE', True), \
+		 patch('src.core.kernel.artifact_store.load_build', return_value=cached), \
+		 patch('src.core.kernel.builder.build') as mock_build:
+		result = kernel.build(str(tmp_path), config_file)
+	assert result.cached is True
+	mock_build.assert_not_called()
+
+# Build saved under the given config and the config olddefconfig produced, without an extra make pass: Success
+def test_build_artifact_store_saves_built_config(fake_kernel_src, tmp_path):
+	kernel = Kernel(fake_kernel_src)
+	config = tmp_path / 'raw.config'
+	config.write_text('CONFIG_A=y\n')
+
+	def fake_build(src, log_file, build_dir, stats_log, monitor, targets):
+		with open(f'{build_dir}/.config', 'a', encoding='utf-8') as f:
+			f.write('CONFIG_B=y\n')
+		return True
+
+	with patch.object(settings.runtime, 'ARTIFACT_STORE', True), \
+		 patch.object(Kernel, 'commit', new_callable=PropertyMock, return_value='abc'), \
+		 patch('src.core.kernel.artifact_store.load_build', return_value=None), \
+		 patch('src.core.kernel.artifact_store.save_build') as mock_save, \
+		 patch('subprocess.run') as mock_run, \
+		 patch('src.core.kernel.builder.build', side_effect=fake_build):
+		kernel.build(str(tmp_path), str(config), str(tmp_path / 'build'))
+
+	mock_run.assert_not_called()
+	assert len({call[0][0] for call in mock_save.call_args_list}) == 2
+
 # Build summary from log tail: Success
 def test_build_failure_includes_summary(fake_kernel_src, config_file, tmp_path):
 	kernel = Kernel(fake_kernel_src)
@@ -130,6 +180,49 @@ def test_build_failure_includes_summary(fake_kernel_src, config_file, tmp_path):
 	assert result.summary is not None
 	assert '10:' in result.summary
 
+# Build summary from streaming monitor: Success
+def test_build_failure_streamed_summary(fake_kernel_src, config_file, tmp_path):
+	kernel = Kernel(fake_kernel_src)
+
+	def fake_build(src, log_file, build_dir, stats_log, monitor, targets):
+		monitor.feed('a.c:1:1: error: boom\n')
+		return False
+
+	with patch.object(settings.runtime, 'STREAM_BUILD', True), \
+		 patch('src.core.kernel.builder.build', side_effect=fake_build):
+		result = kernel.build(str(tmp_path), config_file)
+	assert result.summary == '0: a.c:1:1: error: boom'
+	assert result.fatal == 'a.c:1:1: error: boom'
+
+# Objects rebuilt counted from the build log: Success
+def test_build_counts_objects(fake_kernel_src, config_file, tmp_path):
+	kernel = Kernel(fake_kernel_src)
+	(tmp_path / 'build.log').write_text('  CC      init/main.o\n  CC [M]  drivers/foo.o\n  LD      vmlinux\n')
+	with patch('src.core.kernel.builder.build', return_value=True):
+		result = kernel.build(str(tmp_path), config_file)
+	assert result.objects_rebuilt == 2
+
+# Probe of previously failing objects fails again: Failure
+def test_build_probe_fails(fake_kernel_src, config_file, tmp_path):
+	kernel = Kernel(fake_kernel_src)
+	(tmp_path / 'build.log').write_text('make[4]: *** [scripts/Makefile.build:243: drivers/foo/bar.o] Error 1\n')
+	with patch('src.core.kernel.builder.build', return_value=False) as mock_build:
+		result = kernel.build(str(tmp_path), config_file, probe=['drivers/foo/bar.o'])
+	assert result.ok is False
+	assert result.probe.ok is False
+	assert mock_build.call_count == 1
+	assert mock_build.call_args[0][5] == ['drivers/foo/bar.o']
+
+# Probe passes and the full build runs: Success
+def test_build_probe_passes(fake_kernel_src, config_file, tmp_path):
+	kernel = Kernel(fake_kernel_src)
+	with patch('src.core.kernel.builder.build', return_value=True) as mock_build:
+		result = kernel.build(str(tmp_path), config_file, probe=['drivers/foo/bar.o'])
+	assert result.ok is True
+	assert result.probe.ok is True
+	assert mock_build.call_count == 2
+	assert mock_build.call_args[0][5] is None
+
 # Boot no bzimage: Failure
 def test_boot_no_bzimage(fake_kernel_src, tmp_path):
 	kernel = Kernel(fake_kernel_src)
@@ -137,6 +230,19 @@ def test_boot_no_bzimage(fake_kernel_src, tmp_path):
 	assert result.status == 'no'
 	assert result.summary is None
 
+# Boot image located in build dir: Success
+def test_boot_uses_build_dir(fake_kernel_src, tmp_path):
+	kernel = Kernel(fake_kernel_src)
+	build_dir = str(tmp_path / 'build')
+	bzimage = os.path.join(build_dir, settings.kernel.BZIMAGE)
+	os.makedirs(os.path.dirname(bzimage), exist_ok=True)
+	open(bzimage, 'w').close()
+	with patch('src.core.kernel.qemu.test', return_value='yes') as mock_test:
+		result = kernel.boot(str(tmp_path), build_dir)
+	assert result.status == 'yes'
+	assert mock_test.call_args[0][4] == str(tmp_path / os.path.basename(settings.kernel.BZIMAGE))
+	assert not os.path.exists(mock_test.call_args[0][4])
+
 # Boot panic: Success
 def test_boot_panic(fake_bzimage, tmp_path):
 	kernel = Kernel(fake_bzimage)
@@ -195,3 +301,95 @@ def test_make_patch_failure(fake_kernel_src, tmp_path):
 	with patch('src.core.kernel.Repo', side_effect=Exception('git error')):
 		result = kernel.make_patch(patch_path)
 	assert result is False
+
+# Smoke boot panics and the full boot is skipped: Success
+def test_boot_smoke_panic(fake_bzimage, tmp_path):
+	kernel = Kernel(fake_bzimage)
+	with open(os.path.join(fake_bzimage, '.config'), 'w') as f:
+		f.write('CONFIG_BLK_DEV_INITRD=y\n')
+	(tmp_path / 'boot-smoke.log').write_text('Kernel panic - not syncing: No working init found\n')
+	with patch.object(settings.runtime, 'SMOKE_BOOT', True), \
+		 patch.object(settings.runtime, 'STREAM_BOOT', False), \
+		 patch('src.core.kernel.initramfs.path', return_value='/tmp/x86_64.cpio'), \
+		 patch('src.core.kernel.qemu.test', return_value='panic') as mock_test:
+		result = kernel.boot(str(tmp_path))
+	assert result.status == 'panic'
+	assert result.smoke.status == 'panic'
+	assert 'No working init' in result.summary
+	assert result.log == str(tmp_path / 'boot-smoke.log')
+	assert result.smoke.log == str(tmp_path / 'boot-smoke.log')
+	assert mock_test.call_count == 1
+	assert mock_test.call_args[0][1] == str(tmp_path / 'boot-smoke.log')
+	assert mock_test.call_args[0][5] == '/tmp/x86_64.cpio'
+
+# Smoke boot passes and the full boot follows: Success
+def test_boot_smoke_passes(fake_bzimage, tmp_path):
+	kernel = Kernel(fake_bzimage)
+	with open(os.path.join(fake_bzimage, '.config'), 'w') as f:
+		f.write('CONFIG_BLK_DEV_INITRD=y\n')
+	with patch.object(settings.runtime, 'SMOKE_BOOT', True), \
+		 patch('src.core.kernel.initramfs.path', return_value='/tmp/x86_64.cpio'), \
+		 patch('src.core.kernel.qemu.test', return_value='yes') as mock_test:
+		result = kernel.boot(str(tmp_path))
+	assert result.status == 'yes'
+	assert result.smoke.status == 'yes'
+	assert result.log == str(tmp_path / 'boot.log')
+	assert mock_test.call_count == 2
+	assert [call[0][1] for call in mock_test.call_args_list] == [str(tmp_path / 'boot-smoke.log'), str(tmp_path / 'boot.log')]
+	assert len(mock_test.call_args_list[1][0]) == 5
+
+# Smoke boot is skipped without initrd support: Success
+def test_boot_smoke_skipped(fake_bzimage, tmp_path):
+	kernel = Kernel(fake_bzimage)
+	with patch.object(settings.runtime, 'SMOKE_BOOT', True), \
+		 patch('src.core.kernel.qemu.test', return_value='yes') as mock_test:
+		result = kernel.boot(str(tmp_path))
+	assert result.smoke is None
+	assert mock_test.call_count == 1
+
+# KLocalizer results are memoized per constraint set: Success
+def test_run_klocalizer_cached(fake_kernel_src, config_file, tmp_path):
+	kernel = Kernel(fake_kernel_src)
+
+	def fake_run(src, log_path, define, undefine, config, output, formulas):
+		with open(output, 'w') as f:
+			f.write('CONFIG_A=y\n')
+		return 'success'
+
+	with patch.object(settings.runtime, 'KLOCALIZER_CACHE', True), \
+		 patch('src.core.kernel.klocalizer.run', side_effect=fake_run) as mock_run:
+		first = kernel.run_klocalizer(str(tmp_path), config_file, define=['A', 'B'])
+		os.remove(first.config)
+		second = kernel.run_klocalizer(str(tmp_path), config_file, define=['B', 'A'])
+		restored = open(second.config).read()
+		kernel.run_klocalizer(str(tmp_path), config_file, define=['A'])
+
+	assert first.cached is False
+	assert second.cached is True
+	assert second.status == 'success'
+	assert restored == 'CONFIG_A=y\n'
+	assert mock_run.call_count == 2
+
+# KLocalizer errors are not memoized: Success
+def test_run_klocalizer_error_not_cached(fake_kernel_src, config_file, tmp_path):
+	kernel = Kernel(fake_kernel_src)
+	with patch.object(settings.runtime, 'KLOCALIZER_CACHE', True), \
+		 patch('src.core.kernel.klocalizer.run', return_value='error') as mock_run:
+		kernel.run_klocalizer(str(tmp_path), config_file)
+		result = kernel.run_klocalizer(str(tmp_path), config_file)
+	assert result.cached is False
+	assert mock_run.call_count == 2
+
+# Prewarm solves once in the background and is skipped when formulas are warm: Success
+def test_prewarm_klocalizer(fake_kernel_src, config_file, tmp_path):
+	kernel = Kernel(fake_kernel_src)
+	formulas = str(tmp_path / 'formulas')
+	with patch.object(kernel, 'formulas', return_value=formulas), \
+		 patch('src.core.kernel.klocalizer.run', return_value='success') as mock_run:
+		kernel.prewarm_klocalizer(config_file).join()
+		os.makedirs(formulas)
+		open(os.path.join(formulas, '.complete'), 'w').close()
+		assert kernel.prewarm_klocalizer(config_file) is None
+	assert mock_run.call_count == 1
+	assert mock_run.call_args.kwargs['formulas'] == formulas
+	assert mock_run.call_args.kwargs['config'] == config_file
@@ -1,6 +1,8 @@
 from src.tools.klocalizer import klocalizer
+from src.config import settings
 from unittest.mock import patch, MagicMock
 import pytest
+import fcntl
 import os
 
 @pytest.fixture
@@ -82,3 +84,84 @@ def test_constraints_file_content(log_path, tmp_path):
 		content = f.read()
 	assert 'X\n' in content
 	assert '!Y\n' in content
+
+# Klocalizer runs in a private scratch dir with explicit config paths: Success
+def test_run_scratch_dir(log_path, tmp_path):
+	mock_result = MagicMock()
+	mock_result.returncode = 0
+	with patch.object(settings.runtime, 'KLOCALIZER_SCRATCH_DIR', str(tmp_path / 'scratch')), \
+		 patch('subprocess.run', return_value=mock_result) as mock_run:
+		result = klocalizer.run('/fake/src', log_path, define=['X'], config=str(tmp_path / 'base.config'), output=str(tmp_path / 'out.config'))
+	assert result == 'success'
+	cmd = mock_run.call_args[0][0]
+	assert cmd[6:8] == [str(tmp_path / 'base.config'), str(tmp_path / 'out.config')]
+	assert os.path.dirname(cmd[8]) == str(tmp_path / 'scratch')
+	assert not os.path.exists(cmd[8])
+
+# Patch mode passes constraints after the scratch dir: Success
+def test_run_patch_scratch_dir(log_path, tmp_path):
+	mock_result = MagicMock()
+	mock_result.returncode = 0
+	with patch('subprocess.run', return_value=mock_result) as mock_run:
+		klocalizer.run_patch('/fake/src', '/fake/patch', log_path, define=['A'], config=str(tmp_path / 'base.config'))
+	cmd = mock_run.call_args[0][0]
+	assert cmd[6] == str(tmp_path / 'base.config')
+	assert cmd[7] == '/fake/src/.config'
+	assert cmd[9] == ''
+	assert cmd[10:] == ['--define', 'A']
+
+# olddefconfig may only fall back to the tree when builds run in-tree: Success
+def test_run_in_tree_fallback(log_path):
+	mock_result = MagicMock()
+	mock_result.returncode = 0
+	with patch('subprocess.run', return_value=mock_result) as mock_run:
+		with patch.object(settings.runtime, 'BUILD_DIR_MODE', 'in-tree'):
+			klocalizer.run('/fake/src', log_path)
+		assert mock_run.call_args.kwargs['env']['OLDDEFCONFIG_IN_TREE'] == '1'
+
+		with patch.object(settings.runtime, 'BUILD_DIR_MODE', 'attempt'):
+			klocalizer.run_patch('/fake/src', '/fake/patch', log_path)
+		assert mock_run.call_args.kwargs['env'] is None
+
+# A solve that reaches a verdict marks its formulas as warm: Success
+def test_run_marks_formulas_warm(log_path, tmp_path):
+	formulas = str(tmp_path / 'formulas')
+	mock_result = MagicMock()
+	with patch('subprocess.run', return_value=mock_result) as mock_run:
+		mock_result.returncode = 1
+		klocalizer.run('/fake/src', log_path, formulas=formulas)
+		assert not klocalizer.warm(formulas)
+
+		mock_result.returncode = 11
+		klocalizer.run('/fake/src', log_path, formulas=formulas)
+	assert klocalizer.warm(formulas)
+	assert mock_run.call_args[0][0][9] == formulas
+
+# Patch solves can derive Kbuild formulas, so they never mark the formulas warm: Success
+def test_run_patch_keeps_formulas_cold(log_path, tmp_path):
+	formulas = str(tmp_path / 'formulas')
+	mock_result = MagicMock()
+	mock_result.returncode = 0
+	with patch('subprocess.run', return_value=mock_result):
+		klocalizer.run_patch('/fake/src', '/fake/patch', log_path, formulas=formulas)
+	assert not klocalizer.warm(formulas)
+
+# Patch solves share warm formulas and publish the formulas they derive: Success
+def test_run_patch_shares_warm_formulas(log_path, tmp_path):
+	formulas = str(tmp_path / 'formulas')
+	os.makedirs(f'{formulas}/kclause')
+	open(f'{formulas}/.complete', 'w', encoding='utf-8').close()
+
+	def fake_run(cmd, **kwargs):
+		staged = cmd[9]
+		assert staged != formulas
+		assert os.path.realpath(f'{staged}/kclause') == f'{formulas}/kclause'
+		with open(f'{staged}/kmax', 'w', encoding='utf-8') as f:
+			f.write('drivers/foo.o')
+		return MagicMock(returncode=0)
+
+	with patch('subprocess.run', side_effect=fake_run), patch('fcntl.flock') as mock_flock:
+		klocalizer.run_patch('/fake/src', '/fake/patch', log_path, formulas=formulas)
+	assert [call[0][1] for call in mock_flock.call_args_list] == [fcntl.LOCK_SH]
+	assert open(f'{formulas}/kmax', encoding='utf-8').read() == 'drivers/foo.o'
+	assert not os.path.islink(f'{formulas}/kclause')
@@ -0,0 +1,21 @@
+from unittest.mock import patch
+from src.kernel.klocalizercache import klocalizer_cache
+from src.models import KlocalizerResult
+from src.config import settings
+import os
+
+# Saves keep the klocalizer cache under its size limit: Success
+def test_save_evicts_oldest(tmp_path):
+	log_file = tmp_path / 'klocalizer.log'
+	log_file.write_bytes(b'x' * 1024)
+	result = KlocalizerResult(status='no-satisfying-constraints', log=str(log_file))
+
+	with patch.object(settings.runtime, 'KLOCALIZER_CACHE_SIZE', 1536 / 1024 ** 3):
+		old = klocalizer_cache.key('abc', 'base', ['CONFIG_A'], [])
+		klocalizer_cache.save(old, result, str(tmp_path / '.config'))
+		os.utime(klocalizer_cache.path(old), (0, 0))
+		new = klocalizer_cache.key('abc', 'base', ['CONFIG_B'], [])
+		klocalizer_cache.save(new, result, str(tmp_path / '.config'))
+
+	assert not os.path.exists(klocalizer_cache.path(old))
+	assert os.path.exists(klocalizer_cache.path(new))
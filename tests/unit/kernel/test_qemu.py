@@ -0,0 +1,154 @@
+from unittest.mock import patch, PropertyMock, MagicMock
+from src.tools.qemu import qemu, BootMonitor, SMOKE_RULES, boot_farm
+from src.tools.initramfs import SMOKE_MARKER
+from src.config import settings
+from src.utils import Cancellation
+import fcntl
+import time
+import os
+
+def run_fake_qemu(tmp_path, console: str, **kwargs):
+	script = tmp_path / 'qemu.sh'
+	script.write_text(console)
+	monitor = BootMonitor(str(tmp_path / 'boot.log'), **kwargs)
+
+	with patch.object(type(settings.scripts), 'QEMU_TEST_SCRIPT', new_callable=PropertyMock, return_value=str(script)):
+		start = time.time()
+		status = qemu.test(str(tmp_path), str(tmp_path / 'boot.log'), monitor)
+
+	return status, monitor, time.time() - start
+
+# Boot ends at the login prompt: Success
+def test_stream_login(tmp_path):
+	status, monitor, elapsed = run_fake_qemu(tmp_path, 'echo "Booting"\necho "debian login:"\nsleep 30\n')
+
+	assert status == 'yes'
+	assert monitor.rule == 'login'
+	assert elapsed < 10
+
+# Boot ends on a kernel panic with its report: Failure
+def test_stream_panic(tmp_path):
+	status, monitor, elapsed = run_fake_qemu(tmp_path, 'echo "Booting"\necho "Kernel panic - not syncing: VFS"\necho "Call Trace:"\necho "---[ end Kernel panic ]---"\nsleep 30\n')
+
+	assert status == 'panic'
+	assert monitor.rule == 'panic'
+	assert elapsed < 10
+	assert monitor.summary(status) == '1: Kernel panic - not syncing: VFS\n2: Call Trace:\n3: ---[ end Kernel panic ]---'
+
+# Boot ends when the console goes silent: Failure
+def test_stream_stall(tmp_path):
+	status, monitor, elapsed = run_fake_qemu(tmp_path, 'echo "Booting"\nsleep 30\n', stall=0.5)
+
+	assert status == 'timeout'
+	assert monitor.rule == 'stall'
+	assert elapsed < 10
+
+# QEMU exits without reaching a rule: Failure
+def test_stream_exit(tmp_path):
+	status, monitor, _ = run_fake_qemu(tmp_path, 'echo "qemu: could not open disk image"\nexit 1\n')
+
+	assert status == 'no'
+	assert monitor.rule == 'exit'
+	assert open(tmp_path / 'boot.log').read() == 'qemu: could not open disk image\n'
+
+# Boot cancelled before it starts is killed straight away: Failure
+def test_stream_cancelled(tmp_path):
+	cancel = Cancellation()
+	cancel.cancel()
+	status, monitor, elapsed = run_fake_qemu(tmp_path, 'echo "Booting"\nsleep 30\n', cancel=cancel)
+
+	assert status == 'no'
+	assert monitor.rule == 'exit'
+	assert elapsed < 10
+
+# Boot farm never runs more boots than its default two slots: Success
+def test_boot_farm_slots():
+	running = []
+	peak = []
+
+	def boot():
+		running.append(1)
+		peak.append(len(running))
+		time.sleep(0.2)
+		running.pop()
+		return 'yes'
+
+	futures = [boot_farm.submit(boot) for _ in range(5)]
+	results = [f.result() for f in futures]
+
+	assert results == ['yes'] * 5
+	assert max(peak) == 2
+
+# Boot farm waits for a slot held by another process and starts as soon as it is freed: Success
+def test_boot_farm_waits_for_slot():
+	os.makedirs(settings.kernel.QEMU_SLOT_DIR, exist_ok=True)
+	held = [open(f'{settings.kernel.QEMU_SLOT_DIR}/slot-{i}.lock', 'w') for i in range(settings.runtime.QEMU_SLOTS)]
+	for f in held:
+		fcntl.flock(f, fcntl.LOCK_EX)
+
+	future = boot_farm.submit(time.monotonic)
+	time.sleep(0.2)
+	assert not future.done()
+
+	released = time.monotonic()
+	for f in held:
+		f.close()
+
+	assert future.result(timeout=5) - released < 0.5
+
+# Boot farm runs a boot with the settings of the session that queued it: Success
+def test_boot_farm_session_settings():
+	with settings.session({'runtime': {'BOOT_TIMEOUT': 1234}}):
+		future = boot_farm.submit(lambda: settings.runtime.BOOT_TIMEOUT)
+
+	assert future.result() == 1234
+	assert settings.runtime.BOOT_TIMEOUT != 1234
+
+# Boot gets a private qcow2 overlay that is removed afterwards: Success
+def test_boot_overlay(tmp_path):
+	calls = []
+
+	def fake_run(cmd, **kwargs):
+		calls.append(cmd)
+		if cmd[0] == 'qemu-img':
+			open(cmd[-1], 'w').close()
+		return MagicMock(returncode=0, stderr='')
+
+	with patch.object(settings.runtime, 'BOOT_OVERLAY', True), \
+		 patch.object(settings.runtime, 'BOOT_OVERLAY_DIR', str(tmp_path / 'overlays')), \
+		 patch('src.tools.qemu.shutil.which', return_value='/usr/bin/qemu-img'), \
+		 patch('subprocess.run', side_effect=fake_run):
+		status = qemu.test(str(tmp_path), str(tmp_path / 'boot.log'))
+
+	overlay = calls[0][-1]
+	assert status == 'yes'
+	assert calls[0][:6] == ['qemu-img', 'create', '-q', '-f', 'qcow2', '-F']
+	assert calls[1][6] == overlay
+	assert calls[1][-1] == 'qcow2'
+	assert os.path.dirname(overlay) == str(tmp_path / 'overlays')
+	assert not os.path.exists(overlay)
+
+# Smoke boot runs the initramfs without an overlay and ends at the init marker: Success
+def test_stream_smoke(tmp_path):
+	script = tmp_path / 'qemu.sh'
+	script.write_text('echo "initrd $8"\necho "$9"\nsleep 30\n')
+	monitor = BootMonitor(str(tmp_path / 'boot.log'), rules=SMOKE_RULES)
+
+	with patch.object(type(settings.scripts), 'QEMU_TEST_SCRIPT', new_callable=PropertyMock, return_value=str(script)), \
+		 patch('subprocess.run') as mock_run:
+		status = qemu.test(str(tmp_path), str(tmp_path / 'boot.log'), monitor, initrd='/tmp/x86_64.cpio')
+
+	assert status == 'yes'
+	assert monitor.rule == 'smoke'
+	assert not mock_run.called
+	assert open(tmp_path / 'boot.log').read() == f'initrd /tmp/x86_64.cpio\n{SMOKE_MARKER}\n'
+
+# Milestones are timestamped once, on their first matching line: Success
+def test_stream_milestones(tmp_path):
+	console = 'echo "[    0.000000] Linux version 7.0.0"\nsleep 0.3\necho "[    1.2] Freeing unused kernel image"\necho "[    1.3] Run /sbin/init as init process"\necho "[    1.4] Run /etc/init as init process"\necho "debian login:"\nsleep 30\n'
+	status, monitor, _ = run_fake_qemu(tmp_path, console)
+
+	assert status == 'yes'
+	assert list(monitor.milestones) == ['printk', 'free_init', 'init', 'login']
+	assert monitor.milestones['free_init'] - monitor.milestones['printk'] >= 0.3
+	assert monitor.milestones['init'] <= monitor.milestones['login']
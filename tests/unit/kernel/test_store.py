@@ -0,0 +1,152 @@
+from unittest.mock import patch, PropertyMock
+from src.models import BuildResult, BootResult
+from src.kernel.store import artifact_store
+from src.utils import EvictionBudget
+from src.config import KernelSettings, settings
+import pytest
+import os
+
+CONDITIONS = {'image': 'img', 'smoke_timeout': None, 'stall_timeout': 60}
+
+@pytest.fixture
+def store_dir(tmp_path):
+	path = str(tmp_path / 'artifacts')
+	with patch.object(KernelSettings, 'ARTIFACT_DIR', new_callable=PropertyMock, return_value=path):
+		yield path
+
+@pytest.fixture
+def output_dir(tmp_path):
+	path = tmp_path / 'out'
+	image = path / settings.kernel.BZIMAGE
+	image.parent.mkdir(parents=True)
+	image.write_bytes(b'kernel')
+	return str(path)
+
+# Build result round trip: Success
+def test_build_round_trip(store_dir, output_dir, tmp_path):
+	log_file = tmp_path / 'build.log'
+	log_file.write_text('build output\n')
+	key = artifact_store.key('abc', 'digest')
+
+	artifact_store.save_build(key, BuildResult(ok=True, log=str(log_file), build_time=12.0), output_dir)
+	os.remove(f'{output_dir}/{settings.kernel.BZIMAGE}')
+
+	restored_log = str(tmp_path / 'restored' / 'build.log')
+	result = artifact_store.load_build(key, restored_log, output_dir)
+
+	assert result.ok is True
+	assert result.cached is True
+	assert os.path.exists(restored_log)
+	assert os.path.exists(f'{output_dir}/{settings.kernel.BZIMAGE}')
+
+# Build restores the config olddefconfig produced: Success
+def test_build_restores_config(store_dir, output_dir, tmp_path):
+	with open(f'{output_dir}/.config', 'w', encoding='utf-8') as f:
+		f.write('CONFIG_A=y\nCONFIG_B=y\n')
+	key = artifact_store.key('abc', 'digest')
+
+	artifact_store.save_build(key, BuildResult(ok=True, log=str(tmp_path / 'build.log'), build_time=12.0), output_dir)
+	with open(f'{output_dir}/.config', 'w', encoding='utf-8') as f:
+		f.write('CONFIG_A=y\n')
+
+	assert artifact_store.load_build(key, str(tmp_path / 'again.log'), output_dir) is not None
+	with open(f'{output_dir}/.config', encoding='utf-8') as f:
+		assert f.read() == 'CONFIG_A=y\nCONFIG_B=y\n'
+
+# Build result missing: Failure
+def test_build_miss(store_dir, output_dir, tmp_path):
+	assert artifact_store.load_build(artifact_store.key('abc', 'missing'), str(tmp_path / 'build.log'), output_dir) is None
+
+# Boot result round trip: Success
+def test_boot_round_trip(store_dir, tmp_path):
+	log_file = tmp_path / 'boot.log'
+	log_file.write_text('Kernel panic\n')
+	key = artifact_store.key('abc', 'digest')
+
+	artifact_store.save_boot(key, BootResult(status='panic', log=str(log_file), boot_time=3.0, summary='0: Kernel panic', timeout=300), CONDITIONS)
+	result = artifact_store.load_boot(key, str(tmp_path / 'again.log'), CONDITIONS, 300)
+
+	assert result.status == 'panic'
+	assert result.summary == '0: Kernel panic'
+	assert result.cached is True
+
+# QEMU process failure is not stored: Success
+def test_boot_process_failure_not_saved(store_dir, tmp_path):
+	key = artifact_store.key('abc', 'digest')
+	artifact_store.save_boot(key, BootResult(status='no', log=str(tmp_path / 'boot.log')), CONDITIONS)
+	assert artifact_store.load_boot(key, str(tmp_path / 'again.log'), CONDITIONS, 300) is None
+
+# Timeout recorded with a short timeout is not replayed for a longer one: Success
+def test_boot_timeout_not_replayed_for_longer_timeout(store_dir, tmp_path):
+	key = artifact_store.key('abc', 'digest')
+	artifact_store.save_boot(key, BootResult(status='timeout', log=str(tmp_path / 'boot.log'), boot_time=60.0, rule='timeout', timeout=60), CONDITIONS)
+
+	assert artifact_store.load_boot(key, str(tmp_path / 'again.log'), CONDITIONS, 300) is None
+	assert artifact_store.load_boot(key, str(tmp_path / 'again.log'), CONDITIONS, 60).status == 'timeout'
+
+# Verdict reached after the current timeout is not replayed: Success
+def test_boot_slow_verdict_not_replayed_for_shorter_timeout(store_dir, tmp_path):
+	key = artifact_store.key('abc', 'digest')
+	artifact_store.save_boot(key, BootResult(status='yes', log=str(tmp_path / 'boot.log'), boot_time=200.0, rule='login', timeout=300), CONDITIONS)
+
+	assert artifact_store.load_boot(key, str(tmp_path / 'again.log'), CONDITIONS, 120) is None
+	assert artifact_store.load_boot(key, str(tmp_path / 'again.log'), CONDITIONS, 240).status == 'yes'
+
+# Verdict reached with another guest image or stall window is not replayed: Success
+def test_boot_not_replayed_under_other_conditions(store_dir, tmp_path):
+	key = artifact_store.key('abc', 'digest')
+	artifact_store.save_boot(key, BootResult(status='panic', log=str(tmp_path / 'boot.log'), boot_time=3.0, timeout=300), CONDITIONS)
+
+	assert artifact_store.load_boot(key, str(tmp_path / 'again.log'), {**CONDITIONS, 'image': 'other'}, 300) is None
+	assert artifact_store.load_boot(key, str(tmp_path / 'again.log'), {**CONDITIONS, 'stall_timeout': 30}, 300) is None
+
+# Eviction removes least recently used entries: Success
+def test_evict_oldest(store_dir):
+	for i, name in enumerate(['old', 'new']):
+		entry = os.path.join(store_dir, 'x86_64', 'abc', name)
+		os.makedirs(entry)
+		with open(f'{entry}/build.log', 'wb') as f:
+			f.write(b'x' * 1024)
+		os.utime(entry, (i, i))
+
+	with patch('src.kernel.store.settings') as mock_settings:
+		mock_settings.kernel.ARTIFACT_DIR = store_dir
+		mock_settings.runtime.ARTIFACT_STORE_SIZE = 1024 / 1024 ** 3
+		artifact_store.evict()
+
+	assert not os.path.exists(os.path.join(store_dir, 'x86_64', 'abc', 'old'))
+	assert os.path.exists(os.path.join(store_dir, 'x86_64', 'abc', 'new'))
+
+# Eviction skips entries that vanish mid-walk: Success
+def test_evict_tolerates_vanished_entries(store_dir):
+	for name in ['gone', 'kept']:
+		entry = os.path.join(store_dir, 'x86_64', 'abc', name)
+		os.makedirs(entry)
+		with open(f'{entry}/build.log', 'wb') as f:
+			f.write(b'x' * 1024)
+
+	getsize = os.path.getsize
+	def vanishing(path):
+		if '/gone/' in path:
+			raise FileNotFoundError(path)
+		return getsize(path)
+
+	with patch('src.kernel.store.settings') as mock_settings, patch('os.path.getsize', side_effect=vanishing):
+		mock_settings.kernel.ARTIFACT_DIR = store_dir
+		mock_settings.runtime.ARTIFACT_STORE_SIZE = 1
+		artifact_store.evict()
+
+	assert os.path.exists(os.path.join(store_dir, 'x86_64', 'abc', 'kept'))
+	assert os.path.exists(f'{store_dir}.lock')
+
+# Saves only scan the store once enough has been written since the last scan: Success
+def test_evict_on_threshold(store_dir, output_dir, tmp_path):
+	key = artifact_store.key('abc', 'digest')
+	result = BuildResult(ok=False, log=str(tmp_path / 'build.log'), build_time=1.0)
+
+	with patch.object(artifact_store, 'evict') as mock_evict:
+		artifact_store._ArtifactStore__budget = EvictionBudget()
+		artifact_store.save_build(key, result, output_dir)
+		artifact_store.save_build(key, result, output_dir)
+
+	assert mock_evict.call_count == 1
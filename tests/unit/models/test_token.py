@@ -43,7 +43,19 @@ def test_llm_usage_addition():
 def test_llm_usage_model_dump():
 	usage = LLMUsage(input_tokens=10, output_tokens=5, total_tokens=15)
 	result = usage.model_dump()
-	assert result == {'input_tokens': 10, 'output_tokens': 5, 'total_tokens': 15}
+	assert result == {'input_tokens': 10, 'output_tokens': 5, 'total_tokens': 15, 'cached_input_tokens': 0}
+
+# Cached input tokens read from input token details and summed: Success
+def test_cached_input_tokens():
+	cached = MagicMock()
+	cached.type = 'ai'
+	cached.usage_metadata = {'input_tokens': 100, 'output_tokens': 5, 'total_tokens': 105, 'input_token_details': {'cache_read': 80}}
+	uncached = MagicMock()
+	uncached.type = 'ai'
+	uncached.usage_metadata = {'input_tokens': 50, 'output_tokens': 5, 'total_tokens': 55}
+	result = LLMUsage.from_response({'messages': [cached, uncached]})
+	assert result.cached_input_tokens == 80
+	assert (result + LLMUsage.from_ai_message(cached)).cached_input_tokens == 160
 
 # Total tokens is sum of build and boot log tokens: Success
 def test_embedding_usage_total_tokens():
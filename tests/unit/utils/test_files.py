@@ -0,0 +1,26 @@
+from src.utils import read_json, write_json, EvictionBudget
+import os
+
+# JSON written through a temp file reads back: Success
+def test_write_json(tmp_path):
+	path = str(tmp_path / 'nested' / 'data.json')
+	write_json(path, {'a': 1})
+
+	assert read_json(path) == {'a': 1}
+	assert os.listdir(tmp_path / 'nested') == ['data.json']
+
+# Missing or corrupt JSON reads as nothing: Failure
+def test_read_json_invalid(tmp_path):
+	(tmp_path / 'bad.json').write_text('{')
+
+	assert read_json(str(tmp_path / 'bad.json')) is None
+	assert read_json(str(tmp_path / 'missing.json')) is None
+
+# Eviction is due once enough has been saved since the last scan: Success
+def test_eviction_budget(tmp_path):
+	(tmp_path / 'entry').mkdir()
+	(tmp_path / 'entry' / 'file').write_bytes(b'x' * 30)
+	budget = EvictionBudget()
+
+	assert budget.due(str(tmp_path / 'entry'), 1000) is True
+	assert [budget.due(str(tmp_path / 'entry'), 1000) for _ in range(2)] == [False, True]
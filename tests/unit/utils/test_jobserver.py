@@ -0,0 +1,55 @@
+from src.utils import Jobserver, job_slot
+import threading
+import time
+import os
+
+# Jobserver holds one token per job in its budget: Success
+def test_jobserver_tokens():
+	with Jobserver(8) as jobserver:
+		path = jobserver.path
+		assert os.path.exists(path)
+		assert jobserver.available() == 8
+
+	assert not os.path.exists(path)
+
+# Concurrent make clients never run more jobs than the budget: Success
+def test_jobserver_bounds_concurrency():
+	running = 0
+	peak = 0
+	lock = threading.Lock()
+
+	def client(path):
+		nonlocal running, peak
+
+		# Each client runs its implicit job plus one per token it can take, like make -j.
+		with job_slot(path):
+			fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+			try:
+				tokens = os.read(fd, 16)
+			except BlockingIOError:
+				tokens = b''
+			finally:
+				os.close(fd)
+
+			with lock:
+				running += 1 + len(tokens)
+				peak = max(peak, running)
+			time.sleep(0.05)
+			with lock:
+				running -= 1 + len(tokens)
+
+			if tokens:
+				fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+				os.write(fd, tokens)
+				os.close(fd)
+
+	with Jobserver(4) as jobserver:
+		threads = [threading.Thread(target=client, args=(jobserver.path,)) for _ in range(6)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		assert jobserver.available() == 4
+
+	assert 1 <= peak <= 4